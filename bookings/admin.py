@@ -1,7 +1,11 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth.models import User
+from django.template.response import TemplateResponse
+from django.urls import path
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import Booking, UserProfile, Service
+from django.utils import timezone
+from .forms import FleetUploadForm
+from .models import Bay, Booking, EmailOutbox, OperatingSchedule, UserProfile, Service, SlotCapacity, DailyBookingStats, Task, TaskRun, WaitlistEntry
 
 
 class UserProfileInline(admin.StackedInline):
@@ -15,6 +19,15 @@ class UserAdmin(BaseUserAdmin):
     inlines = (UserProfileInline,)
     list_display = ('username', 'email', 'first_name', 'last_name', 'get_role', 'is_staff')
     
+    def save_formset(self, request, form, formset, change):
+        if formset.model is not UserProfile:
+            return super().save_formset(request, form, formset, change)
+        for profile in formset.save(commit=False):
+            if profile.pk:
+                profile.save(update_fields=UserProfile.DETAIL_FIELDS)
+            else:
+                profile.save()
+    
     def get_role(self, obj):
         try:
             return obj.profile.role
@@ -33,11 +46,13 @@ class BookingAdmin(admin.ModelAdmin):
         'service',
         'booking_date',
         'booking_time',
+        'bay',
         'status',
         'price',
         'created_at'
     )
-    list_filter = ('status', 'vehicle_type', 'service', 'booking_date')
+    list_filter = ('status', 'vehicle_type', 'service', 'bay', 'booking_date')
+    list_select_related = ('bay',)
     search_fields = ('customer_name', 'customer_email', 'vehicle_plate', 'customer_phone')
     readonly_fields = ('created_at', 'updated_at')
     date_hierarchy = 'booking_date'
@@ -50,7 +65,7 @@ class BookingAdmin(admin.ModelAdmin):
             'fields': ('vehicle_type', 'vehicle_plate')
         }),
         ('Service Details', {
-            'fields': ('service', 'booking_date', 'booking_time', 'price', 'status')
+            'fields': ('service', 'booking_date', 'booking_time', 'duration', 'bay', 'price', 'status')
         }),
         ('Weather Information', {
             'fields': ('weather_condition', 'weather_temperature', 'weather_description'),
@@ -63,26 +78,177 @@ class BookingAdmin(admin.ModelAdmin):
     )
     
     actions = ['mark_as_confirmed', 'mark_as_completed', 'mark_as_cancelled']
+    change_list_template = 'admin/bookings/booking/change_list.html'
+    
+    def get_urls(self):
+        urls = [
+            path('fleet-upload/', self.admin_site.admin_view(self.fleet_upload), name='bookings_booking_fleet_upload'),
+        ]
+        return urls + super().get_urls()
+    
+    def fleet_upload(self, request):
+        """Create bookings for one account from an uploaded CSV"""
+        import csv
+        import io
+        from .fleet import MAX_FLEET_ROWS, book_fleet
+        
+        rejected = None
+        if request.method == 'POST':
+            form = FleetUploadForm(request.POST, request.FILES)
+            if form.is_valid():
+                try:
+                    rows = list(csv.DictReader(io.TextIOWrapper(form.cleaned_data['csv_file'], encoding='utf-8-sig')))
+                except (UnicodeDecodeError, csv.Error) as e:
+                    rows = None
+                    form.add_error('csv_file', f'Could not read the CSV file: {e}')
+                
+                if rows is not None and not rows:
+                    form.add_error('csv_file', 'The file has no booking rows.')
+                elif rows is not None and len(rows) > MAX_FLEET_ROWS:
+                    form.add_error('csv_file', f'At most {MAX_FLEET_ROWS} bookings per upload.')
+                elif rows:
+                    result = book_fleet(form.cleaned_data['user'], rows, form.cleaned_data['mode'])
+                    # Line numbers as seen in a spreadsheet (header is line 1)
+                    rejected = [(row + 2, errors) for row, errors in sorted(result.errors.items())]
+                    if result.created:
+                        self.message_user(request, f'Created {len(result.created)} bookings.', messages.SUCCESS)
+                    if rejected:
+                        self.message_user(request, f'{len(rejected)} rows were rejected; nothing was booked for them.', messages.WARNING)
+        else:
+            form = FleetUploadForm()
+        
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Upload fleet bookings',
+            'form': form,
+            'rejected': rejected,
+        }
+        return TemplateResponse(request, 'admin/bookings/booking/fleet_upload.html', context)
     
     def mark_as_confirmed(self, request, queryset):
-        queryset.update(status='confirmed')
+        queryset.update_status('confirmed')
     mark_as_confirmed.short_description = "Mark selected bookings as Confirmed"
     
     def mark_as_completed(self, request, queryset):
-        queryset.update(status='completed')
+        queryset.update_status('completed')
     mark_as_completed.short_description = "Mark selected bookings as Completed"
     
     def mark_as_cancelled(self, request, queryset):
-        queryset.update(status='cancelled')
+        queryset.update_status('cancelled')
     mark_as_cancelled.short_description = "Mark selected bookings as Cancelled"
 
 
+@admin.register(Bay)
+class BayAdmin(admin.ModelAdmin):
+    list_display = ('name', 'vehicle_types', 'is_active', 'display_order')
+    list_filter = ('is_active',)
+    list_editable = ('is_active', 'display_order')
+    readonly_fields = ('created_at', 'updated_at')
+
+
+@admin.register(OperatingSchedule)
+class OperatingScheduleAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'weekday', 'date', 'is_closed', 'opens_at', 'closes_at', 'capacity', 'note')
+    list_filter = ('is_closed',)
+    readonly_fields = ('created_at', 'updated_at')
+    
+    fieldsets = (
+        ('Applies To', {
+            'fields': ('weekday', 'date'),
+            'description': 'Set a weekday for the weekly template, or a date to override it (holidays, special hours)'
+        }),
+        ('Hours', {
+            'fields': ('is_closed', 'opens_at', 'closes_at', 'capacity', 'note')
+        }),
+        ('Timestamps', {
+            'fields': ('created_at', 'updated_at'),
+            'classes': ('collapse',)
+        }),
+    )
+
+
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(admin.ModelAdmin):
+    list_display = ('customer_name', 'booking_date', 'booking_time', 'vehicle_type', 'service', 'status', 'created_at')
+    list_filter = ('status', 'booking_date')
+    search_fields = ('customer_name', 'customer_email', 'vehicle_plate')
+    date_hierarchy = 'booking_date'
+    readonly_fields = ('booking', 'created_at', 'promoted_at')
+
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ('to_email', 'kind', 'status', 'attempts', 'next_attempt_at', 'sent_at', 'created_at')
+    list_filter = ('status', 'kind')
+    search_fields = ('to_email', 'subject')
+    readonly_fields = ('booking', 'attempts', 'locked_at', 'last_error', 'created_at', 'sent_at')
+    actions = ['retry_now']
+    
+    @admin.action(description='Retry selected emails now')
+    def retry_now(self, request, queryset):
+        updated = queryset.filter(status__in=['pending', 'failed']).update(
+            status='pending', attempts=0, next_attempt_at=timezone.now(),
+        )
+        self.message_user(request, f'{updated} emails queued for the next send run.')
+
+
+class TaskRunInline(admin.TabularInline):
+    model = TaskRun
+    extra = 0
+    can_delete = False
+    readonly_fields = ('started_at', 'duration_ms', 'succeeded', 'error')
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'attempts', 'max_attempts', 'run_after', 'created_at', 'finished_at')
+    list_filter = ('status', 'name')
+    # kwargs can hold credentials (e.g. the access token for revoke_session)
+    exclude = ('kwargs',)
+    readonly_fields = ('attempts', 'locked_at', 'last_error', 'created_at', 'finished_at')
+    inlines = [TaskRunInline]
+    actions = ['retry_now']
+    
+    @admin.action(description='Retry selected tasks now')
+    def retry_now(self, request, queryset):
+        updated = queryset.filter(status='dead').update(
+            status='queued', attempts=0, run_after=timezone.now(), finished_at=None,
+        )
+        self.message_user(request, f'{updated} dead tasks queued again.')
+
+
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
-    list_display = ('user', 'role', 'phone', 'created_at')
+    list_display = ('user', 'role', 'phone', 'total_bookings', 'lifetime_spend', 'created_at')
     list_filter = ('role', 'created_at')
     search_fields = ('user__username', 'user__email', 'phone')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = (
+        'total_bookings', 'pending_bookings', 'completed_bookings', 'cancelled_bookings', 'lifetime_spend',
+        'created_at', 'updated_at',
+    )
+    
+    def save_model(self, request, obj, form, change):
+        if change:
+            obj.save(update_fields=UserProfile.DETAIL_FIELDS)
+        else:
+            super().save_model(request, obj, form, change)
+
+
+@admin.register(SlotCapacity)
+class SlotCapacityAdmin(admin.ModelAdmin):
+    list_display = ('booking_date', 'booking_time', 'booked_count', 'updated_at')
+    list_filter = ('booking_date',)
+    date_hierarchy = 'booking_date'
+    readonly_fields = ('booking_date', 'booking_time', 'booked_count', 'updated_at')
+
+
+@admin.register(DailyBookingStats)
+class DailyBookingStatsAdmin(admin.ModelAdmin):
+    list_display = ('booking_date', 'service', 'status', 'booking_count', 'revenue', 'updated_at')
+    list_filter = ('status', 'service', 'booking_date')
+    date_hierarchy = 'booking_date'
+    readonly_fields = ('booking_date', 'service', 'status', 'booking_count', 'revenue', 'updated_at')
 
 
 @admin.register(Service)
@@ -1,4 +1,11 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def install_search_tables(sender, using, **kwargs):
+    """Set up the SQLite search tables after migrations run"""
+    from .search import install_sqlite_search
+    install_sqlite_search(using)
 
 
 class BookingsConfig(AppConfig):
@@ -7,3 +14,4 @@ class BookingsConfig(AppConfig):
     
     def ready(self):
         import bookings.signals
+        post_migrate.connect(install_search_tables, sender=self)
@@ -0,0 +1,125 @@
+"""
+Remaining slot capacity over a date range
+
+Reads the SlotCapacity ledger for the whole range in one query and caches
+the result under the current ledger and schedule versions, so any booking
+or opening-hours change makes the next request recompute. Remaining places
+are for a booking of the requested duration starting at each slot, so
+long services show a slot as full when any later slot they would run into
+is. Each day lists only the slots the operating schedule opens that day.
+
+nearest_slots() answers "what else is free?" for a rejected booking from
+the same single ledger read over a few days around the requested date.
+Given a vehicle type that only some bays take, it also reads those bays'
+bookings over the window (one more query) and drops slots where none of
+them is free, so every suggestion can actually be allocated a bay.
+"""
+import hashlib
+import heapq
+import json
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .bays import bays_for, busy_between, free_bays, get_active_bays
+from .capacity import ledger_version
+from .operating_schedule import get_schedule, schedule_version
+from .scheduling import DEFAULT_DURATION, load_occupancy
+
+# Longest range a single request may ask for
+MAX_RANGE_DAYS = 62
+
+# Alternatives offered for a full slot, searched this many days either side of it
+SUGGESTION_COUNT = 5
+SUGGESTION_WINDOW_DAYS = 3
+MAX_SUGGESTIONS = 20
+
+
+def slot_key(slot):
+    """Format a slot time as the 'HH:MM:SS' string the booking form submits"""
+    return slot.strftime('%H:%M:%S')
+
+
+def get_availability(start, days, duration=DEFAULT_DURATION):
+    """
+    Return (payload, etag) with remaining places for a booking of duration
+    minutes at every slot from start for the given number of days
+    """
+    days = max(1, min(days, MAX_RANGE_DAYS))
+    end = start + timedelta(days=days - 1)
+
+    cache_key = f'availability:{ledger_version()}:{schedule_version()}:{start.isoformat()}:{days}:{duration}'
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    availability = {}
+    capacity = {}
+    for day, occupancy in load_occupancy(start, end).items():
+        availability[day.isoformat()] = {
+            slot_key(slot): occupancy.remaining(slot, duration) for slot in occupancy.slots
+        }
+        capacity[day.isoformat()] = occupancy.capacity
+
+    payload = {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'capacity': capacity,
+        'duration': duration,
+        'slots': [slot_key(slot) for slot in get_schedule().all_slots],
+        'availability': availability,
+    }
+    etag = hashlib.md5(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+    cache.set(cache_key, (payload, etag), timeout=settings.AVAILABILITY_CACHE_TTL)
+    return payload, etag
+
+
+def nearest_slots(day, start, duration=DEFAULT_DURATION, count=SUGGESTION_COUNT, window=SUGGESTION_WINDOW_DAYS,
+                  vehicle_type=None):
+    """
+    The count open slots closest in time to day at start, excluding that slot
+
+    Looks window days either side of day (never before now) with one ledger
+    query. With a vehicle_type, only slots where a bay that takes it is free
+    are offered. Each suggestion is a dict with date, time, label and remaining.
+    """
+    now = datetime.now()
+    first = max(day - timedelta(days=window), now.date())
+    last = day + timedelta(days=window)
+    if first > last:
+        return []
+
+    bays = None
+    if vehicle_type and get_active_bays():
+        bays = bays_for(vehicle_type)
+        if not bays:
+            return []
+        if len(bays) == len(get_active_bays()):
+            # Every bay takes it, so the ledger alone decides
+            bays = None
+        else:
+            busy = busy_between(bays, first, last)
+
+    requested = datetime.combine(day, start)
+    candidates = []
+    for other_day, occupancy in load_occupancy(first, last).items():
+        for slot in occupancy.feasible_starts(duration):
+            moment = datetime.combine(other_day, slot)
+            if moment <= now or moment == requested:
+                continue
+            places = occupancy.remaining(slot, duration)
+            if bays is not None:
+                places = min(places, free_bays(bays, busy, other_day, slot, duration))
+            if places:
+                candidates.append((abs(moment - requested), moment, places))
+    return [
+        {
+            'date': moment.date().isoformat(),
+            'time': slot_key(moment.time()),
+            'label': moment.strftime('%a %b %d, %I:%M %p'),
+            'remaining': places,
+        }
+        for distance, moment, places in heapq.nsmallest(count, candidates)
+    ]
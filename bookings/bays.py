@@ -0,0 +1,251 @@
+"""
+Wash bays and booking allocation
+
+Every active booking is assigned to a concrete Bay that accepts its
+vehicle type and is free for the booking's whole interval. Allocation is
+first-fit over the candidate bays ordered most specialised first, so
+everyday bookings fill the general bays and leave the bays that also
+take large vehicles free for the vehicles only they can handle. The
+chosen bay is stored on the booking, so day views just read it.
+
+The number of active bays is the shop's capacity per slot; the slot
+ledger (capacity.py) enforces it as a fast, vehicle-agnostic upper bound
+before a bay is picked. With no active bays (see `manage.py setup_bays`)
+allocation is off: bookings are admitted without a bay and the ledger
+alone limits them to MAX_BOOKINGS_PER_SLOT per slot.
+"""
+from collections import defaultdict
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Bay, Booking
+from .scheduling import MAX_BOOKINGS_PER_SLOT, to_minutes
+
+BAYS_CACHE_KEY = 'bays:active'
+
+# Example layout for `manage.py setup_bays --sample`: four car bays and one
+# that also takes trucks and vans. Sample data only; describe the real shop instead.
+SAMPLE_BAYS = (
+    ('Bay 1', 'sedan, suv, motorcycle'),
+    ('Bay 2', 'sedan, suv, motorcycle'),
+    ('Bay 3', 'sedan, suv, motorcycle'),
+    ('Bay 4', 'sedan, suv, motorcycle'),
+    ('Bay 5 (Large vehicles)', ''),
+)
+
+
+def get_active_bays():
+    """Active bays as a cached list, dropped on any Bay change and after CACHE_VERSION_TTL"""
+    bays = cache.get(BAYS_CACHE_KEY)
+    if bays is None:
+        bays = list(Bay.objects.filter(is_active=True))
+        # Expire too: a change only drops the list from this process's cache unless it is shared
+        cache.set(BAYS_CACHE_KEY, bays, timeout=settings.CACHE_VERSION_TTL)
+    return bays
+
+
+def invalidate_bays():
+    """Drop the cached bay list once the current transaction commits"""
+    from .operating_schedule import bump_schedule_version
+    transaction.on_commit(lambda: cache.delete(BAYS_CACHE_KEY))
+    # Default per-slot capacity is the bay count, so the compiled schedule is stale too
+    bump_schedule_version()
+
+
+def slot_capacity():
+    """Bookings that may run at once: one per active bay (MAX_BOOKINGS_PER_SLOT with no bays)"""
+    return len(get_active_bays()) or MAX_BOOKINGS_PER_SLOT
+
+
+def _specialisation(bay):
+    """Sort key putting bays that accept fewer vehicle types first"""
+    accepted = bay.get_vehicle_types()
+    return (len(accepted) if accepted else len(Booking.VEHICLE_TYPES) + 1, bay.display_order, bay.id)
+
+
+def _busy_intervals(booking, bays):
+    """{bay id: [(start, end) minutes]} for the other active bookings on those bays that day"""
+    from .capacity import RELEASED_STATUSES
+
+    busy = defaultdict(list)
+    others = Booking.objects.filter(
+        bay__in=bays, booking_date=booking.booking_date
+    ).exclude(status__in=RELEASED_STATUSES)
+    if booking.pk:
+        others = others.exclude(pk=booking.pk)
+    for bay_id, start, duration in others.values_list('bay_id', 'booking_time', 'duration'):
+        begin = to_minutes(start)
+        busy[bay_id].append((begin, begin + duration))
+    return busy
+
+
+def bays_for(vehicle_type):
+    """Active bays that accept a vehicle type, most specialised first"""
+    return sorted((bay for bay in get_active_bays() if bay.accepts(vehicle_type)), key=_specialisation)
+
+
+def busy_between(bays, start, end):
+    """{(bay id, date): [(start, end) minutes]} for the active bookings on those bays from start to end"""
+    from .capacity import RELEASED_STATUSES
+
+    busy = defaultdict(list)
+    for bay_id, booking_date, begin, duration in Booking.objects.filter(
+        bay__in=bays, booking_date__range=(start, end)
+    ).exclude(status__in=RELEASED_STATUSES).values_list('bay_id', 'booking_date', 'booking_time', 'duration'):
+        begin = to_minutes(begin)
+        busy[(bay_id, booking_date)].append((begin, begin + duration))
+    return busy
+
+
+def free_bays(bays, busy, day, start, duration):
+    """How many of the bays are free from start for duration minutes on day"""
+    begin = to_minutes(start)
+    end = begin + duration
+    return sum(
+        all(end <= taken_start or taken_end <= begin for taken_start, taken_end in busy.get((bay.id, day), ()))
+        for bay in bays
+    )
+
+
+def needs_allocation(booking, previous):
+    """
+    True if a booking about to be saved should be (re)assigned a bay
+
+    previous is the booking's stored tracked state (None if new). A bay
+    set explicitly, e.g. in the Django admin, is left alone, and nothing is
+    allocated while no bays are set up.
+    """
+    from .capacity import occupies_slot
+
+    if not occupies_slot(booking.status) or not get_active_bays():
+        return False
+    if previous is None:
+        return booking.bay_id is None
+    if booking.bay_id != previous['bay_id']:
+        return False
+    if booking.bay_id is None or not occupies_slot(previous['status']):
+        return True
+    return any(
+        getattr(booking, field) != previous[field]
+        for field in ('booking_date', 'booking_time', 'duration', 'vehicle_type')
+    )
+
+
+def find_bay(booking, lock=False):
+    """
+    Return the first bay that can take the booking, or None
+
+    Keeps the booking's current bay when it is still suitable. With
+    lock=True the candidate bays are locked (call inside transaction.atomic)
+    so concurrent allocations can't pick the same bay.
+    """
+    candidates = [bay for bay in get_active_bays() if bay.accepts(booking.vehicle_type)]
+    if not candidates:
+        return None
+    if lock:
+        list(Bay.objects.select_for_update().filter(id__in=[bay.id for bay in candidates]).order_by('id'))
+
+    candidates.sort(key=_specialisation)
+    if booking.bay_id is not None:
+        candidates.sort(key=lambda bay: bay.id != booking.bay_id)
+
+    busy = _busy_intervals(booking, candidates)
+    return _first_free(candidates, busy.__getitem__, booking)
+
+
+def _first_free(candidates, intervals_for, booking):
+    """First bay among candidates with no interval overlapping the booking"""
+    begin = to_minutes(booking.booking_time)
+    end = begin + booking.duration
+    for bay in candidates:
+        if all(end <= taken_start or taken_end <= begin for taken_start, taken_end in intervals_for(bay.id)):
+            return bay
+    return None
+
+
+class BayPlanner:
+    """
+    First-fit allocation for many new bookings at once
+
+    Loads every active booking on the given dates in one query (locking
+    the bays), then places bookings in memory, so a batch costs the same
+    as a single allocation.
+    """
+
+    def __init__(self, dates):
+        from .capacity import RELEASED_STATUSES
+
+        self.bays = sorted(get_active_bays(), key=_specialisation)
+        list(Bay.objects.select_for_update().filter(id__in=[bay.id for bay in self.bays]).order_by('id'))
+        self.busy = defaultdict(list)
+        for bay_id, booking_date, start, duration in Booking.objects.filter(
+            bay__in=self.bays, booking_date__in=set(dates)
+        ).exclude(status__in=RELEASED_STATUSES).values_list('bay_id', 'booking_date', 'booking_time', 'duration'):
+            begin = to_minutes(start)
+            self.busy[(bay_id, booking_date)].append((begin, begin + duration))
+
+    def place(self, booking):
+        """Assign booking.bay and mark it busy; return False if no suitable bay is free"""
+        if not self.bays:
+            booking.bay = None
+            return True
+        candidates = [bay for bay in self.bays if bay.accepts(booking.vehicle_type)]
+        bay = _first_free(candidates, lambda bay_id: self.busy[(bay_id, booking.booking_date)], booking)
+        if bay is not None:
+            begin = to_minutes(booking.booking_time)
+            self.busy[(bay.id, booking.booking_date)].append((begin, begin + booking.duration))
+        booking.bay = bay
+        return bay is not None
+
+
+def allocate_bay(booking):
+    """Assign booking.bay under a lock; return False if no suitable bay is free (True with no bays set up)"""
+    if not get_active_bays():
+        booking.bay = None
+        return True
+    bay = find_bay(booking, lock=True)
+    booking.bay = bay
+    return bay is not None
+
+
+def reallocate_bookings(queryset):
+    """Re-run allocation for bookings changed in bulk (queryset.update() skips signals)"""
+    if not get_active_bays():
+        return
+    for booking in queryset.order_by('booking_date', 'booking_time', 'id'):
+        bay = find_bay(booking, lock=True)
+        if bay is None:
+            print(f'[WARNING] No free bay for booking {booking.pk}; left unallocated')
+        if (bay.id if bay else None) != booking.bay_id:
+            Booking.objects.filter(pk=booking.pk).update(bay=bay)
+
+
+def setup_bays(layout):
+    """
+    Create the (name, vehicle types) bays that don't exist yet, by name
+
+    Then allocates upcoming active bookings that have no bay. Returns the
+    created bays.
+    """
+    from .capacity import RELEASED_STATUSES
+
+    with transaction.atomic():
+        existing = set(Bay.objects.values_list('name', flat=True))
+        order = Bay.objects.count()
+        created = []
+        for name, vehicle_types in layout:
+            if name in existing:
+                continue
+            order += 1
+            created.append(Bay.objects.create(name=name, vehicle_types=vehicle_types, display_order=order))
+        if created:
+            # The signal's cache invalidation runs on commit; allocate against the new bays now
+            cache.delete(BAYS_CACHE_KEY)
+            reallocate_bookings(
+                Booking.objects.filter(bay__isnull=True, booking_date__gte=date.today())
+                .exclude(status__in=RELEASED_STATUSES)
+            )
+    return created
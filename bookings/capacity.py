@@ -0,0 +1,109 @@
+"""
+Slot capacity ledger
+
+SlotCapacity keeps one row per (date, time slot) with the number of active
+bookings covering it, so admission is a conditional UPDATE per covered
+slot instead of a COUNT over Booking. A booking covers every slot its
+duration overlaps (see scheduling.py) unless it is cancelled.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from . import versioning
+from .models import SlotCapacity
+from .operating_schedule import day_schedule
+from .scheduling import DEFAULT_DURATION, covered_slots
+
+# Statuses that do not occupy a slot
+RELEASED_STATUSES = ('cancelled',)
+
+# Cache key holding the ledger version; readers include it in their own keys
+LEDGER_VERSION_KEY = 'slot-ledger:version'
+
+
+def occupies_slot(status):
+    """Return True if a booking with this status takes up a slot"""
+    return status not in RELEASED_STATUSES
+
+
+def ledger_version():
+    """Return a token that changes whenever any slot count changes"""
+    return versioning.version(LEDGER_VERSION_KEY)
+
+
+def bump_ledger_version():
+    """Invalidate cached ledger readers once the current transaction commits"""
+    versioning.bump(LEDGER_VERSION_KEY)
+
+
+def _slot_row(booking_date, booking_time):
+    SlotCapacity.objects.get_or_create(booking_date=booking_date, booking_time=booking_time)
+    return SlotCapacity.objects.filter(booking_date=booking_date, booking_time=booking_time)
+
+
+class _SlotFull(Exception):
+    pass
+
+
+def reserve_slot(booking_date, booking_time, duration=DEFAULT_DURATION, capacity=None):
+    """
+    Atomically take one place in every slot a booking covers
+
+    Returns False, leaving the ledger untouched, if any of them is full.
+    Slots are taken in time order so concurrent reservations can't deadlock.
+    capacity defaults to the operating schedule's capacity for the date.
+    """
+    if capacity is None:
+        capacity = day_schedule(booking_date).capacity
+    try:
+        with transaction.atomic():
+            for slot in covered_slots(booking_time, duration):
+                updated = _slot_row(booking_date, slot).filter(
+                    booked_count__lt=capacity
+                ).update(booked_count=F('booked_count') + 1)
+                if not updated:
+                    raise _SlotFull
+    except _SlotFull:
+        return False
+    bump_ledger_version()
+    return True
+
+
+def release_slot(booking_date, booking_time, count=1):
+    """Give back places in a slot"""
+    SlotCapacity.objects.filter(
+        booking_date=booking_date, booking_time=booking_time
+    ).update(booked_count=Greatest(F('booked_count') - count, 0))
+    bump_ledger_version()
+
+
+def apply_slot_deltas(deltas):
+    """Apply {(date, time): delta} changes to the ledger without a capacity check"""
+    for (booking_date, booking_time), delta in deltas.items():
+        if delta > 0:
+            _slot_row(booking_date, booking_time).update(booked_count=F('booked_count') + delta)
+            bump_ledger_version()
+        elif delta < 0:
+            release_slot(booking_date, booking_time, -delta)
+
+
+def slot_deltas(changes):
+    """
+    Ledger changes for bookings moving between states
+
+    changes is a list of (old, new) Booking tracked-state dicts, where None
+    means the booking doesn't exist on that side.
+    """
+    deltas = Counter()
+    for old, new in changes:
+        if old and occupies_slot(old['status']):
+            for slot in covered_slots(old['booking_time'], old['duration']):
+                deltas[(old['booking_date'], slot)] -= 1
+        if new and occupies_slot(new['status']):
+            for slot in covered_slots(new['booking_time'], new['duration']):
+                deltas[(new['booking_date'], slot)] += 1
+    return {slot: delta for slot, delta in deltas.items() if delta}
+
@@ -0,0 +1,162 @@
+"""
+Versioned service catalog cache
+
+The whole Service table is snapshotted into immutable CatalogService
+entries with features and duration pre-formatted. Snapshots live in the
+cache under a version token and in a per-process copy, so a page render
+costs one cache read for the version. Any Service save or delete bumps
+the version (see signals.py); processes that don't share the cache pick
+the change up when their token expires (see versioning.py).
+"""
+from dataclasses import dataclass
+
+from django.core.cache import cache
+
+from . import versioning
+from .models import Service
+
+VERSION_KEY = 'service-catalog:version'
+
+# Bounds how long snapshots under an old version stay in the cache
+SNAPSHOT_TTL = 60 * 60 * 24
+
+# Prices for bookings whose service_id isn't in the catalog
+FALLBACK_PRICES = {
+    'basic': 25.00,
+    'premium': 45.00,
+    'deluxe': 85.00,
+}
+DEFAULT_PRICE = 25.00
+
+_local_snapshot = None
+
+
+@dataclass(frozen=True)
+class CatalogService:
+    """Read-only copy of a Service for rendering; mirrors the model's template API"""
+    id: int
+    name: str
+    description: str
+    category: str
+    category_display: str
+    price: object
+    duration: int
+    duration_display: str
+    icon: str
+    features: str
+    features_list: tuple
+    is_active: bool
+    display_order: int
+
+    @classmethod
+    def from_service(cls, service):
+        return cls(
+            id=service.id,
+            name=service.name,
+            description=service.description,
+            category=service.category,
+            category_display=service.get_category_display(),
+            price=service.price,
+            duration=service.duration,
+            duration_display=service.get_duration_display(),
+            icon=service.icon,
+            features=service.features,
+            features_list=tuple(service.get_features_list()),
+            is_active=service.is_active,
+            display_order=service.display_order,
+        )
+
+    def get_features_list(self):
+        return self.features_list
+
+    def get_duration_display(self):
+        return self.duration_display
+
+    def get_category_display(self):
+        return self.category_display
+
+
+class Catalog:
+    """All services in Service.Meta ordering, with lookups by id"""
+
+    def __init__(self, services):
+        self.services = tuple(services)
+        self.by_id = {service.id: service for service in self.services}
+
+    def active(self, category=None):
+        """Active services, optionally limited to one category"""
+        return [
+            service for service in self.services
+            if service.is_active and (category is None or service.category == category)
+        ]
+
+    def get(self, service_id, active_only=False):
+        """Return the service with this id, or None"""
+        try:
+            service = self.by_id.get(int(service_id))
+        except (TypeError, ValueError):
+            return None
+        if service is None or (active_only and not service.is_active):
+            return None
+        return service
+
+    def for_admin(self):
+        """Every service, ordered as the admin Services tab lists them"""
+        return sorted(self.services, key=lambda service: (service.category, service.display_order, service.name))
+
+
+def catalog_version():
+    return versioning.version(VERSION_KEY)
+
+
+def bump_catalog_version():
+    """Invalidate every cached snapshot once the current transaction commits"""
+    versioning.bump(VERSION_KEY)
+
+
+def get_catalog():
+    """Return the current catalog snapshot, building it on a miss"""
+    global _local_snapshot
+
+    version = catalog_version()
+    if _local_snapshot is not None and _local_snapshot[0] == version:
+        return _local_snapshot[1]
+
+    key = f'service-catalog:{version}'
+    catalog = cache.get(key)
+    if catalog is None:
+        catalog = Catalog(CatalogService.from_service(service) for service in Service.objects.all())
+        cache.set(key, catalog, timeout=SNAPSHOT_TTL)
+
+    _local_snapshot = (version, catalog)
+    return catalog
+
+
+def service_type_for(service):
+    """Map a catalog service to the closest Booking.SERVICE_TYPES key by name"""
+    name = service.name.lower()
+    if 'basic' in name:
+        return 'basic'
+    elif 'deluxe' in name:
+        return 'deluxe'
+    elif 'premium' in name or 'detail' in name:
+        return 'premium'
+    elif 'interior' in name:
+        return 'interior'
+    elif 'full' in name:
+        return 'fulldetail'
+    return 'basic'  # Default fallback
+
+
+def price_booking(booking, service_id, catalog=None):
+    """Set price, duration and service type on an unsaved booking from the chosen catalog service"""
+    if not service_id:
+        booking.price = DEFAULT_PRICE
+        return
+    service = (catalog or get_catalog()).get(service_id)
+    if service is None:
+        booking.price = FALLBACK_PRICES.get(booking.service, DEFAULT_PRICE)
+        return
+    booking.price = service.price
+    booking.duration = service.duration
+    booking.service = service_type_for(service)
@@ -0,0 +1,84 @@
+"""
+Staff dashboard tabs
+
+Each tab of the staff dashboard (bookings, users, services) is served by
+its own fragment endpoint and fetched when the tab is shown, so a page
+load or a status change only computes what is on screen. Rendered
+fragments are cached per tab and query string under version tokens:
+the bookings tab changes with any booking change, the users tab with
+account changes and booking changes (it shows the profile counters), and
+the services tab with the service catalog. Fragments hold no per-user
+data (the dashboard page supplies the CSRF token), so staff share them.
+
+Status changes made from the page come back as JSON with the statistic
+deltas (stat_deltas), so the cards and rows are patched in place.
+"""
+import hashlib
+from decimal import Decimal
+
+from django.core.cache import cache
+
+from . import versioning
+
+BOOKINGS_VERSION_KEY = 'dashboard:bookings:version'
+USERS_VERSION_KEY = 'dashboard:users:version'
+
+# Versions handle invalidation; this bounds relative dates ("3 days ago") and orphans
+FRAGMENT_TTL = 60 * 10
+
+
+def bookings_version():
+    return versioning.version(BOOKINGS_VERSION_KEY)
+
+
+def bump_bookings_version():
+    """Invalidate cached booking (and user) fragments once the current transaction commits"""
+    versioning.bump(BOOKINGS_VERSION_KEY)
+
+
+def users_version():
+    return versioning.version(USERS_VERSION_KEY)
+
+
+def bump_users_version():
+    """Invalidate cached user fragments once the current transaction commits"""
+    versioning.bump(USERS_VERSION_KEY)
+
+
+def cached_fragment(tab, version, params, render):
+    """Return the rendered fragment for a tab and query string, calling render() on a miss"""
+    digest = hashlib.md5(params.urlencode().encode()).hexdigest()
+    key = f'dashboard:{tab}:{version}:{digest}'
+    html = cache.get(key)
+    if html is None:
+        html = render()
+        cache.set(key, html, timeout=FRAGMENT_TTL)
+    return html
+
+
+# Statuses with their own statistic card (key f'{status}_bookings')
+STAT_STATUSES = ('pending', 'confirmed', 'completed', 'cancelled')
+
+
+def stat_deltas(changes):
+    """
+    Change to each dashboard statistic for status changes
+
+    changes is an iterable of (old status, new status, price), with None
+    for the status of a booking that doesn't exist on that side. Only the
+    statistics that moved are returned, so the page can patch its cards
+    instead of reloading.
+    """
+    deltas = {}
+    for old_status, new_status, price in changes:
+        if old_status == new_status:
+            continue
+        if old_status is None or new_status is None:
+            deltas['total_bookings'] = deltas.get('total_bookings', 0) + (1 if old_status is None else -1)
+        for status, step in ((old_status, -1), (new_status, 1)):
+            if status in STAT_STATUSES:
+                key = f'{status}_bookings'
+                deltas[key] = deltas.get(key, 0) + step
+            if status == 'completed':
+                deltas['revenue'] = deltas.get('revenue', 0) + step * Decimal(str(price or 0))
+    return {key: value for key, value in deltas.items() if value}
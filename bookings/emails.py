@@ -1,8 +1,161 @@
-def send_booking_confirmation_email(booking):
+"""
+Booking emails through a durable outbox
+
+Emails are not sent while a request is being handled. The change that
+calls for one (a booking becoming confirmed, see tracking.py) writes an
+EmailOutbox row in the same transaction, so the email exists exactly when
+the change does, plus a send_outbox task for the task worker
+(`manage.py send_outbox_emails` does the same on demand). Due rows are
+claimed in a short transaction (marked sending, with a lease; see
+queueing.py, shared with the task queue), then sent
+over a single SMTP connection with each result saved as soon as it is
+known, so no lock is held during SMTP and a crash mid-batch only risks
+resending the one email in flight. Claims older than
+EMAIL_OUTBOX_LEASE_SECONDS are returned to the queue. A failed send is
+retried with exponential backoff until EMAIL_OUTBOX_MAX_ATTEMPTS, after
+which the row is marked failed and left for staff to inspect in the
+Django admin.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from . import queueing
+from .models import Booking, EmailOutbox
+from .tasks import enqueue, task
+
+# Longest wait between retries of one email
+MAX_RETRY_DELAY = timedelta(hours=6)
+
+
+def confirmation_email(booking):
+    """Unsaved outbox row confirming a booking to its customer"""
+    return EmailOutbox(
+        kind='booking_confirmation',
+        booking=booking,
+        to_email=booking.customer_email,
+        subject='Booking Confirmation - Car Wash Pro',
+        body=render_to_string('emails/booking_confirmation.txt', {'booking': booking}),
+    )
+
+
+def queue_confirmations(booking_ids):
+    """Write confirmation emails for the bookings into the outbox (call inside the change's transaction)"""
+    if not booking_ids:
+        return []
+    bookings = Booking.objects.filter(id__in=booking_ids).exclude(customer_email='')
+    queued = EmailOutbox.objects.bulk_create([confirmation_email(booking) for booking in bookings])
+    if queued:
+        enqueue(send_outbox, unique=True)
+    return queued
+
+
+def retry_delay(attempts):
+    """Wait before the next try after attempts failed sends"""
+    return queueing.backoff(attempts, settings.EMAIL_OUTBOX_RETRY_SECONDS, MAX_RETRY_DELAY)
+
+
+def _record_failure(email, error, now):
+    email.attempts += 1
+    email.last_error = str(error)
+    if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        email.status = 'failed'
+    else:
+        email.status = 'pending'
+        email.next_attempt_at = now + retry_delay(email.attempts)
+
+
+def _save_result(email):
+    email.locked_at = None
+    email.save(update_fields=['status', 'attempts', 'next_attempt_at', 'locked_at', 'last_error', 'sent_at'])
+
+
+def release_stale():
+    """Give emails whose sender stopped mid-batch back to the queue"""
+    stale = queueing.expired_claims(EmailOutbox.objects.filter(status='sending'), settings.EMAIL_OUTBOX_LEASE_SECONDS)
+    return stale.update(status='pending', locked_at=None)
+
+
+def claim_batch(batch_size=None):
+    """Lock and mark sending up to batch_size due emails; returns them"""
+    return queueing.claim_batch(
+        EmailOutbox.objects.filter(status='pending'), 'next_attempt_at', batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE,
+        status='sending',
+    )
+
+
+def send_batch(batch_size=None):
     """
-    Placeholder function - Email will be sent via EmailJS from admin dashboard
-    Returns True to indicate booking was processed
+    Send up to batch_size due emails over one SMTP connection
+
+    The batch is claimed with SKIP LOCKED, so several senders can run at
+    once without sending the same email twice. Returns (sent, failed)
+    counts, failed counting every email that will be retried or gave up.
     """
-    # Email sending is handled by EmailJS on the frontend
-    # See admin dashboard template for EmailJS implementation
-    return True
+    batch = claim_batch(batch_size)
+    if not batch:
+        return 0, 0
+
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        print(f'[WARNING] Could not connect to the mail server: {e}')
+        now = timezone.now()
+        for email in batch:
+            _record_failure(email, e, now)
+            _save_result(email)
+        return 0, len(batch)
+
+    try:
+        for email in batch:
+            try:
+                EmailMessage(
+                    email.subject, email.body, settings.DEFAULT_FROM_EMAIL, [email.to_email],
+                    connection=connection,
+                ).send()
+            except Exception as e:
+                print(f'[WARNING] Email {email.id} to {email.to_email} failed: {e}')
+                _record_failure(email, e, timezone.now())
+            else:
+                email.status = 'sent'
+                email.attempts += 1
+                email.sent_at = timezone.now()
+            _save_result(email)
+    finally:
+        connection.close()
+
+    sent = sum(email.status == 'sent' for email in batch)
+    return sent, len(batch) - sent
+
+
+def send_due_emails(batch_size=None):
+    """Send batches until no due email is left; returns (sent, failed) totals"""
+    release_stale()
+    sent = failed = 0
+    while True:
+        batch_sent, batch_failed = send_batch(batch_size)
+        if not batch_sent and not batch_failed:
+            return sent, failed
+        sent += batch_sent
+        failed += batch_failed
+        if not batch_sent:
+            # Everything in this batch failed; leave the rest until the next run
+            return sent, failed
+
+
+@task
+def send_outbox():
+    """Send every due outbox email, then schedule the next run for any retries (run by the task worker)"""
+    send_due_emails()
+    retry = EmailOutbox.objects.filter(status='pending').order_by('next_attempt_at').first()
+    claimed = EmailOutbox.objects.filter(status='sending').order_by('locked_at').first()
+    due = [retry.next_attempt_at] if retry is not None else []
+    if claimed is not None:
+        # Picked up again if its sender never finishes
+        due.append(queueing.lease_expiry(claimed.locked_at, settings.EMAIL_OUTBOX_LEASE_SECONDS))
+    if due:
+        enqueue(send_outbox, delay=max(min(due) - timezone.now(), timedelta()), unique=True)
@@ -0,0 +1,150 @@
+"""
+Fleet (bulk) bookings
+
+Books many vehicles for one account in a single pass instead of one
+create_booking request each:
+
+1. Every row is validated with BookingForm and priced from one catalog
+   snapshot.
+2. Inside one transaction, the ledger rows for all requested dates are
+   locked and read in a single query, and bays are planned in memory
+   (bays.BayPlanner). Rows are admitted in order while capacity and a
+   suitable bay remain.
+3. The ledger increments for all admitted rows are applied with one
+   UPDATE and the bookings are inserted with bulk_create.
+
+In all-or-nothing mode any row error books nothing; in best-effort mode
+the rows that fit are booked and the rest are reported.
+"""
+from collections import Counter
+from datetime import date
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from .bays import BayPlanner
+from .capacity import bump_ledger_version
+from .catalog import get_catalog, price_booking
+from .forms import BookingForm
+from .models import Booking, SlotCapacity
+from .operating_schedule import day_schedule
+from .scheduling import covered_slots, ends_by_closing
+from .tracking import record_booking_changes
+
+# Most rows accepted in one request or upload
+MAX_FLEET_ROWS = 100
+
+ALL_OR_NOTHING = 'all_or_nothing'
+BEST_EFFORT = 'best_effort'
+MODES = (ALL_OR_NOTHING, BEST_EFFORT)
+
+
+class FleetResult:
+    """Bookings created and {row index: {field: [messages]}} for rejected rows"""
+
+    def __init__(self, created=None, errors=None):
+        self.created = created or []
+        self.errors = errors or {}
+
+    def as_dict(self):
+        return {
+            'created': [booking.id for booking in self.created],
+            'errors': [{'row': row, 'errors': errors} for row, errors in sorted(self.errors.items())],
+        }
+
+
+def _validate(user, rows, catalog):
+    """Return ({row: unsaved booking}, {row: errors}) for the submitted rows"""
+    bookings, errors = {}, {}
+    today = date.today()
+    for index, row in enumerate(rows):
+        data = dict(row)
+        if data.get('service_id'):
+            # The catalog service decides the type; the form just needs a valid one
+            data.setdefault('service', 'basic')
+        form = BookingForm(data)
+        if not form.is_valid():
+            errors[index] = {field: list(messages) for field, messages in form.errors.items()}
+            continue
+
+        booking = form.save(commit=False)
+        booking.user = user
+        price_booking(booking, row.get('service_id'), catalog)
+        if booking.booking_date < today:
+            errors[index] = {'booking_date': ['Cannot book appointments in the past.']}
+        elif not ends_by_closing(booking.booking_time, booking.duration, day_schedule(booking.booking_date)):
+            errors[index] = {'booking_time': ['The service would run past closing time.']}
+        else:
+            bookings[index] = booking
+    return bookings, errors
+
+
+def _lock_ledger(bookings):
+    """Create any missing ledger rows for the bookings' slots, then lock and return them by slot"""
+    slots = {
+        (booking.booking_date, slot)
+        for booking in bookings
+        for slot in covered_slots(booking.booking_time, booking.duration)
+    }
+    SlotCapacity.objects.bulk_create(
+        [SlotCapacity(booking_date=day, booking_time=slot) for day, slot in slots],
+        ignore_conflicts=True,
+    )
+    rows = SlotCapacity.objects.select_for_update().filter(
+        booking_date__in={day for day, slot in slots}
+    ).order_by('booking_date', 'booking_time')
+    return {(row.booking_date, row.booking_time): row for row in rows}
+
+
+def book_fleet(user, rows, mode=ALL_OR_NOTHING):
+    """Validate, admit and create bookings for every row; return a FleetResult"""
+    if mode not in MODES:
+        raise ValueError(f'Unknown fleet booking mode: {mode}')
+
+    bookings, errors = _validate(user, rows, get_catalog())
+    if not bookings or (errors and mode == ALL_OR_NOTHING):
+        return FleetResult(errors=errors)
+
+    with transaction.atomic():
+        ledger = _lock_ledger(bookings.values())
+        planner = BayPlanner(booking.booking_date for booking in bookings.values())
+        taken = Counter()
+        admitted = []
+
+        for index, booking in bookings.items():
+            slots = [(booking.booking_date, slot) for slot in covered_slots(booking.booking_time, booking.duration)]
+            capacity = day_schedule(booking.booking_date).capacity
+            if any(ledger[slot].booked_count + taken[slot] >= capacity for slot in slots):
+                errors[index] = {'booking_time': [
+                    f'{booking.booking_time.strftime("%I:%M %p")} on {booking.booking_date.strftime("%B %d, %Y")} is fully booked.'
+                ]}
+            elif not planner.place(booking):
+                errors[index] = {'vehicle_type': [
+                    f'No bay that can take a {booking.get_vehicle_type_display().lower()} is free at that time.'
+                ]}
+            else:
+                taken.update(slots)
+                admitted.append(booking)
+
+        if not admitted or (errors and mode == ALL_OR_NOTHING):
+            transaction.set_rollback(True)
+            return FleetResult(errors=errors)
+
+        # One UPDATE for every slot the batch takes places in
+        SlotCapacity.objects.filter(id__in=[ledger[slot].id for slot in taken]).update(
+            booked_count=F('booked_count') + Case(
+                *[When(id=ledger[slot].id, then=Value(count)) for slot, count in taken.items()],
+                output_field=IntegerField(),
+            )
+        )
+        bump_ledger_version()
+
+        created = Booking.objects.bulk_create(admitted)
+        # bulk_create skips signals; the slots were reserved above
+        record_booking_changes(
+            [(None, booking.get_tracked_state()) for booking in created],
+            slots_reserved=True,
+            booking_ids=[booking.id for booking in created],
+        )
+
+    return FleetResult(created=created, errors=errors)
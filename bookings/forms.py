@@ -1,3 +1,4 @@
+from datetime import datetime
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
@@ -27,25 +28,10 @@ class UserRegisterForm(UserCreationForm):
 class BookingForm(forms.ModelForm):
     """Booking creation form"""
     
-    # Define available time slots (8 AM to 5 PM)
-    TIME_SLOTS = [
-        ('08:00:00', '8:00 AM'),
-        ('09:00:00', '9:00 AM'),
-        ('10:00:00', '10:00 AM'),
-        ('11:00:00', '11:00 AM'),
-        ('12:00:00', '12:00 PM'),
-        ('13:00:00', '1:00 PM'),
-        ('14:00:00', '2:00 PM'),
-        ('15:00:00', '3:00 PM'),
-        ('16:00:00', '4:00 PM'),
-        ('17:00:00', '5:00 PM'),
-    ]
-    
+    # Choices come from the operating schedule (see __init__)
     booking_time = forms.ChoiceField(
-        choices=TIME_SLOTS,
         widget=forms.Select(attrs={'class': 'form-control', 'required': True}),
-        label='Appointment Time',
-        help_text='Note: Each time slot has a maximum of 5 bookings'
+        label='Appointment Time'
     )
     
     class Meta:
@@ -76,12 +62,40 @@ class BookingForm(forms.ModelForm):
         user = kwargs.pop('user', None)
         super().__init__(*args, **kwargs)
         
+        # Every start time the schedule opens on some day; clean() checks the chosen date
+        from .bays import slot_capacity
+        from .operating_schedule import get_schedule
+        self.fields['booking_time'].choices = [
+            (slot.strftime('%H:%M:%S'), slot.strftime('%I:%M %p').lstrip('0'))
+            for slot in get_schedule().all_slots
+        ]
+        self.fields['booking_time'].help_text = f'Note: Each time slot has a maximum of {slot_capacity()} bookings'
+        
         # Pre-fill customer information from user profile if available
         if user and user.is_authenticated:
             self.fields['customer_name'].initial = user.get_full_name() or user.username
             self.fields['customer_email'].initial = user.email
             if hasattr(user, 'profile'):
                 self.fields['customer_phone'].initial = user.profile.phone
+    
+    def clean_booking_time(self):
+        """Convert the selected slot to a time so it compares with stored bookings"""
+        return datetime.strptime(self.cleaned_data['booking_time'], '%H:%M:%S').time()
+    
+    def clean(self):
+        """Check the chosen time is open on the chosen date"""
+        from .operating_schedule import day_schedule
+        cleaned_data = super().clean()
+        booking_date = cleaned_data.get('booking_date')
+        booking_time = cleaned_data.get('booking_time')
+        if booking_date and booking_time:
+            day = day_schedule(booking_date)
+            if day.closed:
+                reason = f' ({day.note})' if day.note else ''
+                self.add_error('booking_date', f'We are closed on {booking_date.strftime("%B %d, %Y")}{reason}. Please choose another date.')
+            elif booking_time not in day.slots:
+                self.add_error('booking_time', f'{booking_time.strftime("%I:%M %p")} is outside our hours on {booking_date.strftime("%B %d, %Y")}.')
+        return cleaned_data
 
 
 class BookingStatusForm(forms.ModelForm):
@@ -93,3 +107,20 @@ class BookingStatusForm(forms.ModelForm):
         widgets = {
             'status': forms.Select(attrs={'class': 'form-control'})
         }
+
+
+class FleetUploadForm(forms.Form):
+    """CSV upload of many bookings for one account (Django admin)"""
+    MODE_CHOICES = [
+        ('all_or_nothing', 'All or nothing - book no rows if any row fails'),
+        ('best_effort', 'Best effort - book the rows that fit, report the rest'),
+    ]
+    
+    user = forms.ModelChoiceField(queryset=User.objects.order_by('username'), label='Book for account')
+    csv_file = forms.FileField(
+        label='CSV file',
+        help_text='Header row plus one booking per row. Columns: customer_name, customer_email, customer_phone, '
+                  'vehicle_type, vehicle_plate, service or service_id, booking_date (YYYY-MM-DD), '
+                  'booking_time (HH:MM:SS), notes'
+    )
+    mode = forms.ChoiceField(choices=MODE_CHOICES, initial='all_or_nothing')
@@ -0,0 +1,64 @@
+"""
+Idempotency keys for booking submissions
+
+The booking form carries a random key issued when it is rendered. The
+first successful submission records (user, key) under a unique
+constraint in the same transaction as the booking; a replay of that POST
+(double click, mobile retry) finds the record and gets the original
+result back without touching the ledger. The key is claimed before any
+capacity is taken, so a concurrent duplicate blocks on the unique index
+and then sees the first one's result. Failed submissions roll the claim
+back, so the same form can be corrected and resent.
+
+Keys are honoured for IDEMPOTENCY_KEY_RETENTION_HOURS; the task worker
+(`manage.py run_tasks`) deletes older ones every hour.
+"""
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+FIELD_NAME = 'idempotency_key'
+MAX_KEY_LENGTH = 64
+
+
+def new_key():
+    """A fresh key to embed in a form"""
+    return secrets.token_urlsafe(32)
+
+
+def submitted_key(request):
+    """The key posted with a form, or a fresh one for clients that didn't send a usable key"""
+    key = request.POST.get(FIELD_NAME, '')
+    return key if 0 < len(key) <= MAX_KEY_LENGTH else new_key()
+
+
+def _cutoff():
+    """Keys created before this have expired"""
+    return timezone.now() - timedelta(hours=settings.IDEMPOTENCY_KEY_RETENTION_HOURS)
+
+
+def find_result(user, key):
+    """Return the IdempotencyKey recorded for a submission, or None if it hasn't succeeded (or expired)"""
+    return IdempotencyKey.objects.filter(user=user, key=key, created_at__gte=_cutoff()).first()
+
+
+def claim(user, key):
+    """Record the key inside the caller's transaction; None if another request already has it"""
+    try:
+        with transaction.atomic():
+            # An expired record not yet purged would otherwise block the key forever
+            IdempotencyKey.objects.filter(user=user, key=key, created_at__lt=_cutoff()).delete()
+            return IdempotencyKey.objects.create(user=user, key=key)
+    except IntegrityError:
+        return None
+
+
+def purge_expired():
+    """Delete keys older than the retention window; returns how many were removed"""
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=_cutoff()).delete()
+    return deleted
@@ -0,0 +1,117 @@
+"""
+Live booking feed for the staff dashboard
+
+Booking creations, status changes and deletions are published once their
+transaction commits and pushed to every open staff dashboard as
+server-sent events (views.booking_events, served under carwash/asgi.py).
+Each connection is an asyncio.Queue subscribed to the broker and costs
+nothing while idle apart from a periodic keep-alive comment.
+
+LocalBroker fans events out within this process only. It stands in for
+a shared pub/sub channel: with several server processes, each dashboard
+sees the changes made through its own process, so deployments serving
+the feed run a single worker (see gunicorn.conf.py).
+"""
+import asyncio
+import json
+import threading
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from .dashboard import stat_deltas
+
+BOOKING_CREATED = 'booking-created'
+STATUS_CHANGED = 'status-changed'
+BOOKING_DELETED = 'booking-deleted'
+
+# Events buffered per connection; a client that falls this far behind loses the oldest
+QUEUE_SIZE = 100
+
+
+def _offer(queue, event):
+    """Queue an event for one subscriber, dropping its oldest event if it is full"""
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(event)
+
+
+class LocalBroker:
+    """In-process fan-out: every subscriber queue receives every published event"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self):
+        """Return a new queue fed on the running event loop"""
+        queue = asyncio.Queue(QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[queue] = asyncio.get_running_loop()
+        return queue
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            self._subscribers.pop(queue, None)
+
+    def publish(self, event):
+        """Hand an event to every subscriber; safe to call from any thread"""
+        with self._lock:
+            subscribers = list(self._subscribers.items())
+        for queue, loop in subscribers:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, event)
+            except RuntimeError:
+                # The connection's loop has closed without unsubscribing
+                self.unsubscribe(queue)
+
+
+broker = LocalBroker()
+
+
+def _event(name, booking_id, old, new):
+    from .models import Booking
+
+    state = new or old
+    old_status = old['status'] if old else None
+    new_status = new['status'] if new else None
+    return {
+        'event': name,
+        'id': booking_id,
+        'status': state['status'],
+        'status_display': dict(Booking.STATUS_CHOICES).get(state['status'], state['status']),
+        'booking_date': state['booking_date'],
+        'booking_time': state['booking_time'],
+        'deltas': stat_deltas([(old_status, new_status, state['price'])]),
+    }
+
+
+def booking_events(booking_ids, changes):
+    """Feed events for (old, new) tracked-state changes to the given bookings"""
+    events = []
+    for booking_id, (old, new) in zip(booking_ids, changes):
+        if old is None and new is not None:
+            events.append(_event(BOOKING_CREATED, booking_id, old, new))
+        elif new is None and old is not None:
+            events.append(_event(BOOKING_DELETED, booking_id, old, new))
+        elif old is not None and old['status'] != new['status']:
+            events.append(_event(STATUS_CHANGED, booking_id, old, new))
+    return events
+
+
+def publish_changes(booking_ids, changes):
+    """Publish the feed events for booking changes once the current transaction commits"""
+    events = booking_events(booking_ids, changes)
+    if not events:
+        return
+
+    def publish_all():
+        for event in events:
+            broker.publish(event)
+
+    transaction.on_commit(publish_all)
+
+
+def format_event(event):
+    """Encode an event in the text/event-stream wire format"""
+    return f'event: {event["event"]}\ndata: {json.dumps(event, cls=DjangoJSONEncoder)}\n\n'
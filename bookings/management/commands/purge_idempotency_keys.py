@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from bookings.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = 'Delete booking idempotency keys older than IDEMPOTENCY_KEY_RETENTION_HOURS'
+
+    def handle(self, *args, **options):
+        deleted = purge_expired()
+        self.stdout.write(self.style.SUCCESS(f'Purged {deleted} expired idempotency keys.'))
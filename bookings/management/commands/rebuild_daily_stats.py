@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from bookings.rollups import rebuild_daily_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the DailyBookingStats rollup from the Booking table'
+
+    def handle(self, *args, **options):
+        rows = rebuild_daily_stats()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt daily booking stats ({rows} rows).'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from bookings.profile_stats import rebuild_profile_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the booking counters on every UserProfile from the Booking table'
+
+    def handle(self, *args, **options):
+        profiles = rebuild_profile_stats()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt booking counters for {profiles} profiles.'))
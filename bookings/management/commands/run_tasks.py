@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from bookings.idempotency import purge_expired
+from bookings.tasks import purge_finished, run_due_tasks
+
+# Seconds between purges of finished tasks and expired idempotency keys with --loop
+PURGE_INTERVAL = 60 * 60
+
+
+class Command(BaseCommand):
+    help = 'Run due background tasks from the task table (SKIP LOCKED, safe to run several workers)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='Tasks claimed per batch (default TASK_BATCH_SIZE)')
+        parser.add_argument('--loop', action='store_true', help='Keep running, polling every --interval seconds')
+        parser.add_argument('--interval', type=float, default=2, help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        last_purge = None
+        while True:
+            succeeded, failed = run_due_tasks(options['batch_size'])
+            if succeeded or failed or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(f'Ran {succeeded + failed} tasks ({failed} failed).'))
+            if last_purge is None or time.monotonic() - last_purge >= PURGE_INTERVAL:
+                purged, expired = purge_finished(), purge_expired()
+                last_purge = time.monotonic()
+                if purged:
+                    self.stdout.write(f'Purged {purged} finished tasks.')
+                if expired:
+                    self.stdout.write(f'Purged {expired} expired idempotency keys.')
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
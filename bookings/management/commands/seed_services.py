@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings.seeding import DEFAULT_CATALOG_FILE, load_catalog, seed_services
+
+
+class Command(BaseCommand):
+    help = 'Create or update services to match a catalog file (safe to run on every deploy)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default=DEFAULT_CATALOG_FILE, help='Catalog JSON file (default bookings/data/services.json)')
+        parser.add_argument('--dry-run', action='store_true', help='Show the changes without writing them')
+
+    def handle(self, *args, **options):
+        try:
+            result = seed_services(load_catalog(options['file']), dry_run=options['dry_run'])
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Could not seed services: {e}')
+
+        for name in result.created:
+            self.stdout.write(f'+ {name}')
+        for name, changes in result.updated:
+            diff = ', '.join(f'{field} {old} -> {new}' for field, (old, new) in changes.items())
+            self.stdout.write(f'~ {name}: {diff}')
+        if result.missing:
+            self.stdout.write(self.style.WARNING(f'Not in the catalog (left as is): {", ".join(result.missing)}'))
+
+        summary = f'{len(result.created)} created, {len(result.updated)} updated, {result.unchanged} unchanged'
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'Dry run, nothing written: {summary}.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Services seeded: {summary}.'))
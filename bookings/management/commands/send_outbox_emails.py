@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from bookings.emails import send_due_emails
+
+
+class Command(BaseCommand):
+    help = 'Send due emails from the outbox in batches over one SMTP connection per batch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='Emails per batch (default EMAIL_OUTBOX_BATCH_SIZE)')
+        parser.add_argument('--loop', action='store_true', help='Keep running, checking the outbox every --interval seconds')
+        parser.add_argument('--interval', type=float, default=30, help='Seconds between checks with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = send_due_emails(options['batch_size'])
+            if sent or failed or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(f'Sent {sent} emails ({failed} failed, to be retried or given up).'))
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings.bays import SAMPLE_BAYS, setup_bays
+
+
+class Command(BaseCommand):
+    help = 'Create wash bays and allocate upcoming bookings to them (existing bays, matched by name, are kept)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'bays', nargs='*',
+            help='Bays as "Name=vehicle types", e.g. "Bay 1=sedan,suv" (no types: takes every vehicle)',
+        )
+        parser.add_argument('--sample', action='store_true', help='Create the sample five-bay layout')
+
+    def handle(self, *args, **options):
+        if options['sample']:
+            layout = list(SAMPLE_BAYS)
+        elif options['bays']:
+            layout = []
+            for value in options['bays']:
+                name, separator, vehicle_types = value.partition('=')
+                if not name.strip() or not separator:
+                    raise CommandError(f'Expected "Name=vehicle types", got "{value}".')
+                layout.append((name.strip(), vehicle_types.strip()))
+        else:
+            raise CommandError('List the bays to create or pass --sample.')
+
+        created = setup_bays(layout)
+        for bay in created:
+            self.stdout.write(f'+ {bay.name} ({bay.vehicle_types or "all vehicles"})')
+        self.stdout.write(self.style.SUCCESS(f'Created {len(created)} bays.'))
@@ -0,0 +1,73 @@
+"""
+Request middleware
+"""
+import jwt
+from django.conf import settings
+
+from .supabase_auth import (
+    MissingSecretError, needs_refresh, refresh_in_background, take_refreshed_tokens, verify_access_token,
+)
+
+
+class SupabaseSessionMiddleware:
+    """
+    Attach verified Supabase claims to request.supabase_claims
+
+    The claims are None when the session has no Supabase token or it
+    could not be verified. HS256 tokens need SUPABASE_JWT_SECRET and
+    RS256/ES256 tokens the JWKS served under SUPABASE_URL; with neither
+    configured, verification is off and the claims are always None. Must
+    come after SessionMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = bool(settings.SUPABASE_JWT_SECRET or settings.SUPABASE_URL)
+        # Reported once here; requests that can't be verified because of it stay quiet
+        if not self.enabled:
+            print('[WARNING] SUPABASE_JWT_SECRET and SUPABASE_URL are not set; Supabase sessions will not be verified')
+        elif not settings.SUPABASE_JWT_SECRET:
+            print('[WARNING] SUPABASE_JWT_SECRET is not set; only RS256/ES256 Supabase sessions will be verified')
+
+    def __call__(self, request):
+        request.supabase_claims = self.verify_session(request) if self.enabled else None
+        return self.get_response(request)
+
+    def verify_session(self, request):
+        access_token = request.session.get('supabase_access_token')
+        refresh_token = request.session.get('supabase_refresh_token')
+        if not access_token:
+            return None
+
+        claims = self._verify(request, access_token)
+        if claims is False:
+            return None
+        if refresh_token and (claims is None or needs_refresh(claims)):
+            tokens = take_refreshed_tokens(refresh_token)
+            if tokens is None:
+                refresh_in_background(refresh_token)
+            else:
+                access_token, refresh_token = tokens
+                request.session['supabase_access_token'] = access_token
+                request.session['supabase_refresh_token'] = refresh_token
+                claims = self._verify(request, access_token) or None
+        return claims
+
+    def _verify(self, request, access_token):
+        """Claims, None if merely expired, or False if the token was rejected"""
+        try:
+            return verify_access_token(access_token)
+        except jwt.ExpiredSignatureError:
+            return None
+        except MissingSecretError:
+            # Warned about at startup; the tokens may verify once the secret is configured
+            return False
+        except jwt.InvalidTokenError as e:
+            print(f'[WARNING] Discarding invalid Supabase token: {e}')
+            request.session.pop('supabase_access_token', None)
+            request.session.pop('supabase_refresh_token', None)
+            return False
+        except jwt.PyJWKClientError as e:
+            # Keys unavailable (network/config); keep the tokens and try again next request
+            print(f'[WARNING] Cannot verify Supabase token: {e}')
+            return False
@@ -0,0 +1,49 @@
+# Generated by Django 5.0.6 on 2026-10-18 16:24
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_slot_capacity(apps, schema_editor):
+    """Seed the ledger from existing non-cancelled bookings"""
+    Booking = apps.get_model('bookings', 'Booking')
+    SlotCapacity = apps.get_model('bookings', 'SlotCapacity')
+    counts = (
+        Booking.objects.exclude(status='cancelled')
+        .order_by()
+        .values('booking_date', 'booking_time')
+        .annotate(total=Count('id'))
+    )
+    SlotCapacity.objects.bulk_create([
+        SlotCapacity(booking_date=row['booking_date'], booking_time=row['booking_time'], booked_count=row['total'])
+        for row in counts
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0002_service'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotCapacity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('booking_date', models.DateField()),
+                ('booking_time', models.TimeField()),
+                ('booked_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Slot Capacity',
+                'verbose_name_plural': 'Slot Capacities',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='slotcapacity',
+            constraint=models.UniqueConstraint(fields=('booking_date', 'booking_time'), name='unique_slot_capacity'),
+        ),
+        migrations.RunPython(backfill_slot_capacity, migrations.RunPython.noop),
+    ]
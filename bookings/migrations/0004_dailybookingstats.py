@@ -0,0 +1,57 @@
+# Generated by Django 5.0.6 on 2026-10-18 16:27
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_daily_stats(apps, schema_editor):
+    """Seed the rollup from existing bookings"""
+    Booking = apps.get_model('bookings', 'Booking')
+    DailyBookingStats = apps.get_model('bookings', 'DailyBookingStats')
+    rows = (
+        Booking.objects.order_by()
+        .values('booking_date', 'service', 'status')
+        .annotate(total=Count('id'), total_revenue=Sum('price'))
+    )
+    DailyBookingStats.objects.bulk_create([
+        DailyBookingStats(
+            booking_date=row['booking_date'],
+            service=row['service'],
+            status=row['status'],
+            booking_count=row['total'],
+            revenue=row['total_revenue'] or 0,
+        )
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0003_slotcapacity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyBookingStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('booking_date', models.DateField()),
+                ('service', models.CharField(choices=[('basic', 'Basic Wash'), ('premium', 'Premium Wash'), ('deluxe', 'Deluxe Wash'), ('interior', 'Interior Cleaning'), ('fulldetail', 'Full Detail')], max_length=20)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('in-progress', 'In Progress'), ('completed', 'Completed'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('booking_count', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Daily Booking Stats',
+                'verbose_name_plural': 'Daily Booking Stats',
+                'ordering': ['-booking_date', 'service', 'status'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailybookingstats',
+            constraint=models.UniqueConstraint(fields=('booking_date', 'service', 'status'), name='unique_daily_booking_stats'),
+        ),
+        migrations.RunPython(backfill_daily_stats, migrations.RunPython.noop),
+    ]
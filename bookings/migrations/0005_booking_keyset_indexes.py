@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-18 16:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0004_dailybookingstats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['booking_date', 'booking_time', 'id'], name='bookings_bo_booking_5bc7c4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', 'booking_date', 'booking_time', 'id'], name='bookings_bo_user_id_f6d60b_idx'),
+        ),
+    ]
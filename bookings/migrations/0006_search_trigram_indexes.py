@@ -0,0 +1,43 @@
+from django.db import migrations
+
+# Columns searched with icontains; Django compares UPPER(column::text), so index that expression
+TRIGRAM_COLUMNS = [
+    ('bookings_booking', 'customer_name'),
+    ('bookings_booking', 'customer_email'),
+    ('bookings_booking', 'vehicle_plate'),
+    ('auth_user', 'username'),
+    ('auth_user', 'email'),
+    ('auth_user', 'first_name'),
+    ('auth_user', 'last_name'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """PostgreSQL only; SQLite search tables are installed after migrate (bookings/search.py)"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table, column in TRIGRAM_COLUMNS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {table}_{column}_trgm '
+            f'ON {table} USING gin ((UPPER({column}::text)) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, column in TRIGRAM_COLUMNS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {table}_{column}_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('bookings', '0005_booking_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.0.6 on 2026-10-18 16:37
+
+from collections import Counter
+from datetime import time
+
+from django.db import migrations, models
+
+# Hourly grid as of this migration: 8:00 AM to 5:00 PM starts
+SLOT_STARTS = [hour * 60 for hour in range(8, 18)]
+
+
+def service_type_for(name):
+    """Booking service type a Service name maps to (catalog.service_type_for as of this migration)"""
+    name = name.lower()
+    if 'basic' in name:
+        return 'basic'
+    elif 'deluxe' in name:
+        return 'deluxe'
+    elif 'premium' in name or 'detail' in name:
+        return 'premium'
+    elif 'interior' in name:
+        return 'interior'
+    elif 'full' in name:
+        return 'fulldetail'
+    return 'basic'
+
+
+def backfill_durations(apps, schema_editor):
+    """Give existing bookings the duration of the service they were booked for instead of the default"""
+    Booking = apps.get_model('bookings', 'Booking')
+    Service = apps.get_model('bookings', 'Service')
+    durations = {}
+    # Bookings only record the service type; the first matching service, as listed to customers, wins
+    for name, duration in Service.objects.order_by('-is_active', 'display_order', 'id').values_list('name', 'duration'):
+        if duration and duration > 0:
+            durations.setdefault(service_type_for(name), duration)
+    for service_type, duration in durations.items():
+        Booking.objects.filter(service=service_type).update(duration=duration)
+
+
+def rebuild_slot_ledger(apps, schema_editor):
+    """Recount the ledger as slots covered rather than exact start times"""
+    Booking = apps.get_model('bookings', 'Booking')
+    SlotCapacity = apps.get_model('bookings', 'SlotCapacity')
+    counts = Counter()
+    for booking_date, booking_time, duration in (
+        Booking.objects.exclude(status='cancelled').values_list('booking_date', 'booking_time', 'duration').iterator()
+    ):
+        begin = booking_time.hour * 60 + booking_time.minute
+        for start in SLOT_STARTS:
+            if start < begin + duration and start + 60 > begin:
+                counts[(booking_date, time(start // 60, start % 60))] += 1
+    SlotCapacity.objects.all().delete()
+    SlotCapacity.objects.bulk_create([
+        SlotCapacity(booking_date=booking_date, booking_time=booking_time, booked_count=count)
+        for (booking_date, booking_time), count in counts.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0006_search_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='duration',
+            field=models.PositiveIntegerField(default=60, help_text='Duration in minutes'),
+        ),
+        migrations.RunPython(backfill_durations, migrations.RunPython.noop),
+        migrations.RunPython(rebuild_slot_ledger, migrations.RunPython.noop),
+    ]
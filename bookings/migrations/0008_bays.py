@@ -0,0 +1,36 @@
+# Generated by Django 5.0.6 on 2026-10-18 16:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0007_booking_duration'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Bay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('vehicle_types', models.CharField(blank=True, help_text='Comma-separated vehicle types this bay accepts (e.g., sedan, suv). Leave blank to accept all.', max_length=255)),
+                ('is_active', models.BooleanField(default=True)),
+                ('display_order', models.IntegerField(default=0, help_text='Order to display bays')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Bay',
+                'verbose_name_plural': 'Bays',
+                'ordering': ['display_order', 'name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='bay',
+            field=models.ForeignKey(blank=True, help_text='Bay the booking is allocated to', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='bookings', to='bookings.bay'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.0.6 on 2026-10-18 16:43
+
+from datetime import time
+
+from django.db import migrations, models
+
+
+def seed_weekly_hours(apps, schema_editor):
+    """Open every day 8:00 AM - 6:00 PM, matching the previous fixed time slots"""
+    OperatingSchedule = apps.get_model('bookings', 'OperatingSchedule')
+    OperatingSchedule.objects.bulk_create([
+        OperatingSchedule(weekday=weekday, opens_at=time(8, 0), closes_at=time(18, 0))
+        for weekday in range(7)
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0008_bays'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OperatingSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField(blank=True, choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')], help_text='Weekly template for this day; leave blank for a date override', null=True, unique=True)),
+                ('date', models.DateField(blank=True, help_text='Override for a single date (e.g., holiday)', null=True, unique=True)),
+                ('is_closed', models.BooleanField(default=False, help_text='Closed all day')),
+                ('opens_at', models.TimeField(blank=True, null=True)),
+                ('closes_at', models.TimeField(blank=True, help_text='Every booking must be finished by this time', null=True)),
+                ('capacity', models.PositiveIntegerField(blank=True, help_text='Bookings per time slot; leave blank to use the number of active bays', null=True)),
+                ('note', models.CharField(blank=True, help_text="Shown to staff, e.g. 'Christmas Day'", max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Operating Schedule',
+                'verbose_name_plural': 'Operating Schedule',
+                'ordering': ['date', 'weekday'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='operatingschedule',
+            constraint=models.CheckConstraint(check=models.Q(models.Q(('date__isnull', True), ('weekday__isnull', False)), models.Q(('date__isnull', False), ('weekday__isnull', True)), _connector='OR'), name='operating_schedule_weekday_or_date'),
+        ),
+        migrations.RunPython(seed_weekly_hours, migrations.RunPython.noop),
+    ]
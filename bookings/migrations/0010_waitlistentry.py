@@ -0,0 +1,44 @@
+# Generated by Django 5.0.6 on 2026-10-18 16:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0009_operating_schedule'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('customer_name', models.CharField(max_length=255)),
+                ('customer_email', models.EmailField(max_length=254)),
+                ('customer_phone', models.CharField(max_length=50)),
+                ('vehicle_type', models.CharField(choices=[('sedan', 'Sedan'), ('suv', 'SUV'), ('truck', 'Truck'), ('van', 'Van'), ('motorcycle', 'Motorcycle')], max_length=20)),
+                ('vehicle_plate', models.CharField(max_length=50)),
+                ('service', models.CharField(choices=[('basic', 'Basic Wash'), ('premium', 'Premium Wash'), ('deluxe', 'Deluxe Wash'), ('interior', 'Interior Cleaning'), ('fulldetail', 'Full Detail')], max_length=20)),
+                ('booking_date', models.DateField()),
+                ('booking_time', models.TimeField()),
+                ('duration', models.PositiveIntegerField(default=60, help_text='Duration in minutes')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('notes', models.TextField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('waiting', 'Waiting'), ('promoted', 'Promoted'), ('withdrawn', 'Withdrawn')], default='waiting', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('promoted_at', models.DateTimeField(blank=True, null=True)),
+                ('booking', models.OneToOneField(blank=True, help_text='Booking created when the entry was promoted', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='waitlist_entry', to='bookings.booking')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Waitlist Entry',
+                'verbose_name_plural': 'Waitlist Entries',
+                'ordering': ['booking_date', 'booking_time', 'created_at', 'id'],
+                'indexes': [models.Index(condition=models.Q(('status', 'waiting')), fields=['booking_date', 'booking_time', 'created_at', 'id'], name='waitlist_queue_idx'), models.Index(fields=['user', 'status'], name='bookings_wa_user_id_6dff6f_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.0.6 on 2026-10-18 16:56
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_counters(apps, schema_editor):
+    """Set every profile's booking counters from the existing bookings"""
+    Booking = apps.get_model('bookings', 'Booking')
+    UserProfile = apps.get_model('bookings', 'UserProfile')
+    totals = {
+        row['user_id']: row
+        for row in Booking.objects.order_by().values('user_id').annotate(
+            total=Count('id'),
+            pending=Count('id', filter=Q(status='pending')),
+            completed=Count('id', filter=Q(status='completed')),
+            cancelled=Count('id', filter=Q(status='cancelled')),
+            spend=Sum('price', filter=Q(status='completed')),
+        )
+    }
+    existing = set(UserProfile.objects.values_list('user_id', flat=True))
+    UserProfile.objects.bulk_create([UserProfile(user_id=user_id) for user_id in totals.keys() - existing])
+
+    profiles = list(UserProfile.objects.filter(user_id__in=totals))
+    for profile in profiles:
+        row = totals[profile.user_id]
+        profile.total_bookings = row['total']
+        profile.pending_bookings = row['pending']
+        profile.completed_bookings = row['completed']
+        profile.cancelled_bookings = row['cancelled']
+        profile.lifetime_spend = row['spend'] or 0
+    UserProfile.objects.bulk_update(
+        profiles,
+        ['total_bookings', 'pending_bookings', 'completed_bookings', 'cancelled_bookings', 'lifetime_spend'],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0011_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='cancelled_bookings',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='completed_bookings',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='lifetime_spend',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Total price of completed bookings', max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='pending_bookings',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='total_bookings',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
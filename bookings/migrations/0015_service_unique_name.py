@@ -0,0 +1,29 @@
+# Generated by Django 5.0.6 on 2026-10-18 17:18
+
+from django.db import migrations, models
+
+
+def rename_duplicate_services(apps, schema_editor):
+    """Suffix repeated service names with their id so the unique constraint can be added"""
+    Service = apps.get_model('bookings', 'Service')
+    seen = set()
+    for service in Service.objects.order_by('id'):
+        if service.name in seen:
+            service.name = f'{service.name} ({service.id})'[:100]
+            service.save(update_fields=['name'])
+        seen.add(service.name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0014_task_queue'),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_duplicate_services, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='service',
+            constraint=models.UniqueConstraint(fields=('name',), name='unique_service_name'),
+        ),
+    ]
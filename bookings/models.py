@@ -1,6 +1,8 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.base import DEFERRED
 from django.contrib.auth.models import User
 from django.core.validators import RegexValidator
+from django.utils import timezone
 
 
 class Service(models.Model):
@@ -48,6 +50,10 @@ class Service(models.Model):
         ordering = ['category', 'display_order', 'price']
         verbose_name = "Service"
         verbose_name_plural = "Services"
+        constraints = [
+            # Catalog seeding matches services by name (see seeding.py)
+            models.UniqueConstraint(fields=['name'], name='unique_service_name'),
+        ]
 
 
 class UserProfile(models.Model):
@@ -57,6 +63,10 @@ class UserProfile(models.Model):
         ('admin', 'Admin'),
     ]
     
+    # Fields an edit of an existing profile saves; the counters are only
+    # written through profile_stats.py's F() updates, never from a stale copy
+    DETAIL_FIELDS = ('phone', 'role', 'supabase_id', 'updated_at')
+    
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     phone = models.CharField(
         max_length=50,
@@ -65,6 +75,14 @@ class UserProfile(models.Model):
     )
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default='customer')
     supabase_id = models.CharField(max_length=255, blank=True, null=True, help_text="Supabase User UUID")
+    
+    # Booking counters, kept in step with the user's bookings (see profile_stats.py)
+    total_bookings = models.PositiveIntegerField(default=0)
+    pending_bookings = models.PositiveIntegerField(default=0)
+    completed_bookings = models.PositiveIntegerField(default=0)
+    cancelled_bookings = models.PositiveIntegerField(default=0)
+    lifetime_spend = models.DecimalField(max_digits=12, decimal_places=2, default=0, help_text="Total price of completed bookings")
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -76,6 +94,138 @@ class UserProfile(models.Model):
         verbose_name_plural = "User Profiles"
 
 
+class Bay(models.Model):
+    """A wash bay; each bay works on one booking at a time"""
+    name = models.CharField(max_length=100)
+    vehicle_types = models.CharField(
+        max_length=255,
+        blank=True,
+        help_text="Comma-separated vehicle types this bay accepts (e.g., sedan, suv). Leave blank to accept all."
+    )
+    is_active = models.BooleanField(default=True)
+    display_order = models.IntegerField(default=0, help_text="Order to display bays")
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return self.name
+    
+    def get_vehicle_types(self):
+        """Return accepted vehicle types as a list (empty means all)"""
+        return [v.strip() for v in self.vehicle_types.split(',') if v.strip()]
+    
+    def accepts(self, vehicle_type):
+        """Return True if this bay can wash the given vehicle type"""
+        accepted = self.get_vehicle_types()
+        return not accepted or vehicle_type in accepted
+    
+    class Meta:
+        ordering = ['display_order', 'name']
+        verbose_name = "Bay"
+        verbose_name_plural = "Bays"
+
+
+class OperatingSchedule(models.Model):
+    """Opening hours for a weekday (weekly template) or for one date (override)"""
+    WEEKDAY_CHOICES = [
+        (0, 'Monday'),
+        (1, 'Tuesday'),
+        (2, 'Wednesday'),
+        (3, 'Thursday'),
+        (4, 'Friday'),
+        (5, 'Saturday'),
+        (6, 'Sunday'),
+    ]
+    
+    weekday = models.PositiveSmallIntegerField(
+        choices=WEEKDAY_CHOICES, null=True, blank=True, unique=True,
+        help_text="Weekly template for this day; leave blank for a date override"
+    )
+    date = models.DateField(null=True, blank=True, unique=True, help_text="Override for a single date (e.g., holiday)")
+    is_closed = models.BooleanField(default=False, help_text="Closed all day")
+    opens_at = models.TimeField(null=True, blank=True)
+    closes_at = models.TimeField(null=True, blank=True, help_text="Every booking must be finished by this time")
+    capacity = models.PositiveIntegerField(
+        null=True, blank=True, help_text="Bookings per time slot; leave blank to use the number of active bays"
+    )
+    note = models.CharField(max_length=255, blank=True, help_text="Shown to staff, e.g. 'Christmas Day'")
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        day = self.date.isoformat() if self.date else self.get_weekday_display()
+        if self.is_closed:
+            return f"{day} - Closed"
+        return f"{day} - {self.opens_at:%H:%M} to {self.closes_at:%H:%M}"
+    
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        from .operating_schedule import SLOT_MINUTES
+        
+        if (self.weekday is None) == (self.date is None):
+            raise ValidationError('Set either a weekday or a date.')
+        if self.is_closed:
+            return
+        if self.opens_at is None or self.closes_at is None:
+            raise ValidationError('Opening and closing times are required unless the day is closed.')
+        if self.opens_at >= self.closes_at:
+            raise ValidationError({'closes_at': 'Closing time must be after opening time.'})
+        for field in ('opens_at', 'closes_at'):
+            value = getattr(self, field)
+            if (value.hour * 60 + value.minute) % SLOT_MINUTES or value.second:
+                raise ValidationError({field: f'Times must fall on the {SLOT_MINUTES}-minute slot grid.'})
+        if self.capacity:
+            from .bays import slot_capacity
+            if self.capacity > slot_capacity():
+                raise ValidationError({'capacity': f'At most {slot_capacity()} bookings per slot, one per active bay.'})
+    
+    class Meta:
+        ordering = ['date', 'weekday']
+        verbose_name = "Operating Schedule"
+        verbose_name_plural = "Operating Schedule"
+        constraints = [
+            models.CheckConstraint(
+                check=(
+                    models.Q(weekday__isnull=False, date__isnull=True)
+                    | models.Q(weekday__isnull=True, date__isnull=False)
+                ),
+                name='operating_schedule_weekday_or_date',
+            ),
+        ]
+
+
+class BookingQuerySet(models.QuerySet):
+    """Booking queryset with bulk operations that keep derived tables in sync"""
+    
+    def update_status(self, status):
+        """Set status on every booking in the queryset (bulk ``update()`` bypasses signals)"""
+        from django.db import transaction
+        from .bays import reallocate_bookings
+        from .capacity import occupies_slot
+        from .tracking import record_booking_changes
+        
+        with transaction.atomic():
+            rows = list(
+                self.order_by().select_for_update().exclude(status=status)
+                .values('id', *Booking.TRACKED_FIELDS)
+            )
+            if not rows:
+                return 0
+            ids = [row.pop('id') for row in rows]
+            updated = Booking.objects.filter(id__in=ids).update(status=status, updated_at=timezone.now())
+            # After the update, so bays freed by these bookings are seen as free by waitlist promotion
+            record_booking_changes([(row, {**row, 'status': status}) for row in rows], booking_ids=ids)
+            
+            # Bookings coming back from cancelled need a bay again
+            if occupies_slot(status):
+                restored = [i for i, row in zip(ids, rows) if not occupies_slot(row['status'])]
+                if restored:
+                    reallocate_bookings(Booking.objects.filter(id__in=restored))
+            return updated
+
+
 class Booking(models.Model):
     """Car wash booking model"""
     VEHICLE_TYPES = [
@@ -116,6 +266,11 @@ class Booking(models.Model):
     service = models.CharField(max_length=20, choices=SERVICE_TYPES)
     booking_date = models.DateField()
     booking_time = models.TimeField()
+    duration = models.PositiveIntegerField(default=60, help_text="Duration in minutes")
+    bay = models.ForeignKey(
+        Bay, on_delete=models.SET_NULL, null=True, blank=True, related_name='bookings',
+        help_text="Bay the booking is allocated to"
+    )
     price = models.DecimalField(max_digits=10, decimal_places=2)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     
@@ -131,9 +286,50 @@ class Booking(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Fields the slot ledger, daily rollups, profile counters and bay allocation are derived from (attnames)
+    TRACKED_FIELDS = (
+        'booking_date', 'booking_time', 'duration', 'service', 'status', 'price', 'vehicle_type', 'bay_id', 'user_id',
+    )
+    
+    objects = BookingQuerySet.as_manager()
+    
     def __str__(self):
         return f"{self.customer_name} - {self.service} on {self.booking_date}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored values so signals can tell what a save changed
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+    
+    def save(self, *args, **kwargs):
+        # Signals update the derived tables; keep them in one transaction with the row
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+    
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        # The remembered stored state may be stale; the next save reads it from the database
+        self.__dict__.pop('_loaded_values', None)
+    
+    def get_tracked_state(self):
+        """Return the tracked field values as they are on this instance"""
+        return {field: getattr(self, field) for field in self.TRACKED_FIELDS}
+    
+    def get_stored_state(self):
+        """Return the tracked field values as last saved, or None if never saved"""
+        if self._state.adding or self.pk is None:
+            return None
+        loaded = getattr(self, '_loaded_values', {})
+        if all(loaded.get(field, DEFERRED) is not DEFERRED for field in self.TRACKED_FIELDS):
+            return {field: loaded[field] for field in self.TRACKED_FIELDS}
+        return Booking.objects.filter(pk=self.pk).values(*self.TRACKED_FIELDS).first()
+    
     class Meta:
         ordering = ['-created_at']
         verbose_name = "Booking"
@@ -142,4 +338,209 @@ class Booking(models.Model):
             models.Index(fields=['user']),
             models.Index(fields=['booking_date']),
             models.Index(fields=['status']),
+            models.Index(fields=['booking_date', 'booking_time', 'id']),
+            models.Index(fields=['user', 'booking_date', 'booking_time', 'id']),
+        ]
+
+
+class SlotCapacity(models.Model):
+    """Running count of active (non-cancelled) bookings covering each date and time slot"""
+    booking_date = models.DateField()
+    booking_time = models.TimeField()
+    booked_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.booking_date} {self.booking_time} - {self.booked_count} booked"
+    
+    class Meta:
+        verbose_name = "Slot Capacity"
+        verbose_name_plural = "Slot Capacities"
+        constraints = [
+            models.UniqueConstraint(fields=['booking_date', 'booking_time'], name='unique_slot_capacity'),
+        ]
+
+
+class DailyBookingStats(models.Model):
+    """Booking count and revenue per day, service and status, maintained incrementally"""
+    booking_date = models.DateField()
+    service = models.CharField(max_length=20, choices=Booking.SERVICE_TYPES)
+    status = models.CharField(max_length=20, choices=Booking.STATUS_CHOICES)
+    booking_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.booking_date} {self.service} {self.status} - {self.booking_count}"
+    
+    class Meta:
+        ordering = ['-booking_date', 'service', 'status']
+        verbose_name = "Daily Booking Stats"
+        verbose_name_plural = "Daily Booking Stats"
+        constraints = [
+            models.UniqueConstraint(fields=['booking_date', 'service', 'status'], name='unique_daily_booking_stats'),
         ]
+
+
+class WaitlistEntry(models.Model):
+    """A customer queued for a full slot, promoted to a booking when a place frees up"""
+    STATUS_CHOICES = [
+        ('waiting', 'Waiting'),
+        ('promoted', 'Promoted'),
+        ('withdrawn', 'Withdrawn'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='waitlist_entries')
+    customer_name = models.CharField(max_length=255)
+    customer_email = models.EmailField()
+    customer_phone = models.CharField(max_length=50)
+    vehicle_type = models.CharField(max_length=20, choices=Booking.VEHICLE_TYPES)
+    vehicle_plate = models.CharField(max_length=50)
+    service = models.CharField(max_length=20, choices=Booking.SERVICE_TYPES)
+    booking_date = models.DateField()
+    booking_time = models.TimeField()
+    duration = models.PositiveIntegerField(default=60, help_text="Duration in minutes")
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    notes = models.TextField(blank=True, null=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='waiting')
+    booking = models.OneToOneField(
+        Booking, on_delete=models.SET_NULL, null=True, blank=True, related_name='waitlist_entry',
+        help_text="Booking created when the entry was promoted"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    promoted_at = models.DateTimeField(null=True, blank=True)
+    
+    # Fields copied onto the booking on promotion
+    BOOKING_FIELDS = (
+        'user', 'customer_name', 'customer_email', 'customer_phone', 'vehicle_type', 'vehicle_plate',
+        'service', 'booking_date', 'booking_time', 'duration', 'price', 'notes',
+    )
+    
+    def __str__(self):
+        return f"{self.customer_name} waiting for {self.booking_date} {self.booking_time}"
+    
+    def make_booking(self):
+        """Return an unsaved pending Booking for this entry"""
+        return Booking(**{field: getattr(self, field) for field in self.BOOKING_FIELDS})
+    
+    class Meta:
+        ordering = ['booking_date', 'booking_time', 'created_at', 'id']
+        verbose_name = "Waitlist Entry"
+        verbose_name_plural = "Waitlist Entries"
+        indexes = [
+            # Queue order per slot; only waiting entries are ever read from the head
+            models.Index(
+                fields=['booking_date', 'booking_time', 'created_at', 'id'],
+                condition=models.Q(status='waiting'),
+                name='waitlist_queue_idx',
+            ),
+            models.Index(fields=['user', 'status']),
+        ]
+
+
+class IdempotencyKey(models.Model):
+    """A booking form submission token and the booking it created, so retries don't book twice"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=64)
+    booking = models.ForeignKey(Booking, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    def __str__(self):
+        return f"{self.user} {self.key}"
+    
+    class Meta:
+        verbose_name = "Idempotency Key"
+        verbose_name_plural = "Idempotency Keys"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key'),
+        ]
+
+
+class EmailOutbox(models.Model):
+    """An email written alongside the change that caused it, sent later by `manage.py send_outbox_emails`"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    
+    KIND_CHOICES = [
+        ('booking_confirmation', 'Booking confirmation'),
+    ]
+    
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    booking = models.ForeignKey(Booking, on_delete=models.SET_NULL, null=True, blank=True, related_name='emails')
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True, help_text="When a sender claimed this email")
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} to {self.to_email} ({self.status})"
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Email Outbox Entry"
+        verbose_name_plural = "Email Outbox"
+        indexes = [
+            # The sender only reads pending emails that are due
+            models.Index(fields=['next_attempt_at', 'id'], condition=models.Q(status='pending'), name='outbox_due_idx'),
+        ]
+
+
+class Task(models.Model):
+    """A unit of background work run by `manage.py run_tasks` (see bookings/tasks.py)"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('dead', 'Dead'),
+    ]
+    
+    name = models.CharField(max_length=200, help_text="Dotted path of the task function")
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.name} ({self.status})"
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Task"
+        verbose_name_plural = "Tasks"
+        indexes = [
+            # Workers only poll queued tasks that are due
+            models.Index(fields=['run_after', 'id'], condition=models.Q(status='queued'), name='task_due_idx'),
+            models.Index(fields=['status', 'locked_at'], name='task_status_locked_idx'),
+        ]
+
+
+class TaskRun(models.Model):
+    """Timing and outcome of one attempt at a Task"""
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='runs')
+    started_at = models.DateTimeField()
+    duration_ms = models.PositiveIntegerField()
+    succeeded = models.BooleanField()
+    error = models.TextField(blank=True)
+    
+    def __str__(self):
+        return f"{self.task.name} took {self.duration_ms} ms"
+    
+    class Meta:
+        ordering = ['-started_at']
+        verbose_name = "Task Run"
+        verbose_name_plural = "Task Runs"
@@ -0,0 +1,135 @@
+"""
+Operating schedule compiled into a slot table
+
+OperatingSchedule rows (weekday templates plus per-date overrides and
+closures) are compiled into immutable DaySchedule entries holding the
+bookable start times, per-slot capacity and closing time for a day.
+Looking up a date is then two dict reads. The compiled table is kept
+like the service catalog: a per-process copy and a cache entry under a
+version token that is bumped when schedule rows or bays change (see
+signals.py) and expires after CACHE_VERSION_TTL (see versioning.py).
+"""
+from dataclasses import dataclass
+from datetime import time
+
+from django.core.cache import cache
+
+from . import versioning
+from .models import OperatingSchedule
+
+# Length of one booking slot; opening and closing times fall on this grid
+SLOT_MINUTES = 60
+
+# Hours used for every weekday until a schedule has been configured
+DEFAULT_OPENS = time(8, 0)
+DEFAULT_CLOSES = time(18, 0)
+
+VERSION_KEY = 'operating-schedule:version'
+
+# Bounds how long tables under an old version stay in the cache
+SNAPSHOT_TTL = 60 * 60 * 24
+
+_local_snapshot = None
+
+
+def to_minutes(value):
+    """Minutes since midnight for a time"""
+    return value.hour * 60 + value.minute
+
+
+@dataclass(frozen=True)
+class DaySchedule:
+    """Bookable start times and capacity for one day"""
+    slots: tuple
+    capacity: int
+    closes: int
+    note: str = ''
+
+    @property
+    def closed(self):
+        return not self.slots
+
+    @classmethod
+    def open(cls, opens_at, closes_at, capacity, note=''):
+        begin, end = to_minutes(opens_at), to_minutes(closes_at)
+        slots = tuple(
+            time(minute // 60, minute % 60)
+            for minute in range(begin, end - SLOT_MINUTES + 1, SLOT_MINUTES)
+        )
+        return cls(slots=slots, capacity=capacity, closes=end, note=note)
+
+
+CLOSED = DaySchedule(slots=(), capacity=0, closes=0)
+
+
+class CompiledSchedule:
+    """Weekday templates and date overrides, resolved to DaySchedule entries"""
+
+    def __init__(self, weekdays, overrides):
+        self.weekdays = weekdays
+        self.overrides = overrides
+        self.all_slots = tuple(sorted({
+            slot for day in [*weekdays.values(), *overrides.values()] for slot in day.slots
+        }))
+
+    def for_date(self, day):
+        """Return the DaySchedule in force on a date"""
+        override = self.overrides.get(day)
+        if override is not None:
+            return override
+        return self.weekdays.get(day.weekday(), CLOSED)
+
+
+def compile_schedule():
+    """Build the slot table from the OperatingSchedule rows"""
+    from .bays import slot_capacity
+
+    default_capacity = slot_capacity()
+
+    def compile_row(row):
+        if row.is_closed:
+            return DaySchedule(slots=(), capacity=0, closes=0, note=row.note)
+        # Never advertise more places than there are bays to allocate them to
+        capacity = min(row.capacity, default_capacity) if row.capacity else default_capacity
+        return DaySchedule.open(row.opens_at, row.closes_at, capacity, row.note)
+
+    rows = list(OperatingSchedule.objects.all())
+    if not rows:
+        everyday = DaySchedule.open(DEFAULT_OPENS, DEFAULT_CLOSES, default_capacity)
+        return CompiledSchedule({weekday: everyday for weekday in range(7)}, {})
+
+    weekdays = {row.weekday: compile_row(row) for row in rows if row.weekday is not None}
+    overrides = {row.date: compile_row(row) for row in rows if row.date is not None}
+    return CompiledSchedule(weekdays, overrides)
+
+
+def schedule_version():
+    return versioning.version(VERSION_KEY)
+
+
+def bump_schedule_version():
+    """Invalidate every compiled table once the current transaction commits"""
+    versioning.bump(VERSION_KEY)
+
+
+def get_schedule():
+    """Return the current compiled schedule, building it on a miss"""
+    global _local_snapshot
+
+    version = schedule_version()
+    if _local_snapshot is not None and _local_snapshot[0] == version:
+        return _local_snapshot[1]
+
+    key = f'operating-schedule:{version}'
+    schedule = cache.get(key)
+    if schedule is None:
+        schedule = compile_schedule()
+        cache.set(key, schedule, timeout=SNAPSHOT_TTL)
+
+    _local_snapshot = (version, schedule)
+    return schedule
+
+
+def day_schedule(day):
+    """Return the DaySchedule for a date"""
+    return get_schedule().for_date(day)
@@ -0,0 +1,151 @@
+"""
+Keyset (cursor) pagination
+
+Pages are addressed by the ordering values of the row at the page edge
+instead of an OFFSET, so every page costs one indexed range scan no matter
+how deep it is. Cursors are opaque URL-safe strings.
+"""
+import base64
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+# Value of the "before" parameter that jumps to the final page
+LAST_PAGE = 'end'
+
+
+class KeysetPage:
+    """One page of results with cursors for the neighbouring pages"""
+
+    def __init__(self, items, next_cursor=None, previous_cursor=None, count=None):
+        self.object_list = items
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self._count = count
+
+    @cached_property
+    def total(self):
+        """Approximate row count, computed on first use (None unless requested)"""
+        return self._count() if self._count is not None else None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+def encode_cursor(values):
+    """Pack ordering values into an opaque cursor string"""
+    raw = json.dumps([value.isoformat() if hasattr(value, 'isoformat') else value for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, model, fields):
+    """Return the ordering values stored in a cursor, or None if it is malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if len(raw) != len(fields):
+            return None
+        return [model._meta.get_field(field).to_python(value) for field, value in zip(fields, raw)]
+    except (ValueError, TypeError, ValidationError, FieldDoesNotExist):
+        return None
+
+
+def _beyond(fields, values, descending):
+    """Q for rows strictly after ``values`` in (fields) order"""
+    lookup = 'lt' if descending else 'gt'
+    clauses = []
+    for i, field in enumerate(fields):
+        equal = {fields[j]: values[j] for j in range(i)}
+        clauses.append(Q(**equal, **{f'{field}__{lookup}': values[i]}))
+    # The OR alone can't bound an index scan; the redundant leading-column
+    # bound lets the composite index seek straight to the cursor
+    return Q(**{f'{fields[0]}__{lookup}e': values[0]}) & reduce(or_, clauses)
+
+
+def can_estimate_count(queryset):
+    """True where approximate_count is a cheap planner estimate rather than a COUNT(*)"""
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+def approximate_count(queryset):
+    """Planner row estimate on PostgreSQL; an exact count elsewhere"""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def keyset_paginate(queryset, fields, per_page, after=None, before=None, descending=False, with_total=False):
+    """
+    Return a KeysetPage of queryset ordered by fields
+
+    fields must end in a unique column (e.g. 'id') so the order is total.
+    Pass a page's next_cursor as ``after`` or its previous_cursor as
+    ``before``; ``before=LAST_PAGE`` returns the last page. Malformed
+    cursors fall back to the first page. With with_total the page's total
+    is estimated when it is first read.
+    """
+    model = queryset.model
+    count = (lambda: approximate_count(queryset)) if with_total else None
+
+    def cursor_for(row):
+        return encode_cursor([getattr(row, field) for field in fields])
+
+    if before == LAST_PAGE:
+        backwards, values = True, None
+    elif before:
+        values = decode_cursor(before, model, fields)
+        backwards = values is not None
+    else:
+        values = decode_cursor(after, model, fields) if after else None
+        backwards = False
+
+    # Walking backwards is the same scan with the ordering flipped
+    reverse = descending != backwards
+    ordering = [f'-{field}' if reverse else field for field in fields]
+    page_qs = queryset
+    if values is not None:
+        page_qs = page_qs.filter(_beyond(fields, values, reverse))
+
+    rows = list(page_qs.order_by(*ordering)[:per_page + 1])
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if not rows:
+        return KeysetPage([], count=count)
+
+    if backwards:
+        rows.reverse()
+        return KeysetPage(
+            rows,
+            next_cursor=cursor_for(rows[-1]) if values is not None else None,
+            previous_cursor=cursor_for(rows[0]) if has_more else None,
+            count=count,
+        )
+    return KeysetPage(
+        rows,
+        next_cursor=cursor_for(rows[-1]) if has_more else None,
+        previous_cursor=cursor_for(rows[0]) if values is not None else None,
+        count=count,
+    )
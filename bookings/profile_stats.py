@@ -0,0 +1,94 @@
+"""
+Per-user booking counters
+
+UserProfile carries each user's booking totals (all, pending, completed,
+cancelled) and lifetime spend, so dashboards read one row instead of
+counting Booking. The counters are adjusted from the same (old, new)
+change feed as the slot ledger and daily rollups (see tracking.py), inside
+the transaction that changes the bookings.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from .models import Booking, UserProfile
+
+# Status counted in each counter field; total_bookings counts every booking
+STATUS_COUNTERS = {
+    'pending': 'pending_bookings',
+    'completed': 'completed_bookings',
+    'cancelled': 'cancelled_bookings',
+}
+
+# Bookings in this status count toward lifetime spend
+SPEND_STATUS = 'completed'
+
+COUNTER_FIELDS = ('total_bookings', *STATUS_COUNTERS.values(), 'lifetime_spend')
+
+
+def _contribution(state):
+    """{field: amount} one booking in this state adds to its owner's counters"""
+    fields = {'total_bookings': 1}
+    if state['status'] in STATUS_COUNTERS:
+        fields[STATUS_COUNTERS[state['status']]] = 1
+    if state['status'] == SPEND_STATUS:
+        fields['lifetime_spend'] = Decimal(str(state['price'] or 0))
+    return fields
+
+
+def profile_deltas(changes):
+    """
+    Counter changes for bookings moving between states
+
+    changes is a list of (old, new) Booking tracked-state dicts, where None
+    means the booking doesn't exist on that side. Returns
+    {user_id: {field: delta}} without zero entries.
+    """
+    deltas = defaultdict(lambda: defaultdict(int))
+    for old, new in changes:
+        if old:
+            for field, amount in _contribution(old).items():
+                deltas[old['user_id']][field] -= amount
+        if new:
+            for field, amount in _contribution(new).items():
+                deltas[new['user_id']][field] += amount
+    return {
+        user_id: {field: delta for field, delta in fields.items() if delta}
+        for user_id, fields in deltas.items()
+        if any(fields.values())
+    }
+
+
+def apply_profile_deltas(deltas):
+    """Apply {user_id: {field: delta}} changes to the users' profiles"""
+    for user_id, fields in deltas.items():
+        update = {field: F(field) + delta for field, delta in fields.items()}
+        if not UserProfile.objects.filter(user_id=user_id).update(**update):
+            # Accounts created before profiles existed get one on first use
+            UserProfile.objects.get_or_create(user_id=user_id)
+            UserProfile.objects.filter(user_id=user_id).update(**update)
+
+
+def rebuild_profile_stats():
+    """Recompute every profile's counters from the Booking table; returns the profile count"""
+    with transaction.atomic():
+        totals = {
+            row['user_id']: row
+            for row in Booking.objects.order_by().values('user_id').annotate(
+                total_bookings=Count('id'),
+                **{field: Count('id', filter=Q(status=status)) for status, field in STATUS_COUNTERS.items()},
+                lifetime_spend=Sum('price', filter=Q(status=SPEND_STATUS)),
+            )
+        }
+        existing = set(UserProfile.objects.values_list('user_id', flat=True))
+        UserProfile.objects.bulk_create([UserProfile(user_id=user_id) for user_id in totals.keys() - existing])
+
+        profiles = list(UserProfile.objects.select_for_update())
+        for profile in profiles:
+            row = totals.get(profile.user_id, {})
+            for field in COUNTER_FIELDS:
+                setattr(profile, field, row.get(field) or 0)
+        UserProfile.objects.bulk_update(profiles, COUNTER_FIELDS, batch_size=500)
+    return len(profiles)
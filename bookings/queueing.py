@@ -0,0 +1,57 @@
+"""
+Claiming work from a database-backed queue
+
+Shared by the task queue (tasks.py) and the email outbox (emails.py).
+Due rows are locked with SELECT ... FOR UPDATE SKIP LOCKED and marked
+claimed with a lease (locked_at) in one short transaction, so several
+workers can poll the same table and no lock is held while the work runs.
+A claim whose lease has expired belongs to a worker that stopped and can
+be handed back to the queue. Failures are retried with exponential
+backoff.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+
+def backoff(attempts, base_seconds, longest):
+    """Wait before the next try after attempts failures: base_seconds doubled per failure, at most longest"""
+    return min(timedelta(seconds=base_seconds * 2 ** (attempts - 1)), longest)
+
+
+def claim_batch(queryset, due_field, batch_size, status, count_attempt=False):
+    """
+    Lock up to batch_size rows of queryset that are due by due_field and
+    mark them status with a fresh lease; returns them
+
+    With count_attempt the claim also counts as an attempt.
+    """
+    now = timezone.now()
+    changes = {'status': status, 'locked_at': now}
+    if count_attempt:
+        changes['attempts'] = F('attempts') + 1
+    with transaction.atomic():
+        batch = list(
+            queryset.select_for_update(skip_locked=True)
+            .filter(**{f'{due_field}__lte': now})
+            .order_by(due_field, 'id')[:batch_size]
+        )
+        if batch:
+            queryset.model.objects.filter(id__in=[item.id for item in batch]).update(**changes)
+    for item in batch:
+        item.status, item.locked_at = status, now
+        if count_attempt:
+            item.attempts += 1
+    return batch
+
+
+def lease_expiry(locked_at, lease_seconds):
+    """When a claim taken at locked_at may be presumed abandoned"""
+    return locked_at + timedelta(seconds=lease_seconds)
+
+
+def expired_claims(queryset, lease_seconds):
+    """Rows of queryset claimed longer than lease_seconds ago"""
+    return queryset.filter(locked_at__lt=timezone.now() - timedelta(seconds=lease_seconds))
@@ -0,0 +1,74 @@
+"""
+Daily booking rollups
+
+DailyBookingStats holds a count and revenue per (date, service, status).
+Rows are adjusted incrementally as bookings change so dashboards read a
+few rollup rows instead of scanning Booking.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from .models import Booking, DailyBookingStats
+
+
+def _rollup_key(state):
+    return (state['booking_date'], state['service'], state['status'])
+
+
+def _price(state):
+    return Decimal(str(state['price'] or 0))
+
+
+def rollup_deltas(changes):
+    """
+    Rollup changes for bookings moving between states
+
+    changes is a list of (old, new) Booking tracked-state dicts, where None
+    means the booking doesn't exist on that side. Returns
+    {(date, service, status): (count_delta, revenue_delta)}.
+    """
+    deltas = defaultdict(lambda: [0, Decimal('0')])
+    for old, new in changes:
+        if old:
+            delta = deltas[_rollup_key(old)]
+            delta[0] -= 1
+            delta[1] -= _price(old)
+        if new:
+            delta = deltas[_rollup_key(new)]
+            delta[0] += 1
+            delta[1] += _price(new)
+    return {key: tuple(delta) for key, delta in deltas.items() if delta[0] or delta[1]}
+
+
+def apply_rollup_deltas(deltas):
+    """Apply {(date, service, status): (count, revenue)} changes to DailyBookingStats"""
+    for (booking_date, service, status), (count, revenue) in deltas.items():
+        DailyBookingStats.objects.get_or_create(booking_date=booking_date, service=service, status=status)
+        DailyBookingStats.objects.filter(
+            booking_date=booking_date, service=service, status=status
+        ).update(booking_count=F('booking_count') + count, revenue=F('revenue') + revenue)
+
+
+def rebuild_daily_stats():
+    """Recompute every rollup row from the Booking table; returns the row count"""
+    with transaction.atomic():
+        DailyBookingStats.objects.all().delete()
+        rows = (
+            Booking.objects.order_by()
+            .values('booking_date', 'service', 'status')
+            .annotate(total=Count('id'), total_revenue=Sum('price'))
+        )
+        created = DailyBookingStats.objects.bulk_create([
+            DailyBookingStats(
+                booking_date=row['booking_date'],
+                service=row['service'],
+                status=row['status'],
+                booking_count=row['total'],
+                revenue=row['total_revenue'] or 0,
+            )
+            for row in rows
+        ])
+    return len(created)
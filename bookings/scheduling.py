@@ -0,0 +1,97 @@
+"""
+Duration-aware scheduling
+
+A booking occupies the interval [start, start + duration) and covers every
+SLOT_MINUTES period of the clock that interval touches. Because bookings
+start on that grid, two bookings overlap exactly when they cover a common
+period, so per-day occupancy is just the number of bookings covering each
+period (the SlotCapacity ledger). DayOccupancy packs the full slots of a
+day into an int bitmap; "can this fit" is then one mask test and listing
+every feasible start is one test per slot. Which slots are bookable, and
+how many bookings each takes, comes from the compiled operating schedule.
+"""
+from datetime import time, timedelta
+
+from .models import SlotCapacity
+from .operating_schedule import SLOT_MINUTES, get_schedule, to_minutes
+
+# Bookings that may be in progress at once when no bays are configured (see bays.py)
+MAX_BOOKINGS_PER_SLOT = 5
+
+# Used for bookings whose service has no known duration
+DEFAULT_DURATION = SLOT_MINUTES
+
+
+def covered_slots(start, duration):
+    """Start times of the slot periods a booking starting at start for duration minutes overlaps"""
+    begin = to_minutes(start)
+    end = begin + max(duration or DEFAULT_DURATION, 1)
+    first = begin - begin % SLOT_MINUTES
+    return [time(minute // 60, minute % 60) for minute in range(first, min(end, 24 * 60), SLOT_MINUTES)]
+
+
+def ends_by_closing(start, duration, day):
+    """True if a booking starting at start finishes by the day's closing time"""
+    return to_minutes(start) + (duration or DEFAULT_DURATION) <= day.closes
+
+
+class DayOccupancy:
+    """Bookings covering each slot of one day, answering fit queries"""
+
+    def __init__(self, counts, day):
+        self.slots = day.slots
+        self.capacity = day.capacity
+        self.closing = day.closes
+        self.index = {slot: i for i, slot in enumerate(self.slots)}
+        self.counts = [counts.get(slot, 0) for slot in self.slots]
+        # Bit i is set when slot i has no room left
+        self.full = sum(1 << i for i, count in enumerate(self.counts) if count >= self.capacity)
+
+    def _span(self, start, duration):
+        """Indexes (first, last) of the slots a booking covers, or None if it can't be placed"""
+        if start not in self.index or to_minutes(start) + duration > self.closing:
+            return None
+        first = self.index[start]
+        last = first
+        end = to_minutes(start) + duration
+        while last + 1 < len(self.slots) and to_minutes(self.slots[last + 1]) < end:
+            last += 1
+        return first, last
+
+    def can_fit(self, start, duration=DEFAULT_DURATION):
+        """True if a booking of duration minutes can start at start"""
+        span = self._span(start, duration)
+        if span is None:
+            return False
+        first, last = span
+        mask = ((1 << (last - first + 1)) - 1) << first
+        return not self.full & mask
+
+    def remaining(self, start, duration=DEFAULT_DURATION):
+        """Places left for a booking of duration minutes starting at start"""
+        span = self._span(start, duration)
+        if span is None:
+            return 0
+        first, last = span
+        return max(self.capacity - max(self.counts[first:last + 1]), 0)
+
+    def feasible_starts(self, duration=DEFAULT_DURATION):
+        """Every slot a booking of duration minutes could start at"""
+        return [slot for slot in self.slots if self.can_fit(slot, duration)]
+
+
+def load_occupancy(start, end):
+    """Return {date: DayOccupancy} for every day from start to end, in one query"""
+    schedule = get_schedule()
+    counts = {}
+    for row_date, row_time, count in SlotCapacity.objects.filter(
+        booking_date__range=(start, end)
+    ).values_list('booking_date', 'booking_time', 'booked_count'):
+        counts.setdefault(row_date, {})[row_time] = count
+
+    days = {}
+    day = start
+    while day <= end:
+        days[day] = DayOccupancy(counts.get(day, {}), schedule.for_date(day))
+        day += timedelta(days=1)
+    return days
@@ -0,0 +1,116 @@
+"""
+Indexed search for bookings and users
+
+One API over two backends:
+
+* PostgreSQL: the icontains filters below are served by pg_trgm GIN
+  indexes on UPPER(column) created in migration 0006.
+* SQLite: FTS5 shadow tables with the trigram tokenizer, kept in sync with
+  their source tables by triggers that install_sqlite_search() (re)creates
+  after every migrate, since SQLite table rebuilds drop triggers.
+
+Queries shorter than three characters can't use a trigram index on either
+backend and fall back to a plain icontains scan.
+"""
+from functools import reduce
+from operator import or_
+
+from django.db import OperationalError, connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+BOOKING_SEARCH_FIELDS = ('customer_name', 'customer_email', 'vehicle_plate')
+USER_SEARCH_FIELDS = ('username', 'email', 'first_name', 'last_name')
+
+# FTS table -> (source table, indexed columns)
+SQLITE_FTS_TABLES = {
+    'bookings_booking_fts': ('bookings_booking', BOOKING_SEARCH_FIELDS),
+    'bookings_user_fts': ('auth_user', USER_SEARCH_FIELDS),
+}
+
+MIN_TRIGRAM_LENGTH = 3
+
+_fts_ready = {}
+
+
+def search_bookings(queryset, query):
+    """Filter a Booking queryset to rows whose name, email or plate contain query"""
+    return _search(queryset, 'bookings_booking_fts', BOOKING_SEARCH_FIELDS, query)
+
+
+def search_users(queryset, query):
+    """Filter a User queryset to rows whose username, email or name contain query"""
+    return _search(queryset, 'bookings_user_fts', USER_SEARCH_FIELDS, query)
+
+
+def _search(queryset, fts_table, fields, query):
+    query = query.strip()
+    if not query:
+        return queryset
+
+    connection = connections[queryset.db]
+    if len(query) >= MIN_TRIGRAM_LENGTH and _sqlite_fts_available(connection):
+        # Column-filtered phrase query; the trigram tokenizer matches substrings case-insensitively
+        match = '{%s} : "%s"' % (' '.join(fields), query.replace('"', '""'))
+        return queryset.filter(
+            pk__in=RawSQL(f'SELECT rowid FROM {fts_table} WHERE {fts_table} MATCH %s', [match])
+        )
+
+    return queryset.filter(reduce(or_, (Q(**{f'{field}__icontains': query}) for field in fields)))
+
+
+def _sqlite_fts_available(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    if connection.alias not in _fts_ready:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+            tables = {row[0] for row in cursor.fetchall()}
+        _fts_ready[connection.alias] = all(table in tables for table in SQLITE_FTS_TABLES)
+    return _fts_ready[connection.alias]
+
+
+def install_sqlite_search(using='default'):
+    """Create any missing FTS5 tables and sync triggers, rebuilding tables that were out of sync"""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        existing = {row[0] for row in cursor.fetchall()}
+
+        for fts_table, (table, columns) in SQLITE_FTS_TABLES.items():
+            triggers = [f'{fts_table}_insert', f'{fts_table}_delete', f'{fts_table}_update']
+            if table not in existing or all(name in existing for name in [fts_table, *triggers]):
+                continue
+
+            column_list = ', '.join(columns)
+            new_values = ', '.join(f'new.{column}' for column in columns)
+            old_values = ', '.join(f'old.{column}' for column in columns)
+            try:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5("
+                    f"{column_list}, content='{table}', content_rowid='id', tokenize='trigram')"
+                )
+            except OperationalError as e:
+                print(f'[WARNING] SQLite search index unavailable: {e}')
+                return
+
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {fts_table}_insert AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {fts_table}(rowid, {column_list}) VALUES (new.id, {new_values}); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {fts_table}_delete AFTER DELETE ON {table} BEGIN "
+                f"INSERT INTO {fts_table}({fts_table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {fts_table}_update AFTER UPDATE OF {column_list} ON {table} BEGIN "
+                f"INSERT INTO {fts_table}({fts_table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); "
+                f"INSERT INTO {fts_table}(rowid, {column_list}) VALUES (new.id, {new_values}); END"
+            )
+            # Triggers were missing, so the index may have drifted from its source table
+            cursor.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+
+    _fts_ready.pop(using, None)
@@ -0,0 +1,108 @@
+"""
+Declarative service catalog seeding
+
+The services a deployment should offer are listed in a JSON file
+(bookings/data/services.json by default) and applied with
+`manage.py seed_services` on every deploy. Services are matched by their
+unique name, so ids stay stable for existing bookings and links. Rows
+that already match the file are left untouched, and every new or changed
+row is written with one INSERT ... ON CONFLICT (name) DO UPDATE.
+
+Fields an entry leaves out keep their current value (or the model default
+for a new service), so staff edits to them survive a redeploy. Services
+missing from the file are reported but never deleted.
+"""
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .catalog import bump_catalog_version
+from .models import Service
+
+DEFAULT_CATALOG_FILE = Path(__file__).resolve().parent / 'data' / 'services.json'
+
+# Fields a catalog entry may set besides the name
+SEED_FIELDS = ('description', 'category', 'price', 'duration', 'icon', 'features', 'is_active', 'display_order')
+
+
+@dataclass
+class SeedResult:
+    created: list = field(default_factory=list)
+    updated: list = field(default_factory=list)  # (name, {field: (old, new)})
+    unchanged: int = 0
+    missing: list = field(default_factory=list)
+
+    @property
+    def changed(self):
+        return bool(self.created or self.updated)
+
+
+def load_catalog(path=DEFAULT_CATALOG_FILE):
+    """Read and check a catalog file; returns its entries"""
+    with open(path, encoding='utf-8') as f:
+        entries = json.load(f)
+    if not isinstance(entries, list):
+        raise ValueError('The catalog must be a list of services.')
+
+    names = set()
+    for position, entry in enumerate(entries, start=1):
+        if not isinstance(entry, dict) or not entry.get('name'):
+            raise ValueError(f'Entry {position} has no name.')
+        unknown = set(entry) - {'name', *SEED_FIELDS}
+        if unknown:
+            raise ValueError(f'{entry["name"]}: unknown fields {", ".join(sorted(unknown))}.')
+        if entry['name'] in names:
+            raise ValueError(f'{entry["name"]} is listed more than once.')
+        names.add(entry['name'])
+    return entries
+
+
+def _row(entry, current):
+    """Validated unsaved Service for an entry, carrying over current values for omitted fields"""
+    row = Service(name=entry['name'])
+    if current is not None:
+        for name in SEED_FIELDS:
+            setattr(row, name, getattr(current, name))
+    for name, value in entry.items():
+        setattr(row, name, value)
+    try:
+        row.full_clean(validate_unique=False, validate_constraints=False)
+    except ValidationError as e:
+        raise ValueError(f'{entry["name"]}: {"; ".join(e.messages)}') from e
+    return row
+
+
+def seed_services(entries, dry_run=False):
+    """Create or update services to match catalog entries; returns a SeedResult"""
+    result = SeedResult()
+    with transaction.atomic():
+        existing = {service.name: service for service in Service.objects.select_for_update()}
+        rows = []
+        for entry in entries:
+            current = existing.pop(entry['name'], None)
+            row = _row(entry, current)
+            if current is None:
+                result.created.append(row.name)
+                rows.append(row)
+                continue
+            changes = {
+                name: (getattr(current, name), getattr(row, name))
+                for name in SEED_FIELDS if getattr(current, name) != getattr(row, name)
+            }
+            if changes:
+                result.updated.append((row.name, changes))
+                rows.append(row)
+            else:
+                result.unchanged += 1
+        result.missing = sorted(existing)
+
+        if rows and not dry_run:
+            Service.objects.bulk_create(
+                rows, update_conflicts=True, unique_fields=['name'], update_fields=[*SEED_FIELDS, 'updated_at'],
+            )
+            # bulk_create sends no post_save, so invalidate the cached catalog here
+            bump_catalog_version()
+    return result
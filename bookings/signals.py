@@ -1,7 +1,12 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, pre_save, pre_delete, post_delete
 from django.contrib.auth.models import User
 from django.dispatch import receiver
-from .models import UserProfile
+from .models import UserProfile, Bay, Booking, OperatingSchedule, Service
+from .bays import find_bay, invalidate_bays, needs_allocation
+from .catalog import bump_catalog_version
+from .dashboard import bump_users_version
+from .operating_schedule import bump_schedule_version
+from .tracking import record_booking_changes
 
 
 @receiver(post_save, sender=User)
@@ -13,6 +18,76 @@ def create_user_profile(sender, instance, created, **kwargs):
 
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, **kwargs):
-    """Save UserProfile when User is saved"""
+    """Save UserProfile when User is saved (leaving the booking counters alone)"""
     if hasattr(instance, 'profile'):
-        instance.profile.save()
+        instance.profile.save(update_fields=UserProfile.DETAIL_FIELDS)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_user_list(sender, **kwargs):
+    """Account and role changes show up on the staff users tab"""
+    bump_users_version()
+
+
+@receiver(pre_save, sender=Booking)
+def remember_booking_state(sender, instance, **kwargs):
+    """Capture the stored tracked fields before a Booking is saved, allocating a bay if needed"""
+    instance._previous_state = instance.get_stored_state()
+    
+    # Bookings saved outside create_booking (Django admin, shell) are allocated here
+    if not kwargs.get('raw') and needs_allocation(instance, instance._previous_state):
+        instance.bay = find_bay(instance)
+        if instance.bay is None:
+            print(f'[WARNING] No free bay for booking {instance.pk or "(new)"}; left unallocated')
+
+
+@receiver(post_save, sender=Booking)
+def track_booking_save(sender, instance, created, **kwargs):
+    """Update the slot ledger and daily rollups when a booking is created or changed"""
+    record_booking_changes(
+        [(instance._previous_state, instance.get_tracked_state())],
+        # create_booking reserves the slot itself before saving
+        slots_reserved=created and getattr(instance, '_slot_reserved', False),
+        booking_ids=[instance.pk],
+    )
+    
+    # The saved values are now the stored state for the next save
+    instance._loaded_values = {
+        field.attname: getattr(instance, field.attname) for field in sender._meta.concrete_fields
+    }
+
+
+@receiver(pre_delete, sender=Booking)
+def remember_deleted_booking_state(sender, instance, **kwargs):
+    """Capture the stored tracked fields before a Booking is deleted"""
+    instance._previous_state = instance.get_stored_state()
+
+
+@receiver(post_delete, sender=Booking)
+def track_booking_delete(sender, instance, **kwargs):
+    """Release the slot and remove the booking from the daily rollups"""
+    record_booking_changes([(instance._previous_state, None)], booking_ids=[instance.pk])
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+def invalidate_service_catalog(sender, **kwargs):
+    """Service changes (views, Django admin, shell) bump the catalog version in this process's cache"""
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=Bay)
+@receiver(post_delete, sender=Bay)
+def invalidate_bay_list(sender, **kwargs):
+    """Bay changes alter allocation candidates and per-slot capacity"""
+    invalidate_bays()
+
+
+@receiver(post_save, sender=OperatingSchedule)
+@receiver(post_delete, sender=OperatingSchedule)
+def invalidate_operating_schedule(sender, **kwargs):
+    """Recompile the slot table after any opening-hours change"""
+    bump_schedule_version()
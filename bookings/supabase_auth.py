@@ -0,0 +1,153 @@
+"""
+Local verification and refresh of Supabase session tokens
+
+Access tokens stored in the session by user_login are checked with PyJWT:
+HS256 tokens against SUPABASE_JWT_SECRET, asymmetric (RS256/ES256) tokens
+against the project's JWKS, which is fetched once and cached per process.
+A valid token therefore costs no outbound call.
+
+Tokens close to expiry are refreshed by a background thread calling the
+GoTrue token endpoint directly (not the shared SDK client, which keeps
+per-user session state). The new pair is parked in the cache under the
+old refresh token and swapped into the session on the owner's next
+request. Logging out revokes the session through the same endpoint set,
+from the task worker.
+"""
+import hashlib
+import threading
+import time
+
+import jwt
+import requests
+from django.conf import settings
+from django.core.cache import cache
+
+from .tasks import task
+
+ASYMMETRIC_ALGORITHMS = ['RS256', 'ES256']
+AUDIENCE = 'authenticated'
+
+# How long a refreshed token pair waits in the cache for its session to pick it up
+REFRESHED_TTL = 300
+
+# One refresh attempt per refresh token per window, across threads and workers
+REFRESH_LOCK_TTL = 60
+
+
+class MissingSecretError(jwt.PyJWKClientError):
+    """An HS256 token arrived but SUPABASE_JWT_SECRET is not configured"""
+
+_jwks_client = None
+_jwks_lock = threading.Lock()
+
+
+def _get_jwks_client():
+    """Return this process's JWKS client; it caches the key set itself"""
+    global _jwks_client
+    if _jwks_client is None:
+        with _jwks_lock:
+            if _jwks_client is None:
+                _jwks_client = jwt.PyJWKClient(
+                    f'{settings.SUPABASE_URL}/auth/v1/.well-known/jwks.json',
+                    cache_jwk_set=True,
+                    lifespan=settings.SUPABASE_JWKS_CACHE_TTL,
+                    headers={'apikey': settings.SUPABASE_ANON_KEY},
+                    timeout=5,
+                )
+    return _jwks_client
+
+
+def verify_access_token(token):
+    """
+    Return the verified claims of a Supabase access token
+
+    Raises jwt.InvalidTokenError (ExpiredSignatureError for expired
+    tokens) if the token is bad, or jwt.PyJWKClientError if no key to
+    check it against is available.
+    """
+    algorithm = jwt.get_unverified_header(token).get('alg')
+    if algorithm == 'HS256':
+        if not settings.SUPABASE_JWT_SECRET:
+            raise MissingSecretError('SUPABASE_JWT_SECRET is not configured')
+        key, algorithms = settings.SUPABASE_JWT_SECRET, ['HS256']
+    elif algorithm in ASYMMETRIC_ALGORITHMS:
+        key, algorithms = _get_jwks_client().get_signing_key_from_jwt(token).key, ASYMMETRIC_ALGORITHMS
+    else:
+        raise jwt.InvalidAlgorithmError(f'Unsupported token algorithm: {algorithm}')
+
+    return jwt.decode(
+        token,
+        key,
+        algorithms=algorithms,
+        audience=AUDIENCE,
+        issuer=f'{settings.SUPABASE_URL}/auth/v1',
+        options={'require': ['exp', 'sub']},
+    )
+
+
+def needs_refresh(claims):
+    """True once a token is within SUPABASE_TOKEN_REFRESH_MARGIN seconds of expiring"""
+    return claims['exp'] - time.time() < settings.SUPABASE_TOKEN_REFRESH_MARGIN
+
+
+def _refresh_key(refresh_token):
+    return 'supabase-refresh:' + hashlib.sha256(refresh_token.encode()).hexdigest()
+
+
+def fetch_refreshed_tokens(refresh_token):
+    """Exchange a refresh token for a new (access, refresh) pair, or None on failure"""
+    try:
+        response = requests.post(
+            f'{settings.SUPABASE_URL}/auth/v1/token',
+            params={'grant_type': 'refresh_token'},
+            json={'refresh_token': refresh_token},
+            headers={'apikey': settings.SUPABASE_ANON_KEY},
+            timeout=5,
+        )
+        response.raise_for_status()
+        data = response.json()
+        return data['access_token'], data['refresh_token']
+    except Exception as e:
+        print(f'[WARNING] Supabase token refresh failed: {e}')
+        return None
+
+
+def refresh_in_background(refresh_token):
+    """Start a refresh unless another thread or worker already owns this token's"""
+    key = _refresh_key(refresh_token)
+    # Refresh tokens are single use, so exactly one caller may spend it
+    if not cache.add(f'{key}:refreshing', True, timeout=REFRESH_LOCK_TTL):
+        return None
+
+    def refresh():
+        tokens = fetch_refreshed_tokens(refresh_token)
+        if tokens is not None:
+            cache.set(key, tokens, timeout=REFRESHED_TTL)
+
+    thread = threading.Thread(target=refresh, name='supabase-token-refresh', daemon=True)
+    thread.start()
+    return thread
+
+
+def take_refreshed_tokens(refresh_token):
+    """Return and discard the token pair a background refresh produced, if it is ready"""
+    key = _refresh_key(refresh_token)
+    tokens = cache.get(key)
+    if tokens is not None:
+        cache.delete_many([key, f'{key}:refreshing'])
+    return tokens
+
+
+@task(secret_kwargs=True)
+def revoke_session(access_token):
+    """Sign a session out of Supabase (run by the task worker after user_logout)"""
+    if not settings.SUPABASE_URL:
+        return
+    response = requests.post(
+        f'{settings.SUPABASE_URL}/auth/v1/logout',
+        headers={'apikey': settings.SUPABASE_ANON_KEY, 'Authorization': f'Bearer {access_token}'},
+        timeout=5,
+    )
+    # An expired or already revoked token has nothing left to sign out
+    if response.status_code not in (401, 403, 404):
+        response.raise_for_status()
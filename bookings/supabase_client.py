@@ -1,34 +1,70 @@
 """
 Supabase client configuration for authentication
+
+The supabase SDK (realtime, websockets, storage, postgrest) is only
+imported, and the clients only built, the first time a view asks for
+one, so manage.py commands and worker boots don't pay for it. Clients
+are kept per process: their HTTP connection pools must not be shared
+across gunicorn's forked workers (see gunicorn.conf.py).
 """
-from supabase import create_client, Client
+import os
+import threading
+
 from django.conf import settings
 
-# Initialize Supabase client
-supabase: Client = None
-supabase_admin: Client = None
-
-try:
-    if settings.SUPABASE_URL and settings.SUPABASE_ANON_KEY:
-        # Regular client with anon key
-        supabase = create_client(settings.SUPABASE_URL, settings.SUPABASE_ANON_KEY)
-        
-        # Admin client with service role key (for admin operations)
-        if settings.SUPABASE_SERVICE_ROLE_KEY:
-            supabase_admin = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_ROLE_KEY)
-        
-        print('[SUCCESS] Supabase clients initialized successfully')
-    else:
-        print('[WARNING] Supabase credentials not configured')
-except Exception as e:
-    print(f'[ERROR] Error initializing Supabase: {e}')
+_clients = {}
+_clients_pid = None
+_lock = threading.Lock()
+
+
+def _create_client(key):
+    from supabase import create_client
+    return create_client(settings.SUPABASE_URL, key)
+
+
+def _get_client(name, key_setting):
+    """Return this process's client for name, creating it on first use"""
+    global _clients_pid
+
+    pid = os.getpid()
+    if _clients_pid == pid and name in _clients:
+        return _clients[name]
+
+    with _lock:
+        if _clients_pid != pid:
+            # Forked since the clients were built; never reuse the parent's connections
+            _clients.clear()
+            _clients_pid = pid
+        if name in _clients:
+            return _clients[name]
+
+        client = None
+        key = getattr(settings, key_setting, None)
+        if settings.SUPABASE_URL and key:
+            try:
+                client = _create_client(key)
+            except Exception as e:
+                print(f'[ERROR] Error initializing Supabase {name} client: {e}')
+        else:
+            print(f'[WARNING] Supabase credentials not configured ({key_setting})')
+
+        _clients[name] = client
+        return client
 
 
 def get_supabase_client():
-    """Get the Supabase client instance"""
-    return supabase
+    """Get the Supabase client instance (anon key)"""
+    return _get_client('anon', 'SUPABASE_ANON_KEY')
 
 
 def get_supabase_admin():
-    """Get the Supabase admin client instance"""
-    return supabase_admin
+    """Get the Supabase admin client instance (service role key)"""
+    return _get_client('admin', 'SUPABASE_SERVICE_ROLE_KEY')
+
+
+def reset_supabase_clients():
+    """Drop this process's clients; the next get_* call builds fresh ones"""
+    global _clients_pid
+    with _lock:
+        _clients.clear()
+        _clients_pid = None
@@ -0,0 +1,160 @@
+"""
+Background tasks stored in the database
+
+Slow calls that don't decide a response (revoking a Supabase session,
+refreshing the weather cache, sending outbox emails) are queued as Task
+rows and run by `manage.py run_tasks` instead of inside a request.
+
+A task is a function decorated with @task, queued by reference with
+enqueue(). Workers claim due tasks with SELECT ... FOR UPDATE SKIP LOCKED
+(see queueing.py), so any number of them can poll the same table. A task that raises is
+retried with exponential backoff; once it has used max_attempts it is
+marked dead and left for staff to inspect (dead-letter). A task whose
+worker died mid-run is picked up again after TASK_LOCK_TIMEOUT seconds.
+Every attempt is logged as a TaskRun with its duration. Tasks declared
+with @task(secret_kwargs=True) have their arguments wiped once they are
+done or dead, so credentials don't outlive the work that needed them.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import queueing
+from .models import Task, TaskRun
+
+# Longest wait between retries of one task
+MAX_RETRY_DELAY = timedelta(hours=1)
+
+
+def task(func=None, *, secret_kwargs=False):
+    """Mark a module-level function as runnable by the task worker"""
+    def mark(func):
+        func.is_task = True
+        func.secret_kwargs = secret_kwargs
+        return func
+    return mark(func) if func is not None else mark
+
+
+def task_name(func):
+    return f'{func.__module__}.{func.__qualname__}'
+
+
+def enqueue(func, kwargs=None, delay=None, max_attempts=3, unique=False):
+    """
+    Queue func(**kwargs) for a worker; kwargs must be JSON serialisable
+
+    Call inside the transaction that needs the work done, so the task
+    exists exactly when the change does. With unique=True an identical
+    task that is still queued is returned instead of adding another.
+    """
+    if not getattr(func, 'is_task', False):
+        raise ValueError(f'{task_name(func)} is not decorated with @task')
+    kwargs = kwargs or {}
+    if unique:
+        existing = Task.objects.filter(name=task_name(func), kwargs=kwargs, status='queued').first()
+        if existing is not None:
+            return existing
+    return Task.objects.create(
+        name=task_name(func),
+        kwargs=kwargs,
+        max_attempts=max_attempts,
+        run_after=timezone.now() + (delay or timedelta()),
+    )
+
+
+def _has_secret_kwargs(name):
+    try:
+        return getattr(import_string(name), 'secret_kwargs', False)
+    except ImportError:
+        return False
+
+
+def retry_delay(attempts):
+    """Wait before the next try after attempts failed runs"""
+    return queueing.backoff(attempts, settings.TASK_RETRY_SECONDS, MAX_RETRY_DELAY)
+
+
+def requeue_stale():
+    """Give tasks whose worker stopped mid-run back to the queue (or bury them if out of attempts)"""
+    now = timezone.now()
+    stale = queueing.expired_claims(Task.objects.filter(status='running'), settings.TASK_LOCK_TIMEOUT)
+    exhausted = stale.filter(attempts__gte=F('max_attempts'))
+    for name in {name for name in exhausted.values_list('name', flat=True) if _has_secret_kwargs(name)}:
+        exhausted.filter(name=name).update(kwargs={})
+    buried = exhausted.update(
+        status='dead', last_error='The worker stopped while running this task.', finished_at=now,
+    )
+    return stale.update(status='queued', run_after=now) + buried
+
+
+def claim_batch(batch_size=None):
+    """Lock and mark running up to batch_size due tasks; returns them"""
+    return queueing.claim_batch(
+        Task.objects.filter(status='queued'), 'run_after', batch_size or settings.TASK_BATCH_SIZE,
+        status='running', count_attempt=True,
+    )
+
+
+def run_task(item):
+    """Run one claimed task and record the outcome; returns True on success"""
+    started_at = timezone.now()
+    started = time.perf_counter()
+    error = ''
+    func = None
+    try:
+        func = import_string(item.name)
+        if not getattr(func, 'is_task', False):
+            # Never run arbitrary callables named in the table
+            item.attempts = item.max_attempts
+            raise ValueError(f'{item.name} is not a task')
+        func(**item.kwargs)
+    except Exception as e:
+        error = f'{type(e).__name__}: {e}'
+    duration_ms = round((time.perf_counter() - started) * 1000)
+
+    now = timezone.now()
+    if not error:
+        item.status, item.finished_at = 'done', now
+    elif item.attempts >= item.max_attempts:
+        print(f'[WARNING] Task {item.id} ({item.name}) failed for good: {error}')
+        item.status, item.finished_at = 'dead', now
+    else:
+        print(f'[WARNING] Task {item.id} ({item.name}) failed, retrying: {error}')
+        item.status, item.run_after = 'queued', now + retry_delay(item.attempts)
+    item.last_error = error or item.last_error
+    item.locked_at = None
+    update_fields = ['status', 'attempts', 'run_after', 'locked_at', 'last_error', 'finished_at']
+    if item.status != 'queued' and getattr(func, 'secret_kwargs', False):
+        item.kwargs = {}
+        update_fields.append('kwargs')
+    item.save(update_fields=update_fields)
+    TaskRun.objects.create(
+        task=item, started_at=started_at, duration_ms=duration_ms, succeeded=not error, error=error,
+    )
+    return not error
+
+
+def run_due_tasks(batch_size=None):
+    """Run batches until no task is due; returns (succeeded, failed) counts"""
+    requeue_stale()
+    succeeded = failed = 0
+    while True:
+        batch = claim_batch(batch_size)
+        if not batch:
+            return succeeded, failed
+        for item in batch:
+            if run_task(item):
+                succeeded += 1
+            else:
+                failed += 1
+
+
+def purge_finished():
+    """Delete done tasks (and their runs) older than TASK_RETENTION_DAYS; dead ones are kept"""
+    cutoff = timezone.now() - timedelta(days=settings.TASK_RETENTION_DAYS)
+    _, deleted = Task.objects.filter(status='done', finished_at__lt=cutoff).delete()
+    return deleted.get(Task._meta.label, 0)
@@ -1,7 +1,37 @@
-from django.test import TestCase
+from django.test import TestCase, RequestFactory, override_settings
 from django.contrib.auth.models import User
-from .models import Booking, UserProfile
-from datetime import date, time
+from django.core.cache import cache
+from django.conf import settings
+from unittest import mock
+from .models import Bay, Booking, EmailOutbox, OperatingSchedule, UserProfile, SlotCapacity, DailyBookingStats, Service, Task, WaitlistEntry, IdempotencyKey
+from .forms import BookingForm
+from django.core.exceptions import ValidationError
+from . import weather, capacity, emails, live, rollups, scheduling, seeding, supabase_client, supabase_auth, tasks
+from .middleware import SupabaseSessionMiddleware
+from .pagination import keyset_paginate, LAST_PAGE
+from .search import search_bookings, search_users
+from .catalog import get_catalog
+from .availability import nearest_slots
+from .bays import SAMPLE_BAYS, invalidate_bays, setup_bays, slot_capacity
+from .operating_schedule import day_schedule, get_schedule
+from django.core.management import CommandError, call_command
+from io import StringIO
+from datetime import date, time, timedelta
+import threading
+import time as clock
+import jwt
+from django.contrib.sessions.backends.db import SessionStore
+from django.http import HttpResponse
+from django.utils import timezone
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+import json
+import asyncio
+import socketserver
+import csv
+import os
+import tempfile
 
 
 class UserProfileModelTest(TestCase):
@@ -82,3 +112,2060 @@ class ViewsTest(TestCase):
         self.client.login(username='testuser', password='testpass123')
         response = self.client.get('/dashboard/')
         self.assertEqual(response.status_code, 200)
+
+
+WEATHER_PAYLOAD = {
+    'name': 'Iligan City',
+    'main': {'temp': 30, 'humidity': 70},
+    'weather': [{'main': 'Clear', 'description': 'clear sky', 'icon': '01d'}],
+    'wind': {'speed': 3.5},
+}
+
+
+def join_weather_refreshes():
+    """Wait for background weather refresh threads to finish"""
+    for thread in threading.enumerate():
+        if thread.name.startswith('weather-refresh-'):
+            thread.join(5)
+
+
+@override_settings(OPENWEATHER_API_KEY='test-key', WEATHER_CACHE_TTL=600, WEATHER_CACHE_STALE_TTL=3600)
+class WeatherCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch('bookings.weather.requests.get')
+        self.mock_get = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mock_get.return_value.json.return_value = WEATHER_PAYLOAD
+    
+    def test_repeat_lookups_hit_cache(self):
+        """Test normalized city names share one cached entry"""
+        first = weather.get_weather('Iligan City')
+        second = weather.get_weather('  iligan   CITY ')
+        self.assertEqual(first, second)
+        self.assertEqual(first['temperature'], 30)
+        self.assertEqual(self.mock_get.call_count, 1)
+    
+    def test_concurrent_misses_coalesce(self):
+        """Test a burst of misses for one city makes a single upstream call"""
+        release = threading.Event()
+        
+        def slow_get(*args, **kwargs):
+            release.wait(2)
+            return mock.DEFAULT
+        self.mock_get.side_effect = slow_get
+        
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(weather.get_weather('Iligan City'))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(self.mock_get.call_count, 1)
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all(result['location'] == 'Iligan City' for result in results))
+    
+    def test_stale_entry_served_while_refreshing(self):
+        """Test stale data is returned immediately and refreshed in the background"""
+        weather.get_weather('Iligan City')
+        key = weather._cache_key('Iligan City')
+        entry = cache.get(key)
+        entry['fetched_at'] -= 601
+        cache.set(key, entry)
+        
+        data = weather.get_weather('Iligan City')
+        weather.get_weather('Iligan City')
+        self.assertEqual(data['temperature'], 30)
+        join_weather_refreshes()
+        self.assertEqual(self.mock_get.call_count, 2)
+        self.assertGreater(cache.get(key)['fetched_at'], entry['fetched_at'])
+        self.assertIsNone(cache.get(f'{key}:refreshing'))
+    
+    def test_cold_cache_without_waiting(self):
+        """Test a page that won't wait gets a placeholder while the reading is fetched"""
+        with mock.patch('bookings.weather.threading.Thread') as mock_thread:
+            data = weather.get_weather('Iligan City', wait=False)
+        self.assertIn('error', data)
+        self.mock_get.assert_not_called()
+        mock_thread.return_value.start.assert_called_once()
+    
+    def test_refresh_reaches_web_process_cache(self):
+        """Test the reading lands in the cache of the process serving pages, not the task worker's"""
+        from django.core.cache.backends.locmem import LocMemCache
+        web_cache = LocMemCache('weather-web', {})
+        worker_cache = LocMemCache('weather-worker', {})
+        
+        with mock.patch('bookings.weather.cache', web_cache):
+            self.assertIn('error', weather.get_weather('Iligan City', wait=False))
+            join_weather_refreshes()
+        with mock.patch('bookings.weather.cache', worker_cache):
+            tasks.run_due_tasks()
+        with mock.patch('bookings.weather.cache', web_cache):
+            self.assertEqual(weather.get_weather('Iligan City', wait=False)['temperature'], 30)
+        self.assertEqual(self.mock_get.call_count, 1)
+        self.assertIsNone(worker_cache.get(weather._cache_key('Iligan City')))
+    
+    def test_failed_refresh_keeps_last_good_reading(self):
+        """Test an upstream error doesn't replace cached weather"""
+        weather.get_weather('Iligan City')
+        self.mock_get.side_effect = Exception('upstream down')
+        data = weather._fetch_and_store('Iligan City', weather._cache_key('Iligan City'))
+        self.assertNotIn('error', data)
+        self.assertEqual(data['temperature'], 30)
+
+
+def make_booking(user, **kwargs):
+    """Create a booking with sensible defaults for tests"""
+    fields = {
+        'user': user,
+        'customer_name': 'Jane Doe',
+        'customer_email': 'jane@example.com',
+        'customer_phone': '09123456789',
+        'vehicle_type': 'sedan',
+        'vehicle_plate': 'XYZ9876',
+        'service': 'basic',
+        'booking_date': date.today() + timedelta(days=7),
+        'booking_time': time(10, 0),
+        'price': 25,
+    }
+    fields.update(kwargs)
+    return Booking.objects.create(**fields)
+
+
+class SlotCapacityTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='slotuser',
+            email='slot@example.com',
+            password='testpass123'
+        )
+        self.day = date.today() + timedelta(days=7)
+        self.slot = time(10, 0)
+    
+    def make_booking(self, **kwargs):
+        kwargs.setdefault('booking_date', self.day)
+        kwargs.setdefault('booking_time', self.slot)
+        return make_booking(self.user, **kwargs)
+    
+    def booked(self):
+        return SlotCapacity.objects.get(booking_date=self.day, booking_time=self.slot).booked_count
+    
+    def test_reserve_stops_at_capacity(self):
+        """Test the conditional increment refuses a sixth reservation"""
+        for _ in range(slot_capacity()):
+            self.assertTrue(capacity.reserve_slot(self.day, self.slot))
+        self.assertFalse(capacity.reserve_slot(self.day, self.slot))
+        self.assertEqual(self.booked(), slot_capacity())
+    
+    def test_status_changes_and_delete_update_ledger(self):
+        """Test cancelling, restoring and deleting a booking move the count"""
+        booking = self.make_booking()
+        self.assertEqual(self.booked(), 1)
+        
+        booking.status = 'cancelled'
+        booking.save()
+        self.assertEqual(self.booked(), 0)
+        
+        booking = Booking.objects.get(pk=booking.pk)
+        booking.status = 'confirmed'
+        booking.save()
+        self.assertEqual(self.booked(), 1)
+        
+        booking.delete()
+        self.assertEqual(self.booked(), 0)
+    
+    def test_bulk_status_update_keeps_ledger(self):
+        """Test the admin bulk actions adjust the ledger"""
+        for _ in range(3):
+            self.make_booking()
+        self.make_booking(status='cancelled')
+        
+        Booking.objects.all().update_status('cancelled')
+        self.assertEqual(self.booked(), 0)
+        
+        Booking.objects.all().update_status('confirmed')
+        self.assertEqual(self.booked(), 4)
+    
+    def test_create_booking_rejects_full_slot(self):
+        """Test the booking view refuses a slot once the ledger is full"""
+        for _ in range(slot_capacity()):
+            self.make_booking()
+        
+        self.client.login(username='slotuser', password='testpass123')
+        response = self.client.post('/user/booking/create/', {
+            'customer_name': 'Jane Doe',
+            'customer_email': 'jane@example.com',
+            'customer_phone': '09123456789',
+            'vehicle_type': 'sedan',
+            'vehicle_plate': 'XYZ9876',
+            'service': 'basic',
+            'booking_date': self.day.isoformat(),
+            'booking_time': '10:00:00',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'fully booked')
+        self.assertEqual(Booking.objects.count(), slot_capacity())
+        self.assertEqual(self.booked(), slot_capacity())
+
+
+class SchedulingTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='scheduser',
+            email='sched@example.com',
+            password='testpass123'
+        )
+        self.day = date.today() + timedelta(days=7)
+    
+    def booked(self, slot):
+        row = SlotCapacity.objects.filter(booking_date=self.day, booking_time=slot).first()
+        return row.booked_count if row else 0
+    
+    def test_long_booking_covers_every_overlapped_slot(self):
+        """Test a 120-minute booking takes places in both hourly slots and releases them"""
+        booking = make_booking(self.user, booking_date=self.day, booking_time=time(10, 0), duration=120)
+        self.assertEqual([self.booked(time(hour, 0)) for hour in (9, 10, 11, 12)], [0, 1, 1, 0])
+        
+        booking.status = 'cancelled'
+        booking.save()
+        self.assertEqual([self.booked(time(hour, 0)) for hour in (10, 11)], [0, 0])
+    
+    def test_occupancy_fit_queries(self):
+        """Test can_fit and feasible_starts account for later full slots and closing time"""
+        occupancy = scheduling.DayOccupancy({time(11, 0): slot_capacity()}, day_schedule(self.day))
+        self.assertTrue(occupancy.can_fit(time(10, 0), 60))
+        self.assertFalse(occupancy.can_fit(time(10, 0), 90))
+        self.assertFalse(occupancy.can_fit(time(17, 0), 120))
+        self.assertEqual(occupancy.remaining(time(9, 0), 120), slot_capacity())
+        self.assertEqual(
+            occupancy.feasible_starts(120),
+            [time(8, 0), time(9, 0), time(12, 0), time(13, 0), time(14, 0), time(15, 0), time(16, 0)]
+        )
+    
+    def test_reserve_is_all_or_nothing(self):
+        """Test a reservation blocked by one covered slot leaves the others untouched"""
+        for _ in range(slot_capacity()):
+            self.assertTrue(capacity.reserve_slot(self.day, time(11, 0)))
+        self.assertFalse(capacity.reserve_slot(self.day, time(10, 0), duration=120))
+        self.assertEqual(self.booked(time(10, 0)), 0)
+    
+    def test_create_booking_checks_service_duration(self):
+        """Test the booking view refuses a long service that runs into a full slot"""
+        service = Service.objects.create(name='Premium Detail', description='Full detail', category='package', price=85, duration=120)
+        for _ in range(slot_capacity()):
+            make_booking(self.user, booking_date=self.day, booking_time=time(11, 0))
+        
+        self.client.login(username='scheduser', password='testpass123')
+        form = {
+            'customer_name': 'Jane Doe',
+            'customer_email': 'jane@example.com',
+            'customer_phone': '09123456789',
+            'vehicle_type': 'sedan',
+            'vehicle_plate': 'XYZ9876',
+            'service': 'basic',
+            'service_id': service.id,
+            'booking_date': self.day.isoformat(),
+        }
+        response = self.client.post('/user/booking/create/', {**form, 'booking_time': '10:00:00'})
+        self.assertContains(response, 'fully booked')
+        response = self.client.post('/user/booking/create/', {**form, 'booking_time': '17:00:00'})
+        self.assertContains(response, 'past closing time')
+        
+        response = self.client.post('/user/booking/create/', {**form, 'booking_time': '08:00:00'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Booking.objects.get(booking_time=time(8, 0)).duration, 120)
+        self.assertEqual([self.booked(time(8, 0)), self.booked(time(9, 0))], [1, 1])
+    
+    def test_service_dropdown_carries_durations(self):
+        """Test the service choice lists each catalog service's duration for the availability lookups"""
+        with self.captureOnCommitCallbacks(execute=True):
+            service = Service.objects.create(name='Premium Detail', description='Full detail', category='package', price=85, duration=120)
+        self.client.login(username='scheduser', password='testpass123')
+        response = self.client.get('/user/booking/create/')
+        self.assertContains(response, f'<option value="{service.id}" data-duration="120">', html=False)
+        self.assertNotContains(response, 'duration=120')
+        
+        # A rejected submission keeps the chosen service
+        response = self.client.post('/user/booking/create/', {'service': 'basic', 'service_id': service.id})
+        self.assertContains(response, f'<option value="{service.id}" data-duration="120" selected>', html=False)
+
+
+class BayAllocationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        setup_bays(SAMPLE_BAYS)
+        self.user = User.objects.create_user(
+            username='bayuser',
+            email='bay@example.com',
+            password='testpass123'
+        )
+        self.day = date.today() + timedelta(days=7)
+        self.truck_bay = Bay.objects.get(vehicle_types='')
+    
+    def book(self, **kwargs):
+        kwargs.setdefault('booking_date', self.day)
+        return make_booking(self.user, **kwargs)
+    
+    def test_general_bays_fill_before_large_vehicle_bay(self):
+        """Test cars go to the general bays first, leaving the truck bay free"""
+        cars = [self.book() for _ in range(4)]
+        self.assertEqual(len({car.bay_id for car in cars}), 4)
+        self.assertNotIn(self.truck_bay.id, [car.bay_id for car in cars])
+        self.assertEqual(self.book(vehicle_type='truck').bay, self.truck_bay)
+    
+    def test_bay_reused_once_previous_booking_ends(self):
+        """Test a bay is free again after a long booking's interval"""
+        self.book(vehicle_type='van', booking_time=time(10, 0), duration=120)
+        self.assertIsNone(self.book(vehicle_type='truck', booking_time=time(11, 0)).bay)
+        self.assertEqual(self.book(vehicle_type='truck', booking_time=time(12, 0)).bay, self.truck_bay)
+    
+    def test_create_booking_rejects_when_no_suitable_bay(self):
+        """Test the booking view refuses a truck when the only truck bay is taken"""
+        self.book(vehicle_type='truck')
+        self.client.login(username='bayuser', password='testpass123')
+        response = self.client.post('/user/booking/create/', {
+            'customer_name': 'Jane Doe',
+            'customer_email': 'jane@example.com',
+            'customer_phone': '09123456789',
+            'vehicle_type': 'van',
+            'vehicle_plate': 'XYZ9876',
+            'service': 'basic',
+            'booking_date': self.day.isoformat(),
+            'booking_time': '10:00:00',
+        })
+        self.assertContains(response, 'no bay that can take a van')
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertEqual(SlotCapacity.objects.get(booking_date=self.day, booking_time=time(10, 0)).booked_count, 1)
+    
+    def test_empty_fleet_admits_bookings_by_ledger_alone(self):
+        """Test with no bays set up, bookings are taken without a bay up to the advertised capacity"""
+        with self.captureOnCommitCallbacks(execute=True):
+            Bay.objects.all().delete()
+        self.assertEqual(slot_capacity(), 5)
+        self.client.login(username='bayuser', password='testpass123')
+        response = self.client.get('/api/availability/', {'start': self.day.isoformat(), 'days': 1})
+        self.assertEqual(response.json()['availability'][self.day.isoformat()]['10:00:00'], 5)
+        
+        response = self.client.post('/user/booking/create/', {
+            'customer_name': 'Jane Doe',
+            'customer_email': 'jane@example.com',
+            'customer_phone': '09123456789',
+            'vehicle_type': 'van',
+            'vehicle_plate': 'XYZ9876',
+            'service': 'basic',
+            'booking_date': self.day.isoformat(),
+            'booking_time': '10:00:00',
+        })
+        self.assertRedirects(response, '/user/dashboard/', fetch_redirect_response=False)
+        booking = Booking.objects.get()
+        self.assertIsNone(booking.bay)
+        
+        # Setting bays up later allocates the waiting bookings
+        out = StringIO()
+        call_command('setup_bays', 'Wide bay=', stdout=out)
+        self.assertIn('Created 1 bays', out.getvalue())
+        self.assertEqual(Booking.objects.get().bay.name, 'Wide bay')
+    
+    def test_restored_booking_is_reallocated(self):
+        """Test a bulk restore from cancelled finds the booking a free bay again"""
+        truck = self.book(vehicle_type='truck')
+        Booking.objects.filter(pk=truck.pk).update_status('cancelled')
+        other = self.book(vehicle_type='truck')
+        self.assertEqual(other.bay, self.truck_bay)
+        
+        Booking.objects.filter(pk=truck.pk).update_status('confirmed')
+        self.assertIsNone(Booking.objects.get(pk=truck.pk).bay)
+        other.delete()
+        Booking.objects.filter(pk=truck.pk).update_status('cancelled')
+        Booking.objects.filter(pk=truck.pk).update_status('confirmed')
+        self.assertEqual(Booking.objects.get(pk=truck.pk).bay, self.truck_bay)
+    
+    def test_capacity_follows_active_bays(self):
+        """Test deactivating a bay lowers per-slot capacity"""
+        self.assertEqual(slot_capacity(), 5)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.truck_bay.is_active = False
+            self.truck_bay.save()
+        self.assertEqual(slot_capacity(), 4)
+
+
+class OperatingScheduleTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.day = date.today() + timedelta(days=7)
+    
+    def booking_form(self, booking_time='10:00:00'):
+        return BookingForm({
+            'customer_name': 'Jane Doe',
+            'customer_email': 'jane@example.com',
+            'customer_phone': '09123456789',
+            'vehicle_type': 'sedan',
+            'vehicle_plate': 'XYZ9876',
+            'service': 'basic',
+            'booking_date': self.day.isoformat(),
+            'booking_time': booking_time,
+        })
+    
+    def test_compiled_table_cached_until_schedule_changes(self):
+        """Test lookups are served from the compiled table and rebuilt after an edit"""
+        get_schedule()
+        with self.assertNumQueries(0):
+            self.assertEqual(len(day_schedule(self.day).slots), 10)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            template = OperatingSchedule.objects.get(weekday=self.day.weekday())
+            template.opens_at, template.capacity = time(10, 0), 2
+            template.save()
+        day = day_schedule(self.day)
+        self.assertEqual((day.slots[0], day.capacity), (time(10, 0), 2))
+        self.assertEqual(day_schedule(self.day + timedelta(days=1)).slots[0], time(8, 0))
+    
+    def test_date_override_closes_day(self):
+        """Test a closure override rejects bookings and empties availability for that date only"""
+        with self.captureOnCommitCallbacks(execute=True):
+            OperatingSchedule.objects.create(date=self.day, is_closed=True, note='Holiday')
+        
+        form = self.booking_form()
+        self.assertFalse(form.is_valid())
+        self.assertIn('closed', form.errors['booking_date'][0])
+        
+        response = self.client.get('/api/availability/', {'start': self.day.isoformat(), 'days': 2})
+        availability = response.json()['availability']
+        self.assertEqual(availability[self.day.isoformat()], {})
+        self.assertEqual(len(availability[(self.day + timedelta(days=1)).isoformat()]), 10)
+    
+    def test_per_day_capacity_and_hours(self):
+        """Test an override's capacity limits the ledger and its hours limit the form"""
+        with self.captureOnCommitCallbacks(execute=True):
+            OperatingSchedule.objects.create(date=self.day, opens_at=time(9, 0), closes_at=time(12, 0), capacity=2)
+        
+        self.assertFalse(self.booking_form('08:00:00').is_valid())
+        self.assertTrue(self.booking_form('11:00:00').is_valid())
+        self.assertTrue(capacity.reserve_slot(self.day, time(9, 0)))
+        self.assertTrue(capacity.reserve_slot(self.day, time(9, 0)))
+        self.assertFalse(capacity.reserve_slot(self.day, time(9, 0)))
+    
+    def test_times_must_fit_slot_grid(self):
+        """Test validation of the weekday/date choice and slot-aligned hours"""
+        with self.assertRaises(ValidationError):
+            OperatingSchedule(date=self.day, opens_at=time(8, 30), closes_at=time(17, 0)).full_clean()
+        with self.assertRaises(ValidationError):
+            OperatingSchedule(weekday=1, date=self.day, is_closed=True).clean()
+    
+    def test_capacity_limited_to_active_bays(self):
+        """Test a day's capacity can't exceed the bays there are to allocate bookings to"""
+        setup_bays(SAMPLE_BAYS[:2])
+        with self.assertRaises(ValidationError):
+            OperatingSchedule(date=self.day, opens_at=time(8, 0), closes_at=time(17, 0), capacity=3).full_clean()
+        
+        # Bays taken out of service later lower a capacity that was valid when saved
+        with self.captureOnCommitCallbacks(execute=True):
+            OperatingSchedule.objects.create(date=self.day, opens_at=time(8, 0), closes_at=time(17, 0), capacity=2)
+            Bay.objects.filter(name=SAMPLE_BAYS[0][0]).update(is_active=False)
+            invalidate_bays()
+        self.assertEqual(day_schedule(self.day).capacity, 1)
+
+
+class FleetBookingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        setup_bays(SAMPLE_BAYS)
+        self.user = User.objects.create_user(
+            username='fleetuser',
+            email='fleet@example.com',
+            password='testpass123'
+        )
+        self.day = date.today() + timedelta(days=7)
+    
+    def row(self, **kwargs):
+        fields = {
+            'customer_name': 'Fleet Manager',
+            'customer_email': 'fleet@example.com',
+            'customer_phone': '09123456789',
+            'vehicle_type': 'sedan',
+            'vehicle_plate': 'FLT0001',
+            'service': 'basic',
+            'booking_date': self.day.isoformat(),
+            'booking_time': '10:00:00',
+        }
+        fields.update(kwargs)
+        return fields
+    
+    def post(self, rows, mode='all_or_nothing'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                '/api/bookings/fleet/',
+                data=json.dumps({'bookings': rows, 'mode': mode}),
+                content_type='application/json',
+            )
+    
+    def test_all_or_nothing_books_nothing_on_error(self):
+        """Test one bad row rejects the whole batch"""
+        self.client.login(username='fleetuser', password='testpass123')
+        response = self.post([self.row(), self.row(vehicle_type='boat')])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'][0]['row'], 1)
+        self.assertIn('vehicle_type', response.json()['errors'][0]['errors'])
+        self.assertFalse(Booking.objects.exists())
+    
+    def test_best_effort_books_rows_that_fit(self):
+        """Test best-effort mode books up to capacity and reports the rest"""
+        self.client.login(username='fleetuser', password='testpass123')
+        rows = [self.row(vehicle_plate=f'FLT{n:04d}') for n in range(slot_capacity() + 1)]
+        response = self.post(rows, mode='best_effort')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['created']), slot_capacity())
+        self.assertEqual([error['row'] for error in response.json()['errors']], [slot_capacity()])
+        
+        bookings = Booking.objects.filter(user=self.user)
+        self.assertEqual(bookings.count(), slot_capacity())
+        self.assertEqual(len({booking.bay_id for booking in bookings}), slot_capacity())
+        self.assertEqual(
+            SlotCapacity.objects.get(booking_date=self.day, booking_time=time(10, 0)).booked_count,
+            slot_capacity()
+        )
+    
+    def test_batch_respects_existing_bookings(self):
+        """Test admission counts bookings already in the ledger and bays"""
+        make_booking(self.user, vehicle_type='truck')
+        self.client.login(username='fleetuser', password='testpass123')
+        response = self.post([self.row(vehicle_type='van'), self.row()], mode='best_effort')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['errors'][0]['row'], 0)
+        self.assertIn('No bay', response.json()['errors'][0]['errors']['vehicle_type'][0])
+        self.assertEqual(SlotCapacity.objects.get(booking_date=self.day, booking_time=time(10, 0)).booked_count, 2)
+    
+    def test_query_count_independent_of_batch_size(self):
+        """Test a batch costs the same number of queries however many rows it has"""
+        from .fleet import book_fleet
+        get_catalog()
+        get_schedule()
+        slot_capacity()
+        
+        def queries(size):
+            Booking.objects.all().delete()
+            SlotCapacity.objects.all().delete()
+            DailyBookingStats.objects.all().delete()
+            rows = [self.row(booking_time=f'{9 + n:02d}:00:00') for n in range(size)]
+            with CaptureQueriesContext(connection) as ctx:
+                result = book_fleet(self.user, rows)
+            self.assertEqual(len(result.created), size)
+            return len(ctx.captured_queries)
+        
+        self.assertEqual(queries(2), queries(6))
+    
+    @override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+    def test_admin_csv_upload(self):
+        """Test the admin CSV upload books the rows and lists rejected lines"""
+        User.objects.create_superuser(username='admin', email='admin@example.com', password='testpass123')
+        self.client.login(username='admin', password='testpass123')
+        upload = SimpleUploadedFile('fleet.csv', (
+            'customer_name,customer_email,customer_phone,vehicle_type,vehicle_plate,service,booking_date,booking_time\n'
+            f'Fleet,fleet@example.com,09123456789,sedan,FLT0001,basic,{self.day},10:00:00\n'
+            f'Fleet,fleet@example.com,09123456789,sedan,FLT0002,basic,{self.day},03:00:00\n'
+        ).encode('utf-8'))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/admin/bookings/booking/fleet-upload/', {
+                'user': self.user.id,
+                'csv_file': upload,
+                'mode': 'best_effort',
+            })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['rejected'][0][0], 3)
+        self.assertEqual(Booking.objects.filter(user=self.user, vehicle_plate='FLT0001').count(), 1)
+        self.assertEqual(Booking.objects.count(), 1)
+
+
+class WaitlistTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        setup_bays(SAMPLE_BAYS)
+        self.user = User.objects.create_user(
+            username='waituser',
+            email='wait@example.com',
+            password='testpass123'
+        )
+        self.admin = User.objects.create_user(
+            username='waitstaff',
+            email='staff@example.com',
+            password='testpass123',
+            is_staff=True
+        )
+        self.day = date.today() + timedelta(days=7)
+        self.full = [make_booking(self.user, booking_date=self.day) for _ in range(slot_capacity())]
+    
+    def wait(self, **kwargs):
+        fields = {
+            'user': self.user,
+            'customer_name': 'Waiting Customer',
+            'customer_email': 'wait@example.com',
+            'customer_phone': '09123456789',
+            'vehicle_type': 'sedan',
+            'vehicle_plate': 'WAIT001',
+            'service': 'basic',
+            'booking_date': self.day,
+            'booking_time': time(10, 0),
+            'price': 25,
+        }
+        fields.update(kwargs)
+        return WaitlistEntry.objects.create(**fields)
+    
+    def ledger(self):
+        return SlotCapacity.objects.get(booking_date=self.day, booking_time=time(10, 0)).booked_count
+    
+    def test_full_slot_offers_waitlist(self):
+        """Test a full slot can be joined as a waitlist entry from the booking form"""
+        self.client.login(username='waituser', password='testpass123')
+        data = {
+            'customer_name': 'Jane Doe',
+            'customer_email': 'jane@example.com',
+            'customer_phone': '09123456789',
+            'vehicle_type': 'sedan',
+            'vehicle_plate': 'NEW0001',
+            'service': 'basic',
+            'booking_date': self.day.isoformat(),
+            'booking_time': '10:00:00',
+        }
+        response = self.client.post('/user/booking/create/', data)
+        self.assertTrue(response.context['offer_waitlist'])
+        
+        response = self.client.post('/user/booking/create/', {**data, 'join_waitlist': '1'})
+        self.assertRedirects(response, '/user/dashboard/', fetch_redirect_response=False)
+        entry = WaitlistEntry.objects.get()
+        self.assertEqual((entry.status, entry.vehicle_plate), ('waiting', 'NEW0001'))
+        self.assertEqual(Booking.objects.count(), slot_capacity())
+    
+    def test_cancellation_promotes_oldest_entry(self):
+        """Test cancelling through the staff view books the oldest waiting entry"""
+        first = self.wait(vehicle_plate='FIRST01')
+        second = self.wait(vehicle_plate='SECOND1')
+        self.client.login(username='waitstaff', password='testpass123')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/staff/booking/{self.full[0].id}/status/', {'status': 'cancelled'})
+        
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.status, 'promoted')
+        self.assertEqual(first.booking.status, 'pending')
+        self.assertEqual(first.booking.bay_id, self.full[0].bay_id)
+        self.assertEqual(second.status, 'waiting')
+        self.assertEqual(self.ledger(), slot_capacity())
+    
+    def test_delete_and_bulk_cancel_promote(self):
+        """Test deleting a booking and bulk cancellation both promote from the waitlist"""
+        entries = [self.wait(vehicle_plate=f'WAIT00{n}') for n in range(3)]
+        self.client.login(username='waituser', password='testpass123')
+        self.client.post(f'/user/booking/{self.full[0].id}/delete/')
+        Booking.objects.filter(pk__in=[self.full[1].pk, self.full[2].pk]).update_status('cancelled')
+        
+        statuses = [WaitlistEntry.objects.get(pk=entry.pk).status for entry in entries]
+        self.assertEqual(statuses, ['promoted'] * 3)
+        self.assertEqual(self.ledger(), slot_capacity())
+        self.assertEqual(Booking.objects.filter(status='pending').count(), slot_capacity())
+    
+    def test_longer_entry_covering_freed_slot_promoted(self):
+        """Test an entry starting earlier that runs into the freed slot is offered the place"""
+        long_wash = self.wait(vehicle_plate='LONG001', booking_time=time(9, 0), duration=120)
+        later = self.wait(vehicle_plate='LATER01', booking_time=time(11, 0))
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.filter(pk=self.full[0].pk).update_status('cancelled')
+        
+        long_wash.refresh_from_db()
+        later.refresh_from_db()
+        self.assertEqual(long_wash.status, 'promoted')
+        self.assertEqual((long_wash.booking.booking_time, long_wash.booking.duration), (time(9, 0), 120))
+        self.assertEqual(later.status, 'waiting')
+        self.assertEqual(self.ledger(), slot_capacity())
+        self.assertEqual(SlotCapacity.objects.get(booking_date=self.day, booking_time=time(9, 0)).booked_count, 1)
+    
+    def test_entry_that_does_not_fit_stays_first(self):
+        """Test a head entry needing a bay that isn't free keeps its place"""
+        truck = self.wait(vehicle_type='truck')
+        # Bay 5 (the only truck bay) is taken by one of the sedans
+        self.full[0].status = 'cancelled'
+        self.full[0].save()
+        truck.refresh_from_db()
+        self.assertEqual(truck.status, 'waiting')
+        self.assertEqual(self.ledger(), slot_capacity() - 1)
+    
+    def test_withdrawn_entries_are_skipped(self):
+        """Test leaving the waitlist removes the entry from the queue"""
+        entry = self.wait()
+        self.client.login(username='waituser', password='testpass123')
+        self.client.post(f'/user/waitlist/{entry.id}/leave/')
+        self.full[0].delete()
+        entry.refresh_from_db()
+        self.assertEqual(entry.status, 'withdrawn')
+        self.assertIsNone(entry.booking)
+
+
+class AvailabilityApiTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='availuser',
+            email='avail@example.com',
+            password='testpass123'
+        )
+        self.day = date.today() + timedelta(days=3)
+    
+    def fetch(self, **headers):
+        return self.client.get('/api/availability/', {'start': self.day.isoformat(), 'days': 7}, **headers)
+    
+    def test_reports_remaining_capacity(self):
+        """Test booked slots show reduced capacity and other slots stay full"""
+        make_booking(self.user, booking_date=self.day, booking_time=time(9, 0))
+        make_booking(self.user, booking_date=self.day, booking_time=time(9, 0))
+        
+        data = self.fetch().json()
+        day = data['availability'][self.day.isoformat()]
+        self.assertEqual(len(data['availability']), 7)
+        self.assertEqual(day['09:00:00'], slot_capacity() - 2)
+        self.assertEqual(day['10:00:00'], slot_capacity())
+    
+    def test_single_query_for_range(self):
+        """Test the whole range is computed from one ledger query"""
+        get_schedule()  # the compiled schedule is cached on its own
+        with self.assertNumQueries(1):
+            self.fetch()
+        with self.assertNumQueries(0):
+            self.fetch()
+    
+    def test_etag_revalidation(self):
+        """Test a matching If-None-Match gets a 304"""
+        etag = self.fetch()['ETag']
+        response = self.fetch(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+    
+    def test_booking_change_invalidates_cache(self):
+        """Test a new booking changes the cached availability and its ETag"""
+        etag = self.fetch()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            make_booking(self.user, booking_date=self.day, booking_time=time(8, 0))
+        
+        response = self.fetch(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['availability'][self.day.isoformat()]['08:00:00'], slot_capacity() - 1)
+
+
+class SlotSuggestionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        setup_bays(SAMPLE_BAYS)
+        self.user = User.objects.create_user(
+            username='suggestuser',
+            email='suggest@example.com',
+            password='testpass123'
+        )
+        self.day = date.today() + timedelta(days=7)
+    
+    def fill(self, day, slot):
+        for _ in range(slot_capacity()):
+            make_booking(self.user, booking_date=day, booking_time=slot)
+    
+    def test_nearest_slots_ranked_by_distance(self):
+        """Test suggestions skip full slots and come closest-first (earlier on ties), spilling onto adjacent days"""
+        self.fill(self.day, time(11, 0))
+        suggestions = nearest_slots(self.day, time(10, 0), count=4)
+        self.assertEqual(
+            [(s['date'], s['time']) for s in suggestions],
+            [(self.day.isoformat(), '09:00:00'), (self.day.isoformat(), '08:00:00'),
+             (self.day.isoformat(), '12:00:00'), (self.day.isoformat(), '13:00:00')]
+        )
+        
+        late = nearest_slots(self.day, time(17, 0), count=12)
+        self.assertIn({'date': (self.day + timedelta(days=1)).isoformat(), 'time': '08:00:00'},
+                      [{'date': s['date'], 'time': s['time']} for s in late])
+    
+    def test_long_service_suggestions_respect_covered_slots(self):
+        """Test a two-hour service isn't suggested where it would run into a full slot"""
+        self.fill(self.day, time(11, 0))
+        starts = [s['time'] for s in nearest_slots(self.day, time(10, 0), duration=120, count=3)]
+        self.assertNotIn('10:00:00', starts)
+        self.assertNotIn('11:00:00', starts)
+        self.assertEqual(starts, ['09:00:00', '08:00:00', '12:00:00'])
+    
+    def test_single_query(self):
+        """Test suggestions come from one ledger query over the window"""
+        get_schedule()
+        with self.assertNumQueries(1):
+            nearest_slots(self.day, time(10, 0))
+    
+    def test_suggestions_need_a_bay_for_the_vehicle(self):
+        """Test slots where no bay that takes the vehicle is free aren't suggested"""
+        make_booking(self.user, booking_date=self.day, booking_time=time(9, 0), vehicle_type='truck')
+        self.assertEqual([s['time'] for s in nearest_slots(self.day, time(10, 0), count=2)], ['09:00:00', '11:00:00'])
+        
+        get_schedule()
+        slot_capacity()
+        with self.assertNumQueries(2):
+            trucks = nearest_slots(self.day, time(10, 0), count=2, vehicle_type='truck')
+        self.assertEqual([(s['time'], s['remaining']) for s in trucks], [('11:00:00', 1), ('08:00:00', 1)])
+        
+        response = self.client.get('/api/availability/suggestions/', {
+            'date': self.day.isoformat(), 'time': '10:00', 'count': 2, 'vehicle_type': 'truck',
+        })
+        self.assertEqual([s['time'] for s in response.json()['suggestions']], ['11:00:00', '08:00:00'])
+        response = self.client.get('/api/availability/suggestions/', {
+            'date': self.day.isoformat(), 'time': '10:00', 'vehicle_type': 'boat',
+        })
+        self.assertEqual(response.status_code, 400)
+    
+    def test_full_slot_rejection_lists_suggestions(self):
+        """Test create_booking offers alternatives when the slot is full"""
+        self.fill(self.day, time(10, 0))
+        self.client.login(username='suggestuser', password='testpass123')
+        response = self.client.post('/user/booking/create/', {
+            'customer_name': 'Jane Doe',
+            'customer_email': 'jane@example.com',
+            'customer_phone': '09123456789',
+            'vehicle_type': 'sedan',
+            'vehicle_plate': 'XYZ9876',
+            'service': 'basic',
+            'booking_date': self.day.isoformat(),
+            'booking_time': '10:00:00',
+        })
+        times = [s['time'] for s in response.context['suggestions']]
+        self.assertEqual(times[:2], ['09:00:00', '11:00:00'])
+        self.assertContains(response, 'Nearest open times')
+    
+    def test_api(self):
+        """Test the JSON endpoint returns suggestions and rejects bad input"""
+        response = self.client.get('/api/availability/suggestions/', {
+            'date': self.day.isoformat(), 'time': '10:00', 'count': 2,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([s['time'] for s in response.json()['suggestions']], ['09:00:00', '11:00:00'])
+        
+        response = self.client.get('/api/availability/suggestions/', {'date': 'soon'})
+        self.assertEqual(response.status_code, 400)
+
+
+class IdempotencyTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='idemuser',
+            email='idem@example.com',
+            password='testpass123'
+        )
+        self.day = date.today() + timedelta(days=7)
+        self.client.login(username='idemuser', password='testpass123')
+        self.key = self.client.get('/user/booking/create/').context['idempotency_key']
+        self.data = {
+            'customer_name': 'Jane Doe',
+            'customer_email': 'jane@example.com',
+            'customer_phone': '09123456789',
+            'vehicle_type': 'sedan',
+            'vehicle_plate': 'XYZ9876',
+            'service': 'basic',
+            'booking_date': self.day.isoformat(),
+            'booking_time': '10:00:00',
+            'idempotency_key': self.key,
+        }
+    
+    def ledger(self):
+        return SlotCapacity.objects.get(booking_date=self.day, booking_time=time(10, 0)).booked_count
+    
+    def test_replayed_post_books_once(self):
+        """Test resending the same form returns the original result without a second booking"""
+        first = self.client.post('/user/booking/create/', self.data)
+        with self.assertNumQueries(3):  # session, user, key lookup: no ledger or booking queries
+            second = self.client.post('/user/booking/create/', self.data)
+        self.assertEqual(second.status_code, first.status_code)
+        self.assertEqual(second['Location'], first['Location'])
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertEqual(self.ledger(), 1)
+        self.assertEqual(IdempotencyKey.objects.get().booking, Booking.objects.get())
+    
+    def test_distinct_keys_book_separately(self):
+        """Test two different form renders can each create a booking"""
+        self.client.post('/user/booking/create/', self.data)
+        self.client.post('/user/booking/create/', {**self.data, 'idempotency_key': 'another-form'})
+        self.assertEqual(Booking.objects.count(), 2)
+        self.assertEqual(self.ledger(), 2)
+    
+    def test_failed_submission_releases_key(self):
+        """Test a rejected submission can be corrected and resent with the same key"""
+        for _ in range(slot_capacity()):
+            make_booking(self.user, booking_date=self.day)
+        response = self.client.post('/user/booking/create/', self.data)
+        self.assertEqual(response.context['idempotency_key'], self.key)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        
+        self.client.post('/user/booking/create/', {**self.data, 'booking_time': '11:00:00'})
+        self.assertEqual(Booking.objects.filter(booking_time=time(11, 0)).count(), 1)
+    
+    def test_keys_are_per_user(self):
+        """Test another account's key doesn't replay for this user"""
+        other = User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+        IdempotencyKey.objects.create(user=other, key=self.key)
+        self.client.post('/user/booking/create/', self.data)
+        self.assertEqual(Booking.objects.filter(user=self.user).count(), 1)
+    
+    @override_settings(IDEMPOTENCY_KEY_RETENTION_HOURS=24)
+    def test_purge_expired(self):
+        """Test the purge command removes only keys past the retention window"""
+        old = IdempotencyKey.objects.create(user=self.user, key='old')
+        IdempotencyKey.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(hours=25))
+        IdempotencyKey.objects.create(user=self.user, key='recent')
+        
+        out = StringIO()
+        call_command('purge_idempotency_keys', stdout=out)
+        self.assertIn('Purged 1', out.getvalue())
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['recent'])
+    
+    @override_settings(IDEMPOTENCY_KEY_RETENTION_HOURS=24)
+    def test_expired_key_not_replayed(self):
+        """Test a key past the retention window books again even before it is purged"""
+        self.client.post('/user/booking/create/', self.data)
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(hours=25))
+        
+        self.client.post('/user/booking/create/', {**self.data, 'booking_time': '11:00:00'})
+        self.assertEqual(Booking.objects.count(), 2)
+        self.assertEqual(IdempotencyKey.objects.get().booking.booking_time, time(11, 0))
+
+
+class DailyBookingStatsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='statsuser',
+            email='stats@example.com',
+            password='testpass123'
+        )
+        self.day = date.today() + timedelta(days=2)
+    
+    def snapshot(self):
+        return sorted(
+            DailyBookingStats.objects.filter(booking_count__gt=0)
+            .values_list('booking_date', 'service', 'status', 'booking_count', 'revenue')
+        )
+    
+    def test_incremental_updates_match_rebuild(self):
+        """Test create, edit, bulk update and delete leave the same rows a rebuild would"""
+        first = make_booking(self.user, booking_date=self.day, price=25)
+        second = make_booking(self.user, booking_date=self.day, service='deluxe', price=45)
+        make_booking(self.user, booking_date=self.day, price=25)
+        
+        first.status = 'completed'
+        first.save()
+        second.price = 50
+        second.save()
+        Booking.objects.filter(service='deluxe').update_status('cancelled')
+        Booking.objects.filter(status='pending').first().delete()
+        
+        incremental = self.snapshot()
+        rollups.rebuild_daily_stats()
+        self.assertEqual(incremental, self.snapshot())
+        self.assertIn((self.day, 'basic', 'completed', 1, 25), incremental)
+        self.assertIn((self.day, 'deluxe', 'cancelled', 1, 50), incremental)
+    
+    def test_rebuild_command(self):
+        """Test the management command recreates the rollup from bookings"""
+        make_booking(self.user, booking_date=self.day, status='completed', price=85)
+        DailyBookingStats.objects.all().delete()
+        
+        out = StringIO()
+        call_command('rebuild_daily_stats', stdout=out)
+        self.assertIn('1 rows', out.getvalue())
+        self.assertEqual(self.snapshot(), [(self.day, 'basic', 'completed', 1, 85)])
+
+
+class ProfileStatsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='statsuser',
+            email='stats@example.com',
+            password='testpass123'
+        )
+    
+    def counters(self):
+        profile = UserProfile.objects.get(user=self.user)
+        return (
+            profile.total_bookings, profile.pending_bookings, profile.completed_bookings,
+            profile.cancelled_bookings, profile.lifetime_spend,
+        )
+    
+    def test_counters_follow_saves_and_deletes(self):
+        """Test creating, completing, cancelling and deleting bookings keeps the counters exact"""
+        first = make_booking(self.user, price=40)
+        second = make_booking(self.user, booking_time=time(11, 0))
+        self.assertEqual(self.counters(), (2, 2, 0, 0, 0))
+        
+        first.status = 'completed'
+        first.save()
+        second.status = 'cancelled'
+        second.save()
+        self.assertEqual(self.counters(), (2, 0, 1, 1, 40))
+        
+        second.delete()
+        self.assertEqual(self.counters(), (1, 0, 1, 0, 40))
+    
+    def test_counters_follow_bulk_updates(self):
+        """Test bulk status updates and fleet inserts (no signals) adjust the counters"""
+        for hour in (9, 10, 11):
+            make_booking(self.user, booking_time=time(hour, 0))
+        Booking.objects.filter(user=self.user).update_status('completed')
+        self.assertEqual(self.counters(), (3, 0, 3, 0, 75))
+        
+        from .fleet import book_fleet
+        book_fleet(self.user, [{
+            'customer_name': 'Fleet', 'customer_email': 'fleet@example.com', 'customer_phone': '09123456789',
+            'vehicle_type': 'sedan', 'vehicle_plate': 'FLT0001', 'service': 'basic',
+            'booking_date': (date.today() + timedelta(days=8)).isoformat(), 'booking_time': '10:00:00',
+        }])
+        self.assertEqual(self.counters(), (4, 1, 3, 0, 75))
+    
+    def test_failed_counter_update_rolls_back_booking(self):
+        """Test the booking row and its derived updates commit or fail together"""
+        with mock.patch('bookings.profile_stats.apply_profile_deltas', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                make_booking(self.user)
+        self.assertFalse(Booking.objects.exists())
+        self.assertFalse(SlotCapacity.objects.filter(booked_count__gt=0).exists())
+    
+    def test_rebuild_command_repairs_drift(self):
+        """Test the repair command recomputes counters from the bookings"""
+        make_booking(self.user, status='completed', price=30)
+        make_booking(self.user, booking_time=time(11, 0))
+        UserProfile.objects.filter(user=self.user).update(total_bookings=99, lifetime_spend=0)
+        
+        out = StringIO()
+        call_command('rebuild_profile_stats', stdout=out)
+        self.assertIn('Rebuilt booking counters', out.getvalue())
+        self.assertEqual(self.counters(), (2, 1, 1, 0, 30))
+    
+    def test_user_dashboard_reads_profile(self):
+        """Test the dashboard statistics come from the profile row"""
+        make_booking(self.user)
+        self.client.login(username='statsuser', password='testpass123')
+        with mock.patch('bookings.views.get_weather_data', return_value=None):
+            response = self.client.get('/user/dashboard/')
+        self.assertEqual(response.context['total_bookings'], 1)
+        self.assertEqual(response.context['pending_bookings'], 1)
+    
+    def test_profile_edits_keep_concurrent_counter_updates(self):
+        """Test saving a stale User or profile (login, Django admin) doesn't overwrite the counters"""
+        stale_user = User.objects.select_related('profile').get(pk=self.user.pk)
+        stale_user.profile.phone
+        make_booking(self.user, price=40)
+        
+        stale_user.save()
+        self.assertEqual(self.counters(), (1, 1, 0, 0, 0))
+        
+        from django.contrib.admin import site
+        for model, save in (
+            (UserProfile, lambda profile: site._registry[UserProfile].save_model(None, profile, None, True)),
+            (User, lambda profile: site._registry[User].save_formset(
+                None, None, mock.Mock(model=UserProfile, save=mock.Mock(return_value=[profile])), True,
+            )),
+        ):
+            stale = UserProfile.objects.get(user=self.user)
+            make_booking(self.user, booking_time=time(11 if model is UserProfile else 12, 0))
+            stale.phone = '09123456789'
+            save(stale)
+        self.assertEqual(UserProfile.objects.get(user=self.user).phone, '09123456789')
+        self.assertEqual(self.counters(), (3, 3, 0, 0, 0))
+
+
+class KeysetPaginationTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='pageuser',
+            email='page@example.com',
+            password='testpass123'
+        )
+        start = date.today() + timedelta(days=1)
+        for offset in range(5):
+            for hour in (8, 9):
+                make_booking(self.user, booking_date=start + timedelta(days=offset), booking_time=time(hour, 0))
+        self.fields = ('booking_date', 'booking_time', 'id')
+        self.expected = list(Booking.objects.order_by(*self.fields).values_list('id', flat=True))
+    
+    def ids(self, page):
+        return [booking.id for booking in page]
+    
+    def test_walk_forward_and_back(self):
+        """Test next/previous cursors cover every row once in order"""
+        queryset = Booking.objects.all()
+        page = keyset_paginate(queryset, self.fields, 4)
+        seen = self.ids(page)
+        self.assertFalse(page.has_previous)
+        while page.has_next:
+            page = keyset_paginate(queryset, self.fields, 4, after=page.next_cursor)
+            seen += self.ids(page)
+        self.assertEqual(seen, self.expected)
+        
+        previous = keyset_paginate(queryset, self.fields, 4, before=page.previous_cursor)
+        self.assertEqual(self.ids(previous), self.expected[4:8])
+    
+    def test_last_page_and_descending(self):
+        """Test the last-page shortcut and descending order"""
+        last = keyset_paginate(Booking.objects.all(), self.fields, 4, before=LAST_PAGE)
+        self.assertEqual(self.ids(last), self.expected[-4:])
+        self.assertFalse(last.has_next)
+        
+        newest = keyset_paginate(Booking.objects.all(), self.fields, 3, descending=True, with_total=True)
+        self.assertEqual(self.ids(newest), self.expected[::-1][:3])
+        self.assertEqual(newest.total, 10)
+    
+    def test_user_bookings_page_links(self):
+        """Test the user bookings list renders cursor links that keep filters"""
+        self.client.login(username='pageuser', password='testpass123')
+        response = self.client.get('/user/bookings/', {'status': 'pending'})
+        page = response.context['bookings']
+        self.assertEqual(len(page), 7)
+        self.assertContains(response, f'?status=pending&after={page.next_cursor}')
+        
+        response = self.client.get('/user/bookings/', {'status': 'pending', 'after': page.next_cursor})
+        self.assertEqual(len(response.context['bookings']), 3)
+    
+    def test_cursor_filter_bounds_leading_column(self):
+        """Test the cursor filter carries a plain range on booking_date so the index can seek"""
+        first = keyset_paginate(Booking.objects.all(), self.fields, 4)
+        with CaptureQueriesContext(connection) as queries:
+            keyset_paginate(Booking.objects.all(), self.fields, 4, after=first.next_cursor)
+        where = queries.captured_queries[0]['sql'].split(' WHERE ', 1)[1]
+        self.assertTrue(where.startswith('("bookings_booking"."booking_date" >= '))
+        self.assertIn(' AND ("bookings_booking"."booking_date" > ', where)
+    
+    def test_total_only_counted_where_cheap(self):
+        """Test the lists skip the total off PostgreSQL and totals are computed lazily"""
+        self.client.login(username='pageuser', password='testpass123')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/user/bookings/')
+        self.assertFalse([q for q in queries.captured_queries if 'COUNT(' in q['sql']])
+        self.assertIsNone(response.context['bookings'].total)
+        
+        with mock.patch('bookings.pagination.approximate_count', return_value=10) as count:
+            page = keyset_paginate(Booking.objects.all(), self.fields, 4, with_total=True)
+            count.assert_not_called()
+            self.assertEqual((page.total, page.total), (10, 10))
+        count.assert_called_once()
+    
+    def test_bad_cursor_falls_back_to_first_page(self):
+        """Test a tampered cursor returns the first page instead of erroring"""
+        page = keyset_paginate(Booking.objects.all(), self.fields, 4, after='not-a-cursor')
+        self.assertEqual(self.ids(page), self.expected[:4])
+
+
+class SearchTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='searchuser',
+            email='maria.santos@example.com',
+            password='testpass123',
+            first_name='Maria'
+        )
+        self.plate = make_booking(self.user, customer_name='Maria Santos', vehicle_plate='NBC 1234')
+        self.other = make_booking(self.user, customer_name='Pedro Cruz', customer_email='pedro@example.com', vehicle_plate='XYZ 9876')
+    
+    def found(self, query):
+        return set(search_bookings(Booking.objects.all(), query).values_list('id', flat=True))
+    
+    def test_substring_and_case_insensitive(self):
+        """Test plate, name and email substrings match regardless of case"""
+        self.assertIn('MATCH', str(search_bookings(Booking.objects.all(), 'Santos').query))
+        self.assertEqual(self.found('c 12'), {self.plate.id})
+        self.assertEqual(self.found('SANTOS'), {self.plate.id})
+        self.assertEqual(self.found('pedro@'), {self.other.id})
+        self.assertEqual(self.found('nomatch'), set())
+    
+    def test_index_follows_updates_and_deletes(self):
+        """Test the search index stays in step with booking edits"""
+        self.other.vehicle_plate = 'QQQ 5555'
+        self.other.save()
+        self.assertEqual(self.found('QQQ'), {self.other.id})
+        self.assertEqual(self.found('XYZ'), set())
+        
+        self.plate.delete()
+        self.assertEqual(self.found('Santos'), set())
+    
+    def test_short_query_falls_back(self):
+        """Test queries too short for trigrams still match"""
+        self.assertEqual(self.found('Cr'), {self.other.id})
+    
+    def test_user_search(self):
+        """Test users are found by username, email or name"""
+        other_user = User.objects.create_user(username='juan', email='juan@example.com', password='testpass123')
+        found = set(search_users(User.objects.all(), 'santos').values_list('id', flat=True))
+        self.assertEqual(found, {self.user.id})
+        self.assertNotIn(other_user.id, found)
+
+
+class ServiceCatalogTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.wash = Service.objects.create(
+            name='Basic Wash',
+            description='Exterior wash and dry',
+            category='package',
+            price=25,
+            duration=90,
+            features='Exterior wash, Hand dry ,Tire shine',
+            display_order=1
+        )
+    
+    def test_snapshot_is_preparsed_and_reused(self):
+        """Test the catalog pre-parses fields and is served without queries once built"""
+        catalog = get_catalog()
+        entry = catalog.get(self.wash.id)
+        self.assertEqual(entry.get_features_list(), ('Exterior wash', 'Hand dry', 'Tire shine'))
+        self.assertEqual(entry.get_duration_display(), '1 hr 30 min')
+        with self.assertNumQueries(0):
+            self.assertIs(get_catalog(), catalog)
+    
+    def test_save_and_delete_bump_version(self):
+        """Test service edits and deletes are visible on the next read"""
+        get_catalog()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.wash.price = 30
+            self.wash.save()
+        self.assertEqual(get_catalog().get(self.wash.id).price, 30)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.wash.delete()
+        self.assertIsNone(get_catalog().get(self.wash.id))
+    
+    def test_inactive_services_hidden_from_customers(self):
+        """Test active() and active-only lookups skip inactive services"""
+        with self.captureOnCommitCallbacks(execute=True):
+            Service.objects.create(name='Old Wash', description='Retired', category='package', price=10, duration=15, is_active=False)
+        catalog = get_catalog()
+        self.assertEqual([service.name for service in catalog.active('package')], ['Basic Wash'])
+        self.assertEqual(len(catalog.for_admin()), 2)
+        self.assertIsNone(catalog.get('not-a-number'))
+    
+    def test_other_process_sees_change_after_version_ttl(self):
+        """Test a process with its own memory cache serves a stale catalog for at most CACHE_VERSION_TTL"""
+        from django.core.cache.backends.locmem import LocMemCache
+        worker_cache = LocMemCache('catalog-worker', {})
+        with mock.patch('bookings.versioning.cache', worker_cache), mock.patch('bookings.catalog.cache', worker_cache):
+            self.assertEqual(get_catalog().get(self.wash.id).price, 25)
+        
+        # Saved in another process: only that process's token is bumped
+        with self.captureOnCommitCallbacks(execute=True):
+            self.wash.price = 30
+            self.wash.save()
+        
+        now = clock.time()
+        with mock.patch('bookings.versioning.cache', worker_cache), mock.patch('bookings.catalog.cache', worker_cache):
+            self.assertEqual(get_catalog().get(self.wash.id).price, 25)
+            with mock.patch('time.time', return_value=now + settings.CACHE_VERSION_TTL + 1):
+                self.assertEqual(get_catalog().get(self.wash.id).price, 30)
+
+
+class SupabaseClientTest(TestCase):
+    def setUp(self):
+        supabase_client.reset_supabase_clients()
+        self.addCleanup(supabase_client.reset_supabase_clients)
+        patcher = mock.patch('bookings.supabase_client._create_client', side_effect=lambda key: object())
+        self.mock_create = patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def test_clients_built_once_per_process(self):
+        """Test clients are created lazily and reused within a process"""
+        self.assertEqual(self.mock_create.call_count, 0)
+        client = supabase_client.get_supabase_client()
+        self.assertIs(supabase_client.get_supabase_client(), client)
+        self.assertIsNot(supabase_client.get_supabase_admin(), client)
+        self.assertEqual(self.mock_create.call_count, 2)
+    
+    def test_forked_process_gets_fresh_client(self):
+        """Test a pid change discards clients inherited from the parent"""
+        client = supabase_client.get_supabase_client()
+        with mock.patch('bookings.supabase_client.os.getpid', return_value=-1):
+            self.assertIsNot(supabase_client.get_supabase_client(), client)
+    
+    @override_settings(SUPABASE_SERVICE_ROLE_KEY='')
+    def test_missing_credentials_return_none(self):
+        """Test an unconfigured client is None rather than an error"""
+        self.assertIsNone(supabase_client.get_supabase_admin())
+        self.mock_create.assert_not_called()
+
+
+@override_settings(SUPABASE_URL='https://example.supabase.co', SUPABASE_JWT_SECRET='test-secret', SUPABASE_TOKEN_REFRESH_MARGIN=300)
+class SupabaseSessionMiddlewareTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.middleware = SupabaseSessionMiddleware(lambda request: HttpResponse())
+        patcher = mock.patch('bookings.supabase_auth.requests.post')
+        self.mock_post = patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def make_token(self, expires_in=3600, key='test-secret', algorithm='HS256'):
+        return jwt.encode({
+            'sub': 'user-1',
+            'aud': 'authenticated',
+            'iss': 'https://example.supabase.co/auth/v1',
+            'exp': int(clock.time()) + expires_in,
+        }, key, algorithm=algorithm)
+    
+    def request_with(self, access_token, refresh_token='refresh-1'):
+        request = RequestFactory().get('/')
+        request.session = SessionStore()
+        request.session['supabase_access_token'] = access_token
+        request.session['supabase_refresh_token'] = refresh_token
+        return request
+    
+    def test_valid_token_verified_locally(self):
+        """Test a fresh token's claims are attached with no outbound calls"""
+        request = self.request_with(self.make_token())
+        self.middleware(request)
+        self.assertEqual(request.supabase_claims['sub'], 'user-1')
+        self.mock_post.assert_not_called()
+    
+    def test_near_expiry_token_refreshed_in_background(self):
+        """Test a near-expiry token is refreshed once and swapped in on the next request"""
+        new_access = self.make_token()
+        self.mock_post.return_value.json.return_value = {'access_token': new_access, 'refresh_token': 'refresh-2'}
+        
+        request = self.request_with(self.make_token(expires_in=60))
+        with mock.patch('bookings.supabase_auth.threading.Thread') as thread:
+            self.middleware(request)
+            self.middleware(self.request_with(self.make_token(expires_in=60)))
+        self.assertIsNotNone(request.supabase_claims)
+        self.assertEqual(thread.call_count, 1)
+        thread.call_args.kwargs['target']()
+        
+        request = self.request_with(self.make_token(expires_in=60))
+        self.middleware(request)
+        self.assertEqual(request.session['supabase_access_token'], new_access)
+        self.assertEqual(request.session['supabase_refresh_token'], 'refresh-2')
+        self.assertEqual(self.mock_post.call_count, 1)
+    
+    def test_tampered_token_discarded(self):
+        """Test a token with a bad signature is rejected and removed from the session"""
+        request = self.request_with(self.make_token(key='wrong-secret'))
+        self.middleware(request)
+        self.assertIsNone(request.supabase_claims)
+        self.assertNotIn('supabase_access_token', request.session)
+    
+    def test_asymmetric_token_checked_against_signing_keys(self):
+        """Test RS256 tokens are verified with the key served by the JWKS client"""
+        from cryptography.hazmat.primitives.asymmetric import rsa
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        signing_key = mock.Mock(key=private_key.public_key())
+        jwks = mock.Mock(**{'get_signing_key_from_jwt.return_value': signing_key})
+        
+        request = self.request_with(self.make_token(key=private_key, algorithm='RS256'))
+        with mock.patch('bookings.supabase_auth._get_jwks_client', return_value=jwks):
+            self.middleware(request)
+        self.assertEqual(request.supabase_claims['sub'], 'user-1')
+    
+    def test_missing_secret_warns_once_and_verifies_with_signing_keys(self):
+        """Test an unset SUPABASE_JWT_SECRET is reported at startup and asymmetric tokens are still verified"""
+        from cryptography.hazmat.primitives.asymmetric import rsa
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        jwks = mock.Mock(**{'get_signing_key_from_jwt.return_value': mock.Mock(key=private_key.public_key())})
+        
+        with override_settings(SUPABASE_JWT_SECRET=''), mock.patch('builtins.print') as mock_print, \
+                mock.patch('bookings.supabase_auth._get_jwks_client', return_value=jwks):
+            middleware = SupabaseSessionMiddleware(lambda request: HttpResponse())
+            for _ in range(3):
+                request = self.request_with(self.make_token())
+                middleware(request)
+                self.assertIsNone(request.supabase_claims)
+                self.assertIn('supabase_access_token', request.session)
+            request = self.request_with(self.make_token(key=private_key, algorithm='RS256'))
+            middleware(request)
+        self.assertEqual(request.supabase_claims['sub'], 'user-1')
+        mock_print.assert_called_once()
+        self.mock_post.assert_not_called()
+    
+    def test_unconfigured_project_skips_verification(self):
+        """Test verification is off, with one startup warning, when neither the secret nor the URL is set"""
+        with override_settings(SUPABASE_JWT_SECRET='', SUPABASE_URL=''), mock.patch('builtins.print') as mock_print, \
+                mock.patch('bookings.middleware.verify_access_token') as verify:
+            middleware = SupabaseSessionMiddleware(lambda request: HttpResponse())
+            for _ in range(3):
+                request = self.request_with(self.make_token())
+                middleware(request)
+                self.assertIsNone(request.supabase_claims)
+        mock_print.assert_called_once()
+        verify.assert_not_called()
+
+
+class AdminDashboardTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(
+            username='staffuser',
+            email='staff@example.com',
+            password='testpass123',
+            is_staff=True
+        )
+        make_booking(self.admin, status='pending', price=25)
+        make_booking(self.admin, status='completed', price=45)
+        make_booking(self.admin, status='completed', price=85)
+        make_booking(self.admin, status='cancelled', price=25)
+        self.client.login(username='staffuser', password='testpass123')
+    
+    def test_statistics(self):
+        """Test the dashboard statistics come out of the single aggregate"""
+        response = self.client.get('/staff/dashboard/')
+        self.assertEqual(response.context['total_bookings'], 4)
+        self.assertEqual(response.context['pending_bookings'], 1)
+        self.assertEqual(response.context['completed_bookings'], 2)
+        self.assertEqual(response.context['cancelled_bookings'], 1)
+        self.assertEqual(response.context['revenue'], 130)
+        self.assertEqual(response.context['total_users'], 1)
+    
+    def test_query_count(self):
+        """Test the dashboard query count doesn't regress"""
+        # Session, user, stats, user total; the tabs are fetched separately
+        with self.assertNumQueries(4):
+            self.client.get('/staff/dashboard/')
+    
+    def test_tabs_render_fragments(self):
+        """Test each tab endpoint returns its list as a fragment"""
+        response = self.client.get('/staff/dashboard/bookings/', {'status': 'completed'})
+        self.assertContains(response, 'badge-completed', count=2)
+        self.assertNotContains(response, '<html')
+        
+        response = self.client.get('/staff/dashboard/users/')
+        self.assertContains(response, 'staffuser')
+        
+        response = self.client.get('/staff/dashboard/services/')
+        self.assertEqual(response.status_code, 200)
+    
+    def test_tabs_require_staff(self):
+        """Test customers can't fetch the tab fragments"""
+        User.objects.create_user(username='customer', password='testpass123')
+        self.client.login(username='customer', password='testpass123')
+        response = self.client.get('/staff/dashboard/bookings/')
+        self.assertEqual(response.status_code, 302)
+    
+    def test_bookings_tab_cached_until_booking_changes(self):
+        """Test a repeat fetch is served from cache and a status change invalidates it"""
+        self.client.get('/staff/dashboard/bookings/')
+        # Session and user only
+        with self.assertNumQueries(2):
+            response = self.client.get('/staff/dashboard/bookings/')
+        self.assertContains(response, 'Pending')
+        
+        booking = Booking.objects.get(status='pending')
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.status = 'confirmed'
+            booking.save()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/staff/dashboard/bookings/')
+        self.assertGreater(len(queries), 2)
+    
+    def test_status_update_json(self):
+        """Test an AJAX status change returns the row and statistic deltas instead of redirecting"""
+        booking = Booking.objects.get(status='pending')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                f'/staff/booking/{booking.id}/status/', {'status': 'completed'},
+                HTTP_ACCEPT='application/json',
+            )
+        data = response.json()
+        self.assertEqual(data['bookings'], [{'id': booking.id, 'status': 'completed', 'status_display': 'Completed'}])
+        self.assertEqual(data['deltas'], {'pending_bookings': -1, 'completed_bookings': 1, 'revenue': '25.00'})
+        
+        response = self.client.post(
+            f'/staff/booking/{booking.id}/status/', {'status': 'bogus'}, HTTP_ACCEPT='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+    
+    def test_status_update_form_still_redirects(self):
+        """Test a plain form post keeps redirecting to the dashboard"""
+        booking = Booking.objects.get(status='pending')
+        response = self.client.post(f'/staff/booking/{booking.id}/status/', {'status': 'confirmed'})
+        self.assertRedirects(response, '/staff/dashboard/', fetch_redirect_response=False)
+    
+    def test_bulk_status_update(self):
+        """Test several bookings change status with one UPDATE and summed deltas"""
+        ids = list(Booking.objects.exclude(status='cancelled').values_list('id', flat=True))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                '/staff/bookings/status/', {'status': 'cancelled', 'booking_ids': ids},
+                HTTP_ACCEPT='application/json',
+            )
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "bookings_booking"')]
+        self.assertEqual(len(updates), 1)
+        
+        data = response.json()
+        self.assertEqual({row['status'] for row in data['bookings']}, {'cancelled'})
+        self.assertEqual(data['deltas'], {
+            'pending_bookings': -1, 'completed_bookings': -2, 'cancelled_bookings': 3, 'revenue': '-130.00',
+        })
+        self.assertEqual(Booking.objects.filter(status='cancelled').count(), 4)
+        self.assertEqual(self.client.get('/staff/dashboard/').context['revenue'], 0)
+    
+    def test_bulk_status_update_rejects_bad_input(self):
+        """Test the bulk endpoint validates the status and ids"""
+        response = self.client.post('/staff/bookings/status/', {'status': 'bogus', 'booking_ids': [1]})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/staff/bookings/status/', {'status': 'confirmed'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/staff/bookings/status/', {'status': 'confirmed', 'booking_ids': ['x']})
+        self.assertEqual(response.status_code, 400)
+    
+    def test_users_tab_invalidated_by_new_account(self):
+        """Test the users tab picks up accounts created after it was cached"""
+        self.client.get('/staff/dashboard/users/')
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.create_user(username='newcomer', password='testpass123')
+        response = self.client.get('/staff/dashboard/users/')
+        self.assertContains(response, 'newcomer')
+
+
+class LiveFeedTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username='staffuser', password='testpass123', is_staff=True)
+        self.booking = make_booking(self.admin, status='pending', price=25)
+    
+    def test_events_for_changes(self):
+        """Test creations, status changes and deletions map to feed events with stat deltas"""
+        state = self.booking.get_tracked_state()
+        confirmed = {**state, 'status': 'confirmed'}
+        moved = {**state, 'booking_time': time(14, 0)}
+        events = live.booking_events([1, 2, 3, 4], [(None, state), (state, confirmed), (confirmed, None), (state, moved)])
+        
+        self.assertEqual([event['event'] for event in events], ['booking-created', 'status-changed', 'booking-deleted'])
+        self.assertEqual(events[0]['deltas'], {'total_bookings': 1, 'pending_bookings': 1})
+        self.assertEqual(events[1]['deltas'], {'pending_bookings': -1, 'confirmed_bookings': 1})
+        self.assertEqual(events[1]['status_display'], 'Confirmed')
+        self.assertEqual(events[2]['id'], 3)
+    
+    def test_published_after_commit(self):
+        """Test saves and bulk updates publish once the transaction commits"""
+        with mock.patch.object(live.broker, 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                self.booking.status = 'confirmed'
+                self.booking.save()
+            publish.assert_not_called()
+            for callback in callbacks:
+                callback()
+            self.assertEqual(publish.call_args.args[0]['event'], 'status-changed')
+            self.assertEqual(publish.call_args.args[0]['id'], self.booking.id)
+            
+            publish.reset_mock()
+            other = make_booking(self.admin, status='pending')
+            with self.captureOnCommitCallbacks(execute=True):
+                Booking.objects.all().update_status('cancelled')
+            self.assertEqual(
+                sorted(call.args[0]['id'] for call in publish.call_args_list if call.args[0]['event'] == 'status-changed'),
+                sorted([self.booking.id, other.id]),
+            )
+    
+    def test_feed_requires_staff_and_asgi(self):
+        """Test customers are refused and WSGI requests are told to use the ASGI server"""
+        User.objects.create_user(username='customer', password='testpass123')
+        self.client.login(username='customer', password='testpass123')
+        self.assertEqual(self.client.get('/staff/bookings/events/').status_code, 403)
+        
+        self.client.login(username='staffuser', password='testpass123')
+        self.assertEqual(self.client.get('/staff/bookings/events/').status_code, 503)
+    
+    async def test_broker_fans_out(self):
+        """Test every subscriber receives each published event"""
+        broker = live.LocalBroker()
+        first, second = broker.subscribe(), broker.subscribe()
+        broker.publish({'event': 'booking-created', 'id': 1})
+        self.assertEqual((await asyncio.wait_for(first.get(), 1))['id'], 1)
+        self.assertEqual((await asyncio.wait_for(second.get(), 1))['id'], 1)
+        
+        broker.unsubscribe(second)
+        broker.publish({'event': 'booking-deleted', 'id': 1})
+        await asyncio.wait_for(first.get(), 1)
+        self.assertTrue(second.empty())
+    
+    async def test_stream(self):
+        """Test the ASGI stream sends published events as server-sent events"""
+        broker = live.LocalBroker()
+        await self.async_client.aforce_login(self.admin)
+        with mock.patch.object(live, 'broker', broker):
+            response = await self.async_client.get('/staff/bookings/events/')
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            chunks = aiter(response.streaming_content)
+            self.assertEqual(await anext(chunks), b'retry: 5000\n\n')
+            
+            broker.publish({'event': 'status-changed', 'id': 7, 'status': 'confirmed'})
+            chunk = await asyncio.wait_for(anext(chunks), 1)
+            self.assertTrue(chunk.startswith(b'event: status-changed\ndata: {'))
+            self.assertIn(b'"id": 7', chunk)
+
+
+class LocalSMTPHandler(socketserver.StreamRequestHandler):
+    """Speaks just enough SMTP for Django's SMTP backend"""
+    
+    def reply(self, text):
+        self.wfile.write(f'{text}\r\n'.encode())
+    
+    def handle(self):
+        self.server.connections += 1
+        self.reply('220 localhost ready')
+        recipients = []
+        for line in self.rfile:
+            command = line.decode().strip()
+            verb = command[:4].upper()
+            if verb in ('HELO', 'EHLO'):
+                self.reply('250 localhost')
+            elif verb in ('MAIL', 'RSET'):
+                recipients = []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                address = command.split(':', 1)[1].strip().strip('<>')
+                if address in self.server.rejected:
+                    self.reply('550 No such user')
+                else:
+                    recipients.append(address)
+                    self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                body = []
+                for data_line in self.rfile:
+                    if data_line.rstrip(b'\r\n') == b'.':
+                        break
+                    body.append(data_line)
+                self.server.messages.append((recipients, b''.join(body).decode()))
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    """SMTP stand-in on a free local port, recording connections and messages"""
+    daemon_threads = True
+    
+    def __init__(self, rejected=()):
+        super().__init__(('127.0.0.1', 0), LocalSMTPHandler)
+        self.connections = 0
+        self.messages = []
+        self.rejected = set(rejected)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+    
+    def settings(self):
+        return override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1', EMAIL_PORT=self.server_address[1], EMAIL_USE_TLS=False,
+            EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='', EMAIL_TIMEOUT=5,
+        )
+    
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+@override_settings(EMAIL_OUTBOX_BATCH_SIZE=50, EMAIL_OUTBOX_MAX_ATTEMPTS=2, EMAIL_OUTBOX_RETRY_SECONDS=60)
+class EmailOutboxTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username='staffuser', password='testpass123', is_staff=True)
+        self.bookings = [
+            make_booking(self.admin, customer_email=f'customer{n}@example.com', booking_time=time(9 + n, 0))
+            for n in range(3)
+        ]
+        self.server = LocalSMTPServer(rejected={'customer2@example.com'})
+        self.addCleanup(self.server.stop)
+    
+    def test_confirmation_queued_with_status_change(self):
+        """Test confirming a booking writes its email in the same transaction"""
+        self.client.login(username='staffuser', password='testpass123')
+        booking = self.bookings[0]
+        self.client.post(f'/staff/booking/{booking.id}/status/', {'status': 'confirmed'})
+        email = EmailOutbox.objects.get()
+        self.assertEqual((email.booking, email.to_email, email.status), (booking, 'customer0@example.com', 'pending'))
+        self.assertIn('Basic Wash', email.body)
+        
+        # Saving an already confirmed booking queues nothing more
+        booking.refresh_from_db()
+        booking.notes = 'Side entrance'
+        booking.save()
+        self.assertEqual(EmailOutbox.objects.count(), 1)
+        
+        # A rolled back confirmation leaves no email behind
+        with transaction.atomic():
+            self.bookings[1].status = 'confirmed'
+            self.bookings[1].save()
+            transaction.set_rollback(True)
+        self.assertEqual(EmailOutbox.objects.count(), 1)
+    
+    def test_bulk_confirmation_queues_each(self):
+        """Test bulk confirmation queues one email per booking"""
+        Booking.objects.all().update_status('confirmed')
+        self.assertEqual(
+            sorted(EmailOutbox.objects.values_list('to_email', flat=True)),
+            ['customer0@example.com', 'customer1@example.com', 'customer2@example.com'],
+        )
+    
+    def test_batch_sent_over_one_connection(self):
+        """Test a batch is delivered over a single SMTP connection and failures back off"""
+        Booking.objects.all().update_status('confirmed')
+        with self.server.settings():
+            self.assertEqual(emails.send_batch(), (2, 1))
+        
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(sorted(recipients[0] for recipients, _ in self.server.messages), [
+            'customer0@example.com', 'customer1@example.com',
+        ])
+        self.assertEqual(EmailOutbox.objects.filter(status='sent').count(), 2)
+        
+        failed = EmailOutbox.objects.get(to_email='customer2@example.com')
+        self.assertEqual((failed.status, failed.attempts), ('pending', 1))
+        self.assertIn('550', failed.last_error)
+        self.assertAlmostEqual(
+            (failed.next_attempt_at - timezone.now()).total_seconds(), 60, delta=5,
+        )
+        
+        # Not due yet, then given up once due again and still refused
+        with self.server.settings():
+            self.assertEqual(emails.send_batch(), (0, 0))
+            EmailOutbox.objects.filter(pk=failed.pk).update(next_attempt_at=timezone.now())
+            emails.send_batch()
+        failed.refresh_from_db()
+        self.assertEqual((failed.status, failed.attempts), ('failed', 2))
+    
+    def test_unreachable_server_retries_batch(self):
+        """Test a connection failure keeps the whole batch pending with backoff"""
+        Booking.objects.filter(pk=self.bookings[0].pk).update_status('confirmed')
+        settings_override = self.server.settings()
+        self.server.stop()
+        with settings_override:
+            self.assertEqual(emails.send_batch(), (0, 1))
+        email = EmailOutbox.objects.get()
+        self.assertEqual((email.status, email.attempts), ('pending', 1))
+    
+    def test_crash_mid_batch_keeps_sent_emails_sent(self):
+        """Test each send is recorded on its own, so a dying sender doesn't resend the batch"""
+        Booking.objects.filter(pk__in=[self.bookings[0].pk, self.bookings[1].pk]).update_status('confirmed')
+        real_send = emails.EmailMessage.send
+        
+        def send_then_die(message, *args, **kwargs):
+            if self.server.messages:
+                raise KeyboardInterrupt
+            return real_send(message, *args, **kwargs)
+        
+        with self.server.settings(), mock.patch.object(emails.EmailMessage, 'send', send_then_die):
+            with self.assertRaises(KeyboardInterrupt):
+                emails.send_batch()
+        self.assertEqual(sorted(EmailOutbox.objects.values_list('status', flat=True)), ['sending', 'sent'])
+        
+        # The abandoned claim is picked up again once its lease runs out
+        with self.server.settings():
+            self.assertEqual(emails.send_due_emails(), (0, 0))
+            EmailOutbox.objects.filter(status='sending').update(locked_at=timezone.now() - timedelta(minutes=10))
+            self.assertEqual(emails.send_due_emails(), (1, 0))
+        self.assertEqual(sorted(recipients[0] for recipients, _ in self.server.messages), [
+            'customer0@example.com', 'customer1@example.com',
+        ])
+    
+    def test_backoff_doubles_and_caps(self):
+        """Test retry delays double per attempt up to the cap"""
+        self.assertEqual(emails.retry_delay(1), timedelta(seconds=60))
+        self.assertEqual(emails.retry_delay(3), timedelta(seconds=240))
+        self.assertEqual(emails.retry_delay(20), emails.MAX_RETRY_DELAY)
+    
+    def test_command_drains_outbox(self):
+        """Test the sender command sends everything due"""
+        Booking.objects.filter(pk__in=[self.bookings[0].pk, self.bookings[1].pk]).update_status('confirmed')
+        out = StringIO()
+        with self.server.settings():
+            call_command('send_outbox_emails', '--batch-size', '1', stdout=out)
+        self.assertIn('Sent 2 emails', out.getvalue())
+        self.assertEqual(self.server.connections, 2)
+
+
+TASK_CALLS = []
+
+
+@tasks.task
+def record_call(value, fail=False):
+    """Task used by TaskQueueTest"""
+    TASK_CALLS.append(value)
+    if fail:
+        raise RuntimeError('boom')
+
+
+@override_settings(TASK_RETRY_SECONDS=30, TASK_LOCK_TIMEOUT=300, TASK_RETENTION_DAYS=7)
+class TaskQueueTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        TASK_CALLS.clear()
+    
+    def test_enqueue_and_run(self):
+        """Test a queued task runs once and its timing is logged"""
+        queued = tasks.enqueue(record_call, {'value': 1})
+        self.assertEqual(queued.name, 'bookings.tests.record_call')
+        self.assertEqual(tasks.run_due_tasks(), (1, 0))
+        self.assertEqual(tasks.run_due_tasks(), (0, 0))
+        self.assertEqual(TASK_CALLS, [1])
+        
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), ('done', 1))
+        run = queued.runs.get()
+        self.assertTrue(run.succeeded)
+        self.assertGreaterEqual(run.duration_ms, 0)
+    
+    def test_unique_and_delayed(self):
+        """Test unique tasks aren't queued twice and delayed tasks wait"""
+        first = tasks.enqueue(record_call, {'value': 1}, unique=True)
+        self.assertEqual(tasks.enqueue(record_call, {'value': 1}, unique=True), first)
+        tasks.enqueue(record_call, {'value': 2}, delay=timedelta(minutes=5))
+        self.assertEqual(Task.objects.count(), 2)
+        tasks.run_due_tasks()
+        self.assertEqual(TASK_CALLS, [1])
+    
+    def test_retry_then_dead_letter(self):
+        """Test failures back off and the task is buried after max_attempts"""
+        queued = tasks.enqueue(record_call, {'value': 1, 'fail': True}, max_attempts=2)
+        self.assertEqual(tasks.run_due_tasks(), (0, 1))
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), ('queued', 1))
+        self.assertIn('RuntimeError: boom', queued.last_error)
+        self.assertAlmostEqual((queued.run_after - timezone.now()).total_seconds(), 30, delta=5)
+        
+        Task.objects.filter(pk=queued.pk).update(run_after=timezone.now())
+        tasks.run_due_tasks()
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), ('dead', 2))
+        self.assertEqual(queued.runs.filter(succeeded=False).count(), 2)
+    
+    def test_only_tasks_run(self):
+        """Test plain functions can't be queued or run from the table"""
+        with self.assertRaises(ValueError):
+            tasks.enqueue(make_booking)
+        queued = Task.objects.create(name='bookings.tests.make_booking', kwargs={})
+        tasks.run_due_tasks()
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, 'dead')
+    
+    def test_abandoned_task_requeued(self):
+        """Test a task left running by a dead worker is picked up again"""
+        queued = tasks.enqueue(record_call, {'value': 1})
+        tasks.claim_batch()
+        Task.objects.filter(pk=queued.pk).update(locked_at=timezone.now() - timedelta(minutes=10))
+        self.assertEqual(tasks.run_due_tasks(), (1, 0))
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), ('done', 2))
+    
+    def test_claimed_tasks_skipped(self):
+        """Test a task claimed by one worker isn't claimed by another"""
+        tasks.enqueue(record_call, {'value': 1})
+        self.assertEqual(len(tasks.claim_batch()), 1)
+        self.assertEqual(tasks.claim_batch(), [])
+    
+    def test_purge_finished(self):
+        """Test old done tasks are purged and dead ones kept"""
+        done = tasks.enqueue(record_call, {'value': 1})
+        dead = Task.objects.create(name='bookings.tests.record_call', status='dead')
+        tasks.run_due_tasks()
+        Task.objects.filter(pk__in=[done.pk, dead.pk]).update(finished_at=timezone.now() - timedelta(days=8))
+        self.assertEqual(tasks.purge_finished(), 1)
+        self.assertEqual(list(Task.objects.values_list('pk', flat=True)), [dead.pk])
+    
+    def test_command_runs_due_tasks(self):
+        """Test the worker command runs everything due"""
+        tasks.enqueue(record_call, {'value': 1})
+        tasks.enqueue(record_call, {'value': 2})
+        out = StringIO()
+        call_command('run_tasks', stdout=out)
+        self.assertIn('Ran 2 tasks (0 failed)', out.getvalue())
+        self.assertEqual(sorted(TASK_CALLS), [1, 2])
+    
+    @override_settings(SUPABASE_URL='https://example.supabase.co', SUPABASE_ANON_KEY='anon')
+    def test_logout_revokes_session_in_background(self):
+        """Test logout queues the Supabase sign-out instead of calling it inline"""
+        User.objects.create_user(username='driver', password='testpass123')
+        self.client.login(username='driver', password='testpass123')
+        session = self.client.session
+        session['supabase_access_token'] = 'access-token'
+        session.save()
+        
+        claims = {'sub': 'abc', 'exp': clock.time() + 3600}
+        with mock.patch('bookings.middleware.verify_access_token', return_value=claims), \
+                mock.patch('bookings.supabase_auth.requests.post') as post:
+            self.client.get('/logout/')
+            post.assert_not_called()
+            post.return_value.status_code = 204
+            tasks.run_due_tasks()
+        self.assertEqual(post.call_args.args[0], 'https://example.supabase.co/auth/v1/logout')
+        self.assertEqual(post.call_args.kwargs['headers']['Authorization'], 'Bearer access-token')
+        # The token doesn't outlive the sign-out
+        self.assertEqual(Task.objects.get().kwargs, {})
+    
+    def test_secret_kwargs_wiped_when_dead(self):
+        """Test a revoke that gives up, or whose worker died, doesn't keep the token"""
+        failed = tasks.enqueue(supabase_auth.revoke_session, {'access_token': 'secret'}, max_attempts=1)
+        with override_settings(SUPABASE_URL='https://example.supabase.co'), \
+                mock.patch('bookings.supabase_auth.requests.post', side_effect=RuntimeError('down')):
+            tasks.run_due_tasks()
+        failed.refresh_from_db()
+        self.assertEqual((failed.status, failed.kwargs), ('dead', {}))
+        
+        abandoned = tasks.enqueue(supabase_auth.revoke_session, {'access_token': 'secret'}, max_attempts=1)
+        kept = tasks.enqueue(record_call, {'value': 1}, max_attempts=1)
+        tasks.claim_batch()
+        Task.objects.filter(pk__in=[abandoned.pk, kept.pk]).update(locked_at=timezone.now() - timedelta(minutes=10))
+        tasks.requeue_stale()
+        self.assertEqual(Task.objects.get(pk=abandoned.pk).kwargs, {})
+        self.assertEqual(Task.objects.get(pk=kept.pk).kwargs, {'value': 1})
+    
+    def test_looping_worker_purges_hourly(self):
+        """Test run_tasks --loop purges finished tasks and expired idempotency keys on start and then once an hour"""
+        class StopLoop(Exception):
+            pass
+        
+        command = 'bookings.management.commands.run_tasks'
+        with mock.patch(f'{command}.purge_finished', return_value=0) as purge, \
+                mock.patch(f'{command}.purge_expired', return_value=0) as purge_keys, \
+                mock.patch(f'{command}.time.sleep', side_effect=[None, None, StopLoop]), \
+                mock.patch(f'{command}.time.monotonic', side_effect=[0, 10, 3600, 3600]):
+            with self.assertRaises(StopLoop):
+                call_command('run_tasks', '--loop', stdout=StringIO())
+        self.assertEqual(purge.call_count, 2)
+        self.assertEqual(purge_keys.call_count, 2)
+    
+    def test_confirmation_queues_email_task(self):
+        """Test confirming a booking queues one outbox run for the worker"""
+        user = User.objects.create_user(username='driver', password='testpass123')
+        first, second = make_booking(user), make_booking(user, booking_time=time(11, 0))
+        Booking.objects.filter(pk=first.pk).update_status('confirmed')
+        Booking.objects.filter(pk=second.pk).update_status('confirmed')
+        self.assertEqual(list(Task.objects.values_list('name', flat=True)), ['bookings.emails.send_outbox'])
+
+
+class BookingExportTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username='staffuser', password='testpass123', is_staff=True)
+        self.first = make_booking(self.admin, status='pending', booking_time=time(9, 0))
+        self.second = make_booking(self.admin, status='completed', booking_time=time(11, 0), customer_name='=HYPERLINK("x")')
+        self.third = make_booking(self.admin, status='completed', booking_date=date.today() + timedelta(days=1))
+        self.client.login(username='staffuser', password='testpass123')
+    
+    def test_csv_export_streams_in_booking_order(self):
+        """Test the CSV export streams every booking, soonest first, in one query"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/staff/bookings/export/', {'format': 'csv'})
+            content = b''.join(response.streaming_content).decode()
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('attachment; filename="bookings-', response['Content-Disposition'])
+        # Session, user, export rows
+        self.assertEqual(len(queries), 3)
+        
+        rows = list(csv.reader(StringIO(content)))
+        self.assertEqual(rows[0][:3], ['id', 'booking_date', 'booking_time'])
+        self.assertEqual([int(row[0]) for row in rows[1:]], [self.third.id, self.first.id, self.second.id])
+        # Formula-looking cells are defused for spreadsheet apps
+        self.assertEqual(rows[3][3], '\'=HYPERLINK("x")')
+    
+    def test_filters_match_dashboard(self):
+        """Test the export honours the dashboard's status and date filters"""
+        response = self.client.get('/staff/bookings/export/', {
+            'format': 'ndjson', 'status': 'completed', 'date': (date.today() + timedelta(days=7)).isoformat(),
+        })
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['id'] for row in rows], [self.second.id])
+        self.assertEqual(rows[0]['status'], 'completed')
+        self.assertEqual(rows[0]['price'], '25.00')
+        self.assertEqual(rows[0]['username'], 'staffuser')
+    
+    def test_rejects_unknown_format_and_customers(self):
+        """Test bad formats are refused and customers can't export"""
+        self.assertEqual(self.client.get('/staff/bookings/export/', {'format': 'xml'}).status_code, 400)
+        User.objects.create_user(username='customer', password='testpass123')
+        self.client.login(username='customer', password='testpass123')
+        self.assertEqual(self.client.get('/staff/bookings/export/').status_code, 302)
+    
+    async def test_asgi_export_streams_asynchronously(self):
+        """Test ASGI requests get an async stream rather than a buffered one"""
+        await self.async_client.aforce_login(self.admin)
+        response = await self.async_client.get('/staff/bookings/export/', {'format': 'ndjson', 'status': 'pending'})
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual([json.loads(line)['id'] for line in content.decode().splitlines()], [self.first.id])
+
+
+class SeedServicesTest(TestCase):
+    def setUp(self):
+        cache.clear()
+    
+    def seed(self, *args):
+        out = StringIO()
+        call_command('seed_services', *args, stdout=out)
+        return out.getvalue()
+    
+    def test_seeds_catalog_once(self):
+        """Test a second run writes nothing and keeps ids"""
+        output = self.seed()
+        self.assertIn('11 created, 0 updated, 0 unchanged', output)
+        ids = dict(Service.objects.values_list('name', 'id'))
+        self.assertEqual(Service.objects.get(name='Basic Wash').features, 'Exterior wash, Hand dry, Tire shine')
+        
+        with CaptureQueriesContext(connection) as queries:
+            output = self.seed()
+        self.assertIn('0 created, 0 updated, 11 unchanged', output)
+        self.assertFalse([q for q in queries.captured_queries if q['sql'].startswith('INSERT')])
+        self.assertEqual(dict(Service.objects.values_list('name', 'id')), ids)
+    
+    def test_upserts_changes_in_one_statement(self):
+        """Test changed and new services are written together and reported as a diff"""
+        self.seed()
+        basic = Service.objects.get(name='Basic Wash')
+        basic.price = 20
+        basic.save()
+        Service.objects.filter(name='Tire Shine').delete()
+        extra = Service.objects.create(name='Engine Bay', description='Degrease', category='individual', price=30, duration=30)
+        
+        with CaptureQueriesContext(connection) as queries:
+            output = self.seed()
+        inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 1)
+        self.assertIn('+ Tire Shine', output)
+        self.assertIn('~ Basic Wash: price 20.00 -> 25.00', output)
+        self.assertIn('Engine Bay', output)
+        self.assertIn('1 created, 1 updated, 9 unchanged', output)
+        self.assertEqual(Service.objects.get(name='Basic Wash').id, basic.id)
+        self.assertEqual(Service.objects.get(name='Basic Wash').price, 25)
+        # Services missing from the catalog are left alone
+        self.assertTrue(Service.objects.filter(id=extra.id).exists())
+    
+    def test_omitted_fields_keep_staff_edits(self):
+        """Test fields an entry leaves out are not reset"""
+        self.seed()
+        Service.objects.filter(name='Wax Application').update(is_active=False)
+        self.assertIn('11 unchanged', self.seed())
+        self.assertFalse(Service.objects.get(name='Wax Application').is_active)
+    
+    def test_dry_run_and_catalog_cache(self):
+        """Test --dry-run writes nothing and a real run refreshes the cached catalog"""
+        self.assertIn('Dry run', self.seed('--dry-run'))
+        self.assertFalse(Service.objects.exists())
+        self.assertEqual(get_catalog().services, ())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.seed()
+        self.assertEqual(len(get_catalog().active('package')), 3)
+    
+    def test_rejects_invalid_catalogs(self):
+        """Test duplicate names, unknown fields and bad values are refused before writing"""
+        with self.assertRaisesMessage(ValueError, 'listed more than once'):
+            seeding.seed_services(seeding.load_catalog(self.write_catalog([{'name': 'A'}, {'name': 'A'}])))
+        with self.assertRaisesMessage(ValueError, 'unknown fields colour'):
+            seeding.load_catalog(self.write_catalog([{'name': 'A', 'colour': 'red'}]))
+        path = self.write_catalog([
+            {'name': 'Good', 'description': 'Fine', 'category': 'package', 'price': '10', 'duration': 10},
+            {'name': 'Bad', 'description': 'Broken', 'category': 'package', 'price': 'free', 'duration': 10},
+        ])
+        with self.assertRaisesMessage(CommandError, 'Bad:'):
+            self.seed('--file', path)
+        self.assertFalse(Service.objects.exists())
+    
+    def write_catalog(self, entries):
+        handle, path = tempfile.mkstemp(suffix='.json')
+        with os.fdopen(handle, 'w') as f:
+            json.dump(entries, f)
+        self.addCleanup(os.remove, path)
+        return path
@@ -0,0 +1,35 @@
+"""
+Keeps tables derived from Booking in step with booking changes
+
+Single saves and deletes arrive through signals; bulk status updates go
+through BookingQuerySet.update_status, which calls in here directly since
+queryset.update() doesn't send signals. Places freed in the ledger are
+offered to the slot's waitlist straight away. Callers that pass the
+booking ids also get confirmation emails queued in the outbox and the
+changes pushed to the staff live feed.
+"""
+from . import capacity, dashboard, emails, live, profile_stats, rollups, waitlist
+
+
+def record_booking_changes(changes, slots_reserved=False, booking_ids=None):
+    """
+    Apply booking changes to the slot ledger, daily rollups and profile counters
+
+    changes is a list of (old, new) Booking tracked-state dicts, where None
+    means the booking doesn't exist on that side. Pass slots_reserved=True
+    when the caller has already taken the slot places itself, and
+    booking_ids (matching changes) to publish the changes to the live feed.
+    """
+    dashboard.bump_bookings_version()
+    if booking_ids is not None:
+        live.publish_changes(booking_ids, changes)
+        emails.queue_confirmations([
+            booking_id for booking_id, (old, new) in zip(booking_ids, changes)
+            if new is not None and new['status'] == 'confirmed' and (old is None or old['status'] != 'confirmed')
+        ])
+    rollups.apply_rollup_deltas(rollups.rollup_deltas(changes))
+    profile_stats.apply_profile_deltas(profile_stats.profile_deltas(changes))
+    if not slots_reserved:
+        deltas = capacity.slot_deltas(changes)
+        capacity.apply_slot_deltas(deltas)
+        waitlist.promote_freed(deltas)
@@ -19,10 +19,17 @@ urlpatterns = [
     path('user/booking/create/', views.create_booking, name='create_booking'),
     path('user/booking/<int:booking_id>/', views.booking_detail, name='booking_detail'),
     path('user/booking/<int:booking_id>/delete/', views.delete_booking, name='delete_booking'),
+    path('user/waitlist/<int:entry_id>/leave/', views.leave_waitlist, name='leave_waitlist'),
     
     # Staff/Admin dashboard and management
     path('staff/dashboard/', views.admin_dashboard, name='admin_dashboard'),
+    path('staff/dashboard/bookings/', views.admin_bookings_tab, name='admin_bookings_tab'),
+    path('staff/dashboard/users/', views.admin_users_tab, name='admin_users_tab'),
+    path('staff/dashboard/services/', views.admin_services_tab, name='admin_services_tab'),
     path('staff/booking/<int:booking_id>/status/', views.update_booking_status, name='update_booking_status'),
+    path('staff/bookings/status/', views.bulk_update_booking_status, name='bulk_update_booking_status'),
+    path('staff/bookings/events/', views.booking_events, name='booking_events'),
+    path('staff/bookings/export/', views.export_bookings, name='export_bookings'),
     
     # Admin service management
     path('staff/service/create/', views.create_service, name='create_service'),
@@ -31,4 +38,7 @@ urlpatterns = [
     
     # API endpoints
     path('api/weather/', views.weather_api, name='weather_api'),
+    path('api/availability/', views.availability_api, name='availability_api'),
+    path('api/availability/suggestions/', views.slot_suggestions_api, name='slot_suggestions_api'),
+    path('api/bookings/fleet/', views.fleet_booking_api, name='fleet_booking_api'),
 ]
@@ -0,0 +1,31 @@
+"""
+Cache version tokens
+
+Data derived from the database and cached (the service catalog, the
+compiled operating schedule, slot availability, dashboard fragments) is
+stored under keys that include a version token. A change bumps the token
+once its transaction commits, so the next reader misses and rebuilds;
+entries under old tokens are never read again and expire on their own.
+
+A bump only reaches the processes sharing the cache. With the default
+per-process memory cache, other gunicorn workers and the task worker keep
+their own tokens, so tokens expire after CACHE_VERSION_TTL seconds and
+every process rebuilds at least that often. Configure a shared cache
+backend for changes to show up everywhere at once.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+def version(key):
+    """Current token stored under key, created on first use"""
+    return cache.get_or_set(key, time.time_ns, timeout=settings.CACHE_VERSION_TTL)
+
+
+def bump(key):
+    """Replace the token under key once the current transaction commits"""
+    # After commit, so readers never cache data from a rolled-back transaction
+    transaction.on_commit(lambda: cache.set(key, time.time_ns(), timeout=settings.CACHE_VERSION_TTL))
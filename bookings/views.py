@@ -4,12 +4,36 @@ from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
 from django.conf import settings
-from django.http import JsonResponse
-from django.db.models import Q, Count, Sum, Case, When, Value, IntegerField
-import requests
+from django.http import HttpResponse, JsonResponse
+from django.template.loader import render_to_string
+from django.db import transaction
+from django.db.models import Q, Sum, Case, When, Value, IntegerField
+import asyncio
 from datetime import datetime
-from .models import Booking, UserProfile
+from urllib.parse import urlencode
+from .models import Booking, UserProfile, DailyBookingStats, WaitlistEntry
 from .forms import BookingForm, BookingStatusForm
+from .weather import get_weather
+from . import idempotency
+from .bays import allocate_bay
+from .capacity import reserve_slot
+from .operating_schedule import day_schedule
+from .scheduling import DEFAULT_DURATION, ends_by_closing
+from .pagination import can_estimate_count, keyset_paginate
+from .search import search_bookings, search_users
+from .catalog import catalog_version, get_catalog, price_booking
+from .dashboard import bookings_version, cached_fragment, stat_deltas, users_version
+from .waitlist import join_waitlist, queue_position
+from .availability import MAX_SUGGESTIONS, SUGGESTION_COUNT, nearest_slots
+from .tasks import enqueue
+
+# Booking list order for keyset pagination (matches the composite indexes on Booking)
+BOOKING_PAGE_ORDER = ('booking_date', 'booking_time', 'id')
+
+# Most bookings changed by one bulk status update from the dashboard
+MAX_BULK_STATUS_BOOKINGS = 100
+
+BOOKING_CREATED_MESSAGE = 'Booking created successfully! Your booking is pending confirmation from our team.'
 
 
 # Helper function to check if user is admin
@@ -30,63 +54,9 @@ def is_admin(user):
 
 
 # Weather API Integration
-def get_weather_data(city=None):
-    """Fetch weather data from OpenWeather API"""
-    if not city:
-        city = settings.OPENWEATHER_CITY
-    
-    api_key = settings.OPENWEATHER_API_KEY
-    
-    if not api_key:
-        return {
-            'error': 'Weather API key not configured',
-            'recommendation': 'Weather conditions unavailable'
-        }
-    
-    try:
-        url = f'https://api.openweathermap.org/data/2.5/weather?q={city}&appid={api_key}&units=metric'
-        response = requests.get(url, timeout=5)
-        response.raise_for_status()
-        
-        data = response.json()
-        temp = data['main']['temp']
-        condition = data['weather'][0]['main']
-        description = data['weather'][0]['description']
-        humidity = data['main']['humidity']
-        wind_speed = data['wind']['speed']
-        icon = data['weather'][0]['icon']
-        
-        # Generate car wash recommendation
-        is_good_for_wash = True
-        if condition in ['Rain', 'Drizzle', 'Thunderstorm']:
-            recommendation = 'Not recommended - Rain expected. Consider rescheduling.'
-            is_good_for_wash = False
-        elif condition in ['Dust', 'Sand']:
-            recommendation = 'Not ideal - Dusty conditions. Your car might get dirty quickly.'
-            is_good_for_wash = False
-        elif temp > 35:
-            recommendation = 'Good for a car wash, but very hot! Early morning or late afternoon is better.'
-        elif temp < 15:
-            recommendation = 'Good for a car wash, but quite cool. Dress warmly!'
-        else:
-            recommendation = 'Perfect weather for a car wash!'
-        
-        return {
-            'location': data['name'],
-            'temperature': round(temp),
-            'condition': condition,
-            'description': description,
-            'humidity': humidity,
-            'wind_speed': wind_speed,
-            'icon': icon,
-            'recommendation': recommendation,
-            'is_good_for_wash': is_good_for_wash
-        }
-    except Exception as e:
-        return {
-            'error': str(e),
-            'recommendation': 'Weather data unavailable'
-        }
+def get_weather_data(city=None, wait=True):
+    """Fetch weather data from OpenWeather API (cached, see bookings/weather.py)"""
+    return get_weather(city, wait=wait)
 
 
 # Public Views
@@ -98,8 +68,7 @@ def home(request):
         return redirect('user_dashboard')
     
     # Get featured services for landing page
-    from .models import Service
-    featured_services = Service.objects.filter(category='package', is_active=True).order_by('display_order')[:3]
+    featured_services = get_catalog().active('package')[:3]
     
     context = {
         'featured_services': featured_services,
@@ -260,15 +229,14 @@ def user_login(request):
 def user_logout(request):
     """User logout from Supabase and Django"""
     try:
-        from .supabase_client import get_supabase_client
-        supabase = get_supabase_client()
+        from .supabase_auth import revoke_session
         
         # Get access token from session
         access_token = request.session.get('supabase_access_token')
         
-        if access_token and supabase:
-            # Sign out from Supabase
-            supabase.auth.sign_out()
+        if access_token:
+            # Sign out from Supabase on the task worker
+            enqueue(revoke_session, {'access_token': access_token})
         
         # Clear Supabase session data
         request.session.pop('supabase_access_token', None)
@@ -304,27 +272,25 @@ def password_reset_request(request):
 @login_required
 def user_dashboard(request):
     """Regular user dashboard view"""
-    # Get all user's bookings for statistics
-    all_bookings = Booking.objects.filter(user=request.user)
-    
     # Get only upcoming bookings (pending, confirmed, in-progress) sorted by soonest first
-    bookings = all_bookings.filter(
-        status__in=['pending', 'confirmed', 'in-progress']
+    bookings = Booking.objects.filter(
+        user=request.user, status__in=['pending', 'confirmed', 'in-progress']
     ).order_by('booking_date', 'booking_time')
     
-    # Get statistics
-    total_bookings = all_bookings.count()
-    pending_bookings = all_bookings.filter(status='pending').count()
-    completed_bookings = all_bookings.filter(status='completed').count()
+    # Statistics come from the counters kept on the profile
+    profile, _ = UserProfile.objects.get_or_create(user=request.user)
     
-    # Get weather data for logged-in users
-    weather = get_weather_data()
+    waitlist = WaitlistEntry.objects.filter(user=request.user, status='waiting').order_by('booking_date', 'booking_time')
+    
+    # Get weather data for logged-in users; a cold cache is filled in the background
+    weather = get_weather_data(wait=False)
     
     context = {
         'bookings': bookings[:10],  # Show next 10 upcoming bookings
-        'total_bookings': total_bookings,
-        'pending_bookings': pending_bookings,
-        'completed_bookings': completed_bookings,
+        'waitlist': waitlist,
+        'total_bookings': profile.total_bookings,
+        'pending_bookings': profile.pending_bookings,
+        'completed_bookings': profile.completed_bookings,
         'weather': weather,
     }
     return render(request, 'user/dashboard.html', context)
@@ -333,11 +299,11 @@ def user_dashboard(request):
 @login_required
 def user_services(request):
     """User services page - browse and search services"""
-    from .models import Service
+    catalog = get_catalog()
     
     # Get all active services
-    packages = Service.objects.filter(category='package', is_active=True)
-    individual_services = Service.objects.filter(category='individual', is_active=True)
+    packages = catalog.active('package')
+    individual_services = catalog.active('individual')
     
     context = {
         'packages': packages,
@@ -349,8 +315,6 @@ def user_services(request):
 @login_required
 def user_bookings(request):
     """User bookings page - view all bookings"""
-    from django.core.paginator import Paginator
-    
     # Get all user's bookings
     bookings = Booking.objects.filter(user=request.user)
     
@@ -369,19 +333,30 @@ def user_bookings(request):
     if date_filter:
         bookings = bookings.filter(booking_date=date_filter)
     
-    # Order by date descending (newest first)
-    bookings = bookings.order_by('-booking_date', '-booking_time')
-    
-    # Pagination (7 per page)
-    paginator = Paginator(bookings, 7)
-    page = request.GET.get('page', 1)
-    bookings_obj = paginator.get_page(page)
+    # Keyset pagination, newest first (7 per page)
+    bookings_obj = keyset_paginate(
+        bookings,
+        BOOKING_PAGE_ORDER,
+        7,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        descending=True,
+        with_total=can_estimate_count(bookings),
+    )
+    filter_query = urlencode({
+        key: value for key, value in [
+            ('status', status_filter),
+            ('service', service_filter),
+            ('date', date_filter),
+        ] if value
+    })
     
     context = {
         'bookings': bookings_obj,
         'status_filter': status_filter,
         'service_filter': service_filter,
         'date_filter': date_filter,
+        'filter_query': filter_query,
     }
     return render(request, 'user/bookings.html', context)
 
@@ -389,22 +364,28 @@ def user_bookings(request):
 @login_required
 def create_booking(request):
     """Create new booking view"""
-    from .models import Service
     from datetime import date
+    catalog = get_catalog()
     
     # Get selected service from URL parameter
     service_id = request.GET.get('service')
     selected_service = None
     if service_id:
-        try:
-            selected_service = Service.objects.get(id=service_id, is_active=True)
-        except Service.DoesNotExist:
+        selected_service = catalog.get(service_id, active_only=True)
+        if selected_service is None:
             messages.warning(request, 'Selected service not found.')
     
     # Get all active services for the dropdown
-    all_services = Service.objects.filter(is_active=True)
+    all_services = catalog.active()
     
     if request.method == 'POST':
+        idempotency_key = idempotency.submitted_key(request)
+        
+        # A retried submission (double click, network retry) gets the original result
+        if idempotency.find_result(request.user, idempotency_key) is not None:
+            messages.success(request, BOOKING_CREATED_MESSAGE)
+            return redirect('user_dashboard')
+        
         form = BookingForm(request.POST, user=request.user)
         if form.is_valid():
             booking = form.save(commit=False)
@@ -417,65 +398,88 @@ def create_booking(request):
                     'form': form,
                     'selected_service': selected_service,
                     'all_services': all_services,
+                    'idempotency_key': idempotency_key,
                 })
             
-            # Check if time slot is available (max 5 bookings per time slot per day)
-            existing_bookings = Booking.objects.filter(
-                booking_date=booking.booking_date,
-                booking_time=booking.booking_time
-            ).exclude(status='cancelled').count()
+            # Get price, duration and service type from the catalog service, if one was chosen
+            price_booking(booking, request.POST.get('service_id'), catalog)
             
-            if existing_bookings >= 5:
-                messages.error(request, f'Sorry, the time slot {booking.booking_time.strftime("%I:%M %p")} on {booking.booking_date.strftime("%B %d, %Y")} is fully booked. Please select a different time.')
+            # Long services must still finish by closing time
+            if not ends_by_closing(booking.booking_time, booking.duration, day_schedule(booking.booking_date)):
+                messages.error(request, f'A {booking.duration}-minute service starting at {booking.booking_time.strftime("%I:%M %p")} would run past closing time. Please select an earlier time.')
                 return render(request, 'user/create_booking.html', {
                     'form': form,
                     'selected_service': selected_service,
                     'all_services': all_services,
+                    'idempotency_key': idempotency_key,
                 })
             
-            # Get price and service type from Service model if service exists in database
-            service_id_from_form = request.POST.get('service_id')
-            if service_id_from_form:
-                try:
-                    service = Service.objects.get(id=service_id_from_form)
-                    booking.price = service.price
-                    
-                    # Map service name to service type
-                    service_name_lower = service.name.lower()
-                    if 'basic' in service_name_lower:
-                        booking.service = 'basic'
-                    elif 'deluxe' in service_name_lower:
-                        booking.service = 'deluxe'
-                    elif 'premium' in service_name_lower or 'detail' in service_name_lower:
-                        booking.service = 'premium'
-                    elif 'interior' in service_name_lower:
-                        booking.service = 'interior'
-                    elif 'full' in service_name_lower:
-                        booking.service = 'fulldetail'
-                    else:
-                        booking.service = 'basic'  # Default fallback
-                        
-                except Service.DoesNotExist:
-                    # Fallback to old price map
-                    price_map = {
-                        'basic': 25.00,
-                        'premium': 45.00,
-                        'deluxe': 85.00,
-                    }
-                    booking.price = price_map.get(booking.service, 25.00)
-            else:
-                booking.price = 25.00
+            # Claim the submission's key first, so a concurrent duplicate waits here instead of
+            # taking another place; then a place in every slot the booking covers and a bay
+            placed = False
+            reserved = False
+            with transaction.atomic():
+                claimed = idempotency.claim(request.user, idempotency_key)
+                if claimed is not None:
+                    reserved = reserve_slot(booking.booking_date, booking.booking_time, booking.duration)
+                if reserved:
+                    placed = allocate_bay(booking)
+                if not placed:
+                    # Nothing booked; release the key so the corrected form can be resent
+                    transaction.set_rollback(True)
+                else:
+                    booking._slot_reserved = True
+                    booking.save()
+                    claimed.booking = booking
+                    claimed.save(update_fields=['booking'])
+            
+            if claimed is None:
+                messages.success(request, BOOKING_CREATED_MESSAGE)
+                return redirect('user_dashboard')
+            
+            # Full slot: queue for it instead if the customer asked to
+            if not placed and request.POST.get('join_waitlist'):
+                entry = join_waitlist(booking)
+                messages.success(request, f'You are number {queue_position(entry)} on the waitlist for {booking.booking_time.strftime("%I:%M %p")} on {booking.booking_date.strftime("%B %d, %Y")}. We will book it for you automatically if a place opens up.')
+                return redirect('user_dashboard')
             
-            booking.save()
-            messages.success(request, 'Booking created successfully! Your booking is pending confirmation from our team.')
+            if reserved and not placed:
+                messages.error(request, f'Sorry, no bay that can take a {booking.get_vehicle_type_display().lower()} is free at {booking.booking_time.strftime("%I:%M %p")} on {booking.booking_date.strftime("%B %d, %Y")}. Please select a different time or join the waitlist.')
+                return render(request, 'user/create_booking.html', {
+                    'form': form,
+                    'selected_service': selected_service,
+                    'all_services': all_services,
+                    'idempotency_key': idempotency_key,
+                    'offer_waitlist': True,
+                    'suggestions': nearest_slots(
+                        booking.booking_date, booking.booking_time, booking.duration, vehicle_type=booking.vehicle_type,
+                    ),
+                })
+            
+            if not reserved:
+                messages.error(request, f'Sorry, the time slot {booking.booking_time.strftime("%I:%M %p")} on {booking.booking_date.strftime("%B %d, %Y")} is fully booked. Please select a different time or join the waitlist.')
+                return render(request, 'user/create_booking.html', {
+                    'form': form,
+                    'selected_service': selected_service,
+                    'all_services': all_services,
+                    'idempotency_key': idempotency_key,
+                    'offer_waitlist': True,
+                    'suggestions': nearest_slots(
+                        booking.booking_date, booking.booking_time, booking.duration, vehicle_type=booking.vehicle_type,
+                    ),
+                })
+            
+            messages.success(request, BOOKING_CREATED_MESSAGE)
             return redirect('user_dashboard')
     else:
         form = BookingForm(user=request.user)
+        idempotency_key = idempotency.new_key()
     
     context = {
         'form': form,
         'selected_service': selected_service,
         'all_services': all_services,
+        'idempotency_key': idempotency_key,
     }
     return render(request, 'user/create_booking.html', context)
 
@@ -504,119 +508,248 @@ def delete_booking(request, booking_id):
         return redirect('user_dashboard')
     
     if request.method == 'POST':
-        booking.delete()
+        # The freed place goes to the slot's waitlist in the same transaction
+        with transaction.atomic():
+            booking.delete()
         messages.success(request, 'Booking deleted successfully.')
         return redirect('user_dashboard')
     
     return render(request, 'user/confirm_delete.html', {'booking': booking})
 
 
+@login_required
+def leave_waitlist(request, entry_id):
+    """Withdraw from a slot's waitlist"""
+    entry = get_object_or_404(WaitlistEntry, id=entry_id, user=request.user)
+    
+    if request.method == 'POST' and entry.status == 'waiting':
+        entry.status = 'withdrawn'
+        entry.save(update_fields=['status'])
+        messages.success(request, 'You have left the waitlist.')
+    return redirect('user_dashboard')
+
+
 # Admin Views
 @login_required
 @user_passes_test(is_admin)
 def admin_dashboard(request):
-    """Admin dashboard view - Manage all users and bookings"""
-    from django.core.paginator import Paginator
+    """Admin dashboard view - statistics; each tab is loaded from its own endpoint"""
     from django.contrib.auth.models import User
     
-    # Get all bookings
-    bookings = Booking.objects.all().select_related('user')
-    
-    # Get all users with booking count annotation
-    # Order by: admin role first, then by date joined (newest first)
-    users = User.objects.all().select_related('profile').annotate(
-        booking_count=Count('bookings'),
-        role_order=Case(
-            When(profile__role='admin', then=Value(0)),
-            default=Value(1),
-            output_field=IntegerField()
-        )
-    ).order_by('role_order', '-date_joined')
+    # Get statistics in a single pass over the daily rollup
+    stats = DailyBookingStats.objects.aggregate(
+        total_bookings=Sum('booking_count'),
+        pending_bookings=Sum('booking_count', filter=Q(status='pending')),
+        confirmed_bookings=Sum('booking_count', filter=Q(status='confirmed')),
+        completed_bookings=Sum('booking_count', filter=Q(status='completed')),
+        cancelled_bookings=Sum('booking_count', filter=Q(status='cancelled')),
+        # Revenue from completed bookings
+        revenue=Sum('revenue', filter=Q(status='completed')),
+    )
+    total_users = User.objects.count()
     
-    # Get statistics
-    total_bookings = bookings.count()
-    pending_bookings = bookings.filter(status='pending').count()
-    confirmed_bookings = bookings.filter(status='confirmed').count()
-    completed_bookings = bookings.filter(status='completed').count()
-    cancelled_bookings = bookings.filter(status='cancelled').count()
-    total_users = users.count()
-    
-    # Calculate revenue from completed bookings
-    revenue = bookings.filter(status='completed').aggregate(total=Sum('price'))['total'] or 0
+    context = {
+        'total_bookings': stats['total_bookings'] or 0,
+        'total_users': total_users,
+        'pending_bookings': stats['pending_bookings'] or 0,
+        'confirmed_bookings': stats['confirmed_bookings'] or 0,
+        'completed_bookings': stats['completed_bookings'] or 0,
+        'cancelled_bookings': stats['cancelled_bookings'] or 0,
+        'revenue': stats['revenue'] or 0,
+    }
+    return render(request, 'admin/dashboard.html', context)
+
+
+def filter_admin_bookings(params):
+    """Bookings matching the dashboard's search, status, service and date filters"""
+    bookings = Booking.objects.all()
+    search_query = params.get('search', '')
+    status_filter = params.get('status', '')
+    service_filter = params.get('service', '')
+    date_filter = params.get('date', '')
     
     # Filter by search query
-    search_query = request.GET.get('search', '')
     if search_query:
-        bookings = bookings.filter(
-            Q(customer_name__icontains=search_query) |
-            Q(customer_email__icontains=search_query) |
-            Q(vehicle_plate__icontains=search_query)
-        )
+        bookings = search_bookings(bookings, search_query)
     
     # Filter by status (default to all statuses)
-    status_filter = request.GET.get('status', '')
     if status_filter:
         bookings = bookings.filter(status=status_filter)
     
     # Filter by service
-    service_filter = request.GET.get('service', '')
     if service_filter:
         bookings = bookings.filter(service=service_filter)
     
     # Filter by date (no default filter)
-    date_filter = request.GET.get('date', '')
     if date_filter:
         bookings = bookings.filter(booking_date=date_filter)
+    return bookings
+
+
+def _tab_response(request, tab, version, render_tab):
+    """Cached fragment for a dashboard tab, preceded by any pending messages"""
+    html = cached_fragment(tab, version, request.GET, render_tab)
+    return HttpResponse(render_to_string('admin/tabs/messages.html', request=request) + html)
+
+
+@login_required
+@user_passes_test(is_admin)
+def admin_bookings_tab(request):
+    """Bookings tab of the admin dashboard (HTML fragment)"""
+    search_query = request.GET.get('search', '')
+    status_filter = request.GET.get('status', '')
+    service_filter = request.GET.get('service', '')
+    date_filter = request.GET.get('date', '')
     
-    # Filter users by search
-    user_search = request.GET.get('user_search', '')
-    if user_search:
-        users = users.filter(
-            Q(username__icontains=user_search) |
-            Q(email__icontains=user_search) |
-            Q(first_name__icontains=user_search) |
-            Q(last_name__icontains=user_search)
+    def render_tab():
+        bookings = filter_admin_bookings(request.GET).select_related('user')
+        
+        # Keyset pagination for bookings (7 per page)
+        # Sort by date (soonest first), then by time
+        bookings_obj = keyset_paginate(
+            bookings,
+            BOOKING_PAGE_ORDER,
+            7,
+            after=request.GET.get('bookings_after'),
+            before=request.GET.get('bookings_before'),
+            with_total=can_estimate_count(bookings),
         )
+        bookings_filter_query = urlencode({
+            key: value for key, value in [
+                ('search', search_query),
+                ('status', status_filter),
+                ('service', service_filter),
+                ('date', date_filter),
+            ] if value
+        })
+        return render_to_string('admin/tabs/bookings.html', {
+            'bookings': bookings_obj,
+            'search_query': search_query,
+            'status_filter': status_filter,
+            'service_filter': service_filter,
+            'date_filter': date_filter,
+            'bookings_filter_query': bookings_filter_query,
+        })
+    
+    return _tab_response(request, 'bookings', bookings_version(), render_tab)
+
+
+@login_required
+@user_passes_test(is_admin)
+def export_bookings(request):
+    """Stream the bookings matching the dashboard filters as CSV or NDJSON (admin only)"""
+    from django.core.handlers.asgi import ASGIRequest
+    from django.http import StreamingHttpResponse
+    from . import exports
     
-    # Pagination for bookings (7 per page)
-    # Sort by date (soonest first), then by time
-    bookings_list = bookings.order_by('booking_date', 'booking_time')
-    bookings_paginator = Paginator(bookings_list, 7)
-    bookings_page = request.GET.get('bookings_page', 1)
-    bookings_obj = bookings_paginator.get_page(bookings_page)
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in exports.FORMATS:
+        return HttpResponse(f'Unknown export format "{fmt}". Use csv or ndjson.', status=400)
     
-    # Pagination for users (7 per page)
-    users_paginator = Paginator(users, 7)
-    users_page = request.GET.get('users_page', 1)
-    users_obj = users_paginator.get_page(users_page)
+    bookings = filter_admin_bookings(request.GET)
+    rows = exports.astream(bookings, fmt) if isinstance(request, ASGIRequest) else exports.stream(bookings, fmt)
+    response = StreamingHttpResponse(rows, content_type=exports.FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="bookings-{datetime.now():%Y%m%d-%H%M}.{fmt}"'
+    return response
+
+
+@login_required
+@user_passes_test(is_admin)
+def admin_users_tab(request):
+    """Users tab of the admin dashboard (HTML fragment)"""
+    from django.core.paginator import Paginator
+    from django.contrib.auth.models import User
     
-    # Get all services for Services tab
-    from .models import Service
-    all_services = Service.objects.all().order_by('category', 'display_order', 'name')
+    user_search = request.GET.get('user_search', '')
     
-    # Pagination for services (7 per page)
-    services_paginator = Paginator(all_services, 7)
-    services_page = request.GET.get('services_page', 1)
-    services_obj = services_paginator.get_page(services_page)
+    def render_tab():
+        # Booking counts are read from the profiles
+        # Order by: admin role first, then by date joined (newest first)
+        users = User.objects.all().select_related('profile').annotate(
+            role_order=Case(
+                When(profile__role='admin', then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField()
+            )
+        ).order_by('role_order', '-date_joined')
+        
+        # Filter users by search
+        if user_search:
+            users = search_users(users, user_search)
+        
+        # Pagination for users (7 per page)
+        users_paginator = Paginator(users, 7)
+        users_obj = users_paginator.get_page(request.GET.get('users_page', 1))
+        return render_to_string('admin/tabs/users.html', {
+            'users': users_obj,
+            'user_search': user_search,
+        })
     
-    context = {
-        'bookings': bookings_obj,
-        'users': users_obj,
-        'services': services_obj,
-        'total_bookings': total_bookings,
-        'total_users': total_users,
-        'pending_bookings': pending_bookings,
-        'confirmed_bookings': confirmed_bookings,
-        'completed_bookings': completed_bookings,
-        'cancelled_bookings': cancelled_bookings,
-        'revenue': revenue,
-        'search_query': search_query,
-        'status_filter': status_filter,
-        'service_filter': service_filter,
-        'date_filter': date_filter,
-        'user_search': user_search,
-    }
-    return render(request, 'admin/dashboard.html', context)
+    # Profile counters move with bookings, so both versions key the fragment
+    return _tab_response(request, 'users', f'{users_version()}-{bookings_version()}', render_tab)
+
+
+@login_required
+@user_passes_test(is_admin)
+def admin_services_tab(request):
+    """Services tab of the admin dashboard (HTML fragment)"""
+    from django.core.paginator import Paginator
+    
+    def render_tab():
+        # Pagination for services (7 per page)
+        services_paginator = Paginator(get_catalog().for_admin(), 7)
+        services_obj = services_paginator.get_page(request.GET.get('services_page', 1))
+        return render_to_string('admin/tabs/services.html', {'services': services_obj})
+    
+    return _tab_response(request, 'services', catalog_version(), render_tab)
+
+
+async def booking_events(request):
+    """Server-sent event stream of booking changes for staff dashboards (ASGI only)"""
+    from asgiref.sync import sync_to_async
+    from django.core.handlers.asgi import ASGIRequest
+    from django.http import HttpResponseForbidden, StreamingHttpResponse
+    from .live import broker, format_event
+    
+    user = await request.auser()
+    if not await sync_to_async(is_admin)(user):
+        return HttpResponseForbidden('Staff only.')
+    if not isinstance(request, ASGIRequest):
+        # A WSGI worker would hold a thread per connection and buffer the stream
+        return HttpResponse('The live feed needs the ASGI server (carwash.asgi).', status=503)
+    
+    async def stream():
+        queue = broker.subscribe()
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=settings.LIVE_FEED_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield format_event(event)
+        finally:
+            broker.unsubscribe(queue)
+    
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop reverse proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def wants_json(request):
+    """True for requests sent by the dashboard's fetch() calls"""
+    return (
+        request.headers.get('x-requested-with') == 'XMLHttpRequest'
+        or 'application/json' in request.headers.get('accept', '')
+    )
+
+
+def status_payload(booking):
+    """Row data the dashboard needs to redraw a booking's status cell"""
+    return {'id': booking.id, 'status': booking.status, 'status_display': booking.get_status_display()}
 
 
 @login_required
@@ -625,6 +758,7 @@ def update_booking_status(request, booking_id):
     """Update booking status (admin only) - Handles POST from dropdown on admin dashboard"""
     booking = get_object_or_404(Booking, id=booking_id)
     old_status = booking.status  # Store the old status
+    as_json = wants_json(request)
     
     if request.method == 'POST':
         # Get new status from POST data
@@ -632,36 +766,77 @@ def update_booking_status(request, booking_id):
         valid_statuses = [choice[0] for choice in Booking.STATUS_CHOICES]
         
         if not new_status:
+            if as_json:
+                return JsonResponse({'error': 'No status provided.'}, status=400)
             messages.error(request, 'No status provided.')
             return redirect('admin_dashboard')
             
         if new_status in valid_statuses:
             booking.status = new_status
-            booking.save()
+            # A cancellation promotes the slot's waitlist and a confirmation
+            # queues its email in the outbox, both in the same transaction
+            with transaction.atomic():
+                booking.save()
+            
+            if as_json:
+                return JsonResponse({
+                    'bookings': [status_payload(booking)],
+                    'deltas': stat_deltas([(old_status, new_status, booking.price)]),
+                })
             
-            # Send confirmation email when status changes to 'confirmed'
             if old_status != 'confirmed' and new_status == 'confirmed':
-                from .emails import send_booking_confirmation_email
-                email_sent = send_booking_confirmation_email(booking)
-                
-                if email_sent:
-                    messages.success(request, f'Booking confirmed! Confirmation email sent to {booking.customer_email}.')
-                else:
-                    messages.success(request, f'Booking status updated to {new_status}.')
-                    messages.warning(request, 'However, confirmation email could not be sent.')
+                messages.success(request, f'Booking confirmed! A confirmation email to {booking.customer_email} is on its way.')
             else:
                 messages.success(request, f'Booking status updated to {booking.get_status_display()}.')
             
             return redirect('admin_dashboard')
         else:
-            messages.error(request, f'Invalid status "{new_status}". Valid options are: {", ".join(valid_statuses)}')
+            error = f'Invalid status "{new_status}". Valid options are: {", ".join(valid_statuses)}'
+            if as_json:
+                return JsonResponse({'error': error}, status=400)
+            messages.error(request, error)
             return redirect('admin_dashboard')
     else:
+        if as_json:
+            return JsonResponse({'error': 'POST a status.'}, status=405)
         # GET request - redirect to admin dashboard
         messages.info(request, 'Please use the status dropdown on the dashboard to update booking status.')
         return redirect('admin_dashboard')
 
 
+@login_required
+@user_passes_test(is_admin)
+def bulk_update_booking_status(request):
+    """Set one status on several bookings in a single UPDATE (admin only, JSON)"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST booking_ids and a status.'}, status=405)
+    
+    new_status = request.POST.get('status')
+    valid_statuses = [choice[0] for choice in Booking.STATUS_CHOICES]
+    if new_status not in valid_statuses:
+        return JsonResponse({'error': f'Valid statuses are: {", ".join(valid_statuses)}'}, status=400)
+    try:
+        booking_ids = {int(value) for value in request.POST.getlist('booking_ids')}
+    except ValueError:
+        return JsonResponse({'error': 'booking_ids must be integers.'}, status=400)
+    if not booking_ids:
+        return JsonResponse({'error': 'Select at least one booking.'}, status=400)
+    if len(booking_ids) > MAX_BULK_STATUS_BOOKINGS:
+        return JsonResponse({'error': f'At most {MAX_BULK_STATUS_BOOKINGS} bookings per update.'}, status=400)
+    
+    with transaction.atomic():
+        changing = list(
+            Booking.objects.filter(id__in=booking_ids).exclude(status=new_status)
+            .select_for_update().values_list('id', 'status', 'price')
+        )
+        Booking.objects.filter(id__in=[row[0] for row in changing]).update_status(new_status)
+    
+    return JsonResponse({
+        'bookings': [status_payload(booking) for booking in Booking.objects.filter(id__in=booking_ids)],
+        'deltas': stat_deltas((old_status, new_status, price) for _, old_status, price in changing),
+    })
+
+
 # Service CRUD Views
 @login_required
 @user_passes_test(is_admin)
@@ -736,6 +911,92 @@ def delete_service(request, service_id):
     return redirect(reverse('admin_dashboard') + '?tab=services')
 
 
+# API endpoint for slot availability (AJAX)
+def availability_api(request):
+    """Return remaining capacity for every time slot across a date range as JSON (optionally for a service's duration)"""
+    from datetime import date
+    from django.utils.cache import get_conditional_response, patch_cache_control
+    from .availability import get_availability
+    
+    try:
+        start = date.fromisoformat(request.GET['start']) if request.GET.get('start') else date.today()
+        days = int(request.GET.get('days', 30))
+        duration = int(request.GET.get('duration', DEFAULT_DURATION))
+    except ValueError:
+        return JsonResponse({'error': 'Use start=YYYY-MM-DD and integer days and duration values.'}, status=400)
+    if duration < 1:
+        return JsonResponse({'error': 'duration must be a positive number of minutes.'}, status=400)
+    
+    payload, etag = get_availability(start, days, duration)
+    
+    # Let the browser revalidate cheaply with If-None-Match
+    response = get_conditional_response(request, etag=f'"{etag}"')
+    if response is None:
+        response = JsonResponse(payload)
+    response['ETag'] = f'"{etag}"'
+    patch_cache_control(response, private=True, max_age=settings.AVAILABILITY_CACHE_TTL)
+    return response
+
+
+def slot_suggestions_api(request):
+    """Return the open slots nearest a requested date and time as JSON"""
+    from datetime import date, time
+    
+    try:
+        day = date.fromisoformat(request.GET['date'])
+        start = time.fromisoformat(request.GET['time'])
+        duration = int(request.GET.get('duration', DEFAULT_DURATION))
+        count = int(request.GET.get('count', SUGGESTION_COUNT))
+    except (KeyError, ValueError):
+        return JsonResponse({'error': 'Use date=YYYY-MM-DD, time=HH:MM[:SS] and integer duration and count values.'}, status=400)
+    if duration < 1:
+        return JsonResponse({'error': 'duration must be a positive number of minutes.'}, status=400)
+    vehicle_type = request.GET.get('vehicle_type') or None
+    if vehicle_type is not None and vehicle_type not in dict(Booking.VEHICLE_TYPES):
+        return JsonResponse({'error': f'vehicle_type must be one of: {", ".join(dict(Booking.VEHICLE_TYPES))}.'}, status=400)
+    
+    return JsonResponse({
+        'date': day.isoformat(),
+        'time': start.strftime('%H:%M:%S'),
+        'duration': duration,
+        'vehicle_type': vehicle_type,
+        'suggestions': nearest_slots(
+            day, start, duration, count=max(1, min(count, MAX_SUGGESTIONS)), vehicle_type=vehicle_type,
+        ),
+    })
+
+
+@login_required
+def fleet_booking_api(request):
+    """Book many vehicles at once from a JSON list of booking rows"""
+    import json
+    from .fleet import ALL_OR_NOTHING, MAX_FLEET_ROWS, MODES, book_fleet
+    
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST a JSON body with a "bookings" list.'}, status=405)
+    try:
+        body = json.loads(request.body)
+        rows = body['bookings']
+        mode = body.get('mode', ALL_OR_NOTHING)
+    except (ValueError, TypeError, KeyError):
+        return JsonResponse({'error': 'POST a JSON body with a "bookings" list.'}, status=400)
+    if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows) or not rows:
+        return JsonResponse({'error': '"bookings" must be a non-empty list of objects.'}, status=400)
+    if len(rows) > MAX_FLEET_ROWS:
+        return JsonResponse({'error': f'At most {MAX_FLEET_ROWS} bookings per request.'}, status=400)
+    if mode not in MODES:
+        return JsonResponse({'error': f'mode must be one of: {", ".join(MODES)}.'}, status=400)
+    
+    result = book_fleet(request.user, rows, mode)
+    if not result.errors:
+        status = 201
+    elif result.created:
+        status = 200
+    else:
+        status = 400
+    return JsonResponse(result.as_dict(), status=status)
+
+
 # API endpoint for weather (AJAX)
 def weather_api(request):
     """Return weather data as JSON"""
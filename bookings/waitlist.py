@@ -0,0 +1,119 @@
+"""
+Per-slot waitlist
+
+Customers who find a slot full can queue for it (WaitlistEntry). When a
+booking gives back its places (cancelled, deleted or moved), the oldest
+entries whose span covers a freed slot are promoted to pending bookings
+inside the same transaction as the change that freed it. That includes
+longer bookings that start earlier and run into the freed slot.
+
+Each entry is locked with SKIP LOCKED, so concurrent cancellations each
+take a different entry instead of queueing behind one another, and the
+ledger's conditional UPDATE (reserve_slot) re-checks every slot the entry
+covers, so a promotion can never overbook. An entry that doesn't fit keeps
+its place in the queue for the next freed place.
+"""
+from collections import defaultdict
+from datetime import date, datetime
+
+from django.db import transaction
+from django.utils import timezone
+
+from .bays import allocate_bay
+from .capacity import reserve_slot
+from .models import WaitlistEntry
+from .scheduling import covered_slots
+
+
+def join_waitlist(booking):
+    """Queue an unsaved booking for its slot; returns the (possibly existing) entry"""
+    fields = {field: getattr(booking, field) for field in WaitlistEntry.BOOKING_FIELDS}
+    existing = WaitlistEntry.objects.filter(
+        status='waiting', user=booking.user, booking_date=booking.booking_date,
+        booking_time=booking.booking_time, vehicle_plate=booking.vehicle_plate,
+    ).first()
+    return existing or WaitlistEntry.objects.create(**fields)
+
+
+def queue_position(entry):
+    """1-based place of a waiting entry in its slot's queue"""
+    return WaitlistEntry.objects.filter(
+        status='waiting', booking_date=entry.booking_date, booking_time=entry.booking_time,
+        created_at__lte=entry.created_at, id__lte=entry.id,
+    ).count()
+
+
+def _book_entry(entry):
+    """Turn a locked waiting entry into a pending booking, or return None if it doesn't fit"""
+    booking = entry.make_booking()
+    if not reserve_slot(booking.booking_date, booking.booking_time, booking.duration):
+        return None
+    if not allocate_bay(booking):
+        transaction.set_rollback(True)
+        return None
+
+    booking._slot_reserved = True
+    booking.save()
+    entry.status = 'promoted'
+    entry.booking = booking
+    entry.promoted_at = timezone.now()
+    entry.save(update_fields=['status', 'booking', 'promoted_at'])
+    return booking
+
+
+def promote_next(booking_date, booking_time):
+    """
+    Turn the oldest waiting entry for a slot into a pending booking
+
+    Returns the new booking, or None if nobody is waiting or the head of
+    the queue doesn't fit (it stays first in line for the next freed place).
+    """
+    with transaction.atomic():
+        entry = WaitlistEntry.objects.select_for_update(skip_locked=True).filter(
+            status='waiting', booking_date=booking_date, booking_time=booking_time,
+        ).order_by('created_at', 'id').first()
+        if entry is None:
+            return None
+        return _book_entry(entry)
+
+
+def promote_entry(entry_id):
+    """Promote one entry if it is still waiting, unlocked and fits; returns the booking or None"""
+    with transaction.atomic():
+        entry = WaitlistEntry.objects.select_for_update(skip_locked=True).filter(
+            pk=entry_id, status='waiting',
+        ).first()
+        if entry is None:
+            return None
+        return _book_entry(entry)
+
+
+def promote_freed(deltas):
+    """Fill places freed by {(date, time): delta} ledger changes from the waitlist"""
+    today, now = date.today(), datetime.now().time()
+    freed = defaultdict(dict)
+    for (booking_date, booking_time), delta in deltas.items():
+        if delta < 0 and (booking_date > today or (booking_date == today and booking_time > now)):
+            freed[booking_date][booking_time] = -delta
+
+    promoted = []
+    for booking_date, places in sorted(freed.items()):
+        # Entries starting after the last freed slot can't cover any of them
+        entries = WaitlistEntry.objects.filter(
+            status='waiting', booking_date=booking_date, booking_time__lte=max(places),
+        ).order_by('created_at', 'id').values_list('id', 'booking_time', 'duration')
+        for entry_id, booking_time, duration in entries:
+            if not any(places.values()):
+                break
+            if booking_date == today and booking_time <= now:
+                continue
+            covered = [slot for slot in covered_slots(booking_time, duration) if places.get(slot)]
+            if not covered:
+                continue
+            booking = promote_entry(entry_id)
+            if booking is None:
+                continue
+            promoted.append(booking)
+            for slot in covered:
+                places[slot] -= 1
+    return promoted
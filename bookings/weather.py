@@ -0,0 +1,193 @@
+"""
+OpenWeather integration with a shared TTL cache
+
+Entries are stored in Django's cache keyed by normalized city name. Fresh
+entries are served directly; stale entries are served immediately while a
+single background refresh runs. Concurrent misses for the same city
+within a process collapse into one outbound request, and pages that can do
+without the weather skip the miss entirely.
+
+Refreshes run on a thread of the process that serves the page rather than
+on the task worker: with the default per-process cache, a reading fetched
+by the worker would land in the worker's memory and never reach the web
+process.
+"""
+import threading
+import time
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+
+CACHE_KEY_PREFIX = 'weather:'
+
+# How long a failed lookup is cached so an outage doesn't hammer the API
+ERROR_TTL = 60
+
+# How long a follower waits on an in-flight request before giving up
+COALESCE_WAIT = 10
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+class _InflightCall:
+    """A pending upstream request other threads can wait on"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+
+
+def normalize_city(city):
+    """Normalize a city name so 'Iligan City' and ' iligan  city' share a cache entry"""
+    return '-'.join(city.split()).lower()
+
+
+def _cache_key(city):
+    return f'{CACHE_KEY_PREFIX}{normalize_city(city)}'
+
+
+def fetch_weather_data(city):
+    """Fetch weather data from OpenWeather API (uncached)"""
+    api_key = settings.OPENWEATHER_API_KEY
+
+    if not api_key:
+        return {
+            'error': 'Weather API key not configured',
+            'recommendation': 'Weather conditions unavailable'
+        }
+
+    try:
+        url = 'https://api.openweathermap.org/data/2.5/weather'
+        params = {'q': city, 'appid': api_key, 'units': 'metric'}
+        response = requests.get(url, params=params, timeout=5)
+        response.raise_for_status()
+
+        data = response.json()
+        temp = data['main']['temp']
+        condition = data['weather'][0]['main']
+        description = data['weather'][0]['description']
+        humidity = data['main']['humidity']
+        wind_speed = data['wind']['speed']
+        icon = data['weather'][0]['icon']
+
+        # Generate car wash recommendation
+        is_good_for_wash = True
+        if condition in ['Rain', 'Drizzle', 'Thunderstorm']:
+            recommendation = 'Not recommended - Rain expected. Consider rescheduling.'
+            is_good_for_wash = False
+        elif condition in ['Dust', 'Sand']:
+            recommendation = 'Not ideal - Dusty conditions. Your car might get dirty quickly.'
+            is_good_for_wash = False
+        elif temp > 35:
+            recommendation = 'Good for a car wash, but very hot! Early morning or late afternoon is better.'
+        elif temp < 15:
+            recommendation = 'Good for a car wash, but quite cool. Dress warmly!'
+        else:
+            recommendation = 'Perfect weather for a car wash!'
+
+        return {
+            'location': data['name'],
+            'temperature': round(temp),
+            'condition': condition,
+            'description': description,
+            'humidity': humidity,
+            'wind_speed': wind_speed,
+            'icon': icon,
+            'recommendation': recommendation,
+            'is_good_for_wash': is_good_for_wash
+        }
+    except Exception as e:
+        return {
+            'error': str(e),
+            'recommendation': 'Weather data unavailable'
+        }
+
+
+def _fetch_and_store(city, key):
+    """Call the API and write the result to the cache"""
+    data = fetch_weather_data(city)
+
+    if 'error' in data:
+        # Keep serving the last good reading rather than replacing it with an error
+        previous = cache.get(key)
+        if previous is not None and 'error' not in previous['data']:
+            data = previous['data']
+        ttl = ERROR_TTL
+    else:
+        ttl = settings.WEATHER_CACHE_TTL
+
+    entry = {'data': data, 'fetched_at': time.time(), 'ttl': ttl}
+    cache.set(key, entry, timeout=ttl + settings.WEATHER_CACHE_STALE_TTL)
+    return data
+
+
+def _fetch_coalesced(city, key):
+    """Fetch once per key; concurrent callers wait for the leader's result"""
+    with _inflight_lock:
+        call = _inflight.get(key)
+        is_leader = call is None
+        if is_leader:
+            call = _inflight[key] = _InflightCall()
+
+    if not is_leader:
+        call.event.wait(COALESCE_WAIT)
+        if call.result is not None:
+            return call.result
+        return {
+            'error': 'Weather request timed out',
+            'recommendation': 'Weather data unavailable'
+        }
+
+    try:
+        call.result = _fetch_and_store(city, key)
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+        call.event.set()
+    return call.result
+
+
+def _refresh_in_background(city, key):
+    """Start a refresh unless another thread or worker already owns it"""
+    # cache.add is atomic, so only one worker claims the refresh per window
+    if not cache.add(f'{key}:refreshing', True, timeout=COALESCE_WAIT * 3):
+        return None
+
+    def refresh():
+        try:
+            _fetch_coalesced(city, key)
+        finally:
+            cache.delete(f'{key}:refreshing')
+
+    thread = threading.Thread(target=refresh, name=f'weather-refresh-{key}', daemon=True)
+    thread.start()
+    return thread
+
+
+def get_weather(city=None, wait=True):
+    """
+    Return weather for a city, served from cache whenever possible
+
+    With wait=False a cold cache doesn't block: a background refresh is
+    started and a placeholder returned until it has fetched the reading.
+    """
+    if not city:
+        city = settings.OPENWEATHER_CITY
+
+    key = _cache_key(city)
+    entry = cache.get(key)
+
+    if entry is None:
+        if not wait:
+            _refresh_in_background(city, key)
+            return {
+                'error': 'Weather is being updated',
+                'recommendation': 'Weather conditions will show up shortly'
+            }
+        return _fetch_coalesced(city, key)
+
+    if time.time() - entry['fetched_at'] >= entry['ttl']:
+        _refresh_in_background(city, key)
+    return entry['data']
@@ -2,6 +2,9 @@
 ASGI config for carwash project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+This is what production serves (gunicorn with uvicorn workers, see
+gunicorn.conf.py): the staff dashboard's live booking feed is a long-lived
+server-sent event stream that needs an async server.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
@@ -0,0 +1,26 @@
+"""
+Gunicorn configuration (picked up automatically from the working directory)
+
+The app is served over ASGI (gunicorn carwash.asgi) with uvicorn workers.
+
+With GUNICORN_PRELOAD=True the app is imported once in the master and
+shared copy-on-write with the workers; post_fork then drops any per-process
+state the master may have created so workers never share sockets.
+"""
+import os
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'False') == 'True'
+
+# Serve carwash.asgi so the staff live feed (server-sent events) holds an idle
+# coroutine per connection rather than a worker. The feed broadcasts within one
+# process (bookings/live.py), so keep the default single worker.
+worker_class = 'uvicorn.workers.UvicornWorker'
+
+
+def post_fork(server, worker):
+    from bookings.supabase_client import reset_supabase_clients
+    reset_supabase_clients()
+
+    if preload_app:
+        from django.db import connections
+        connections.close_all()
@@ -3,8 +3,14 @@
 echo "Running database migrations..."
 python manage.py migrate --noinput
 
+echo "Seeding services..."
+python manage.py seed_services
+
 echo "Collecting static files..."
 python manage.py collectstatic --noinput
 
+echo "Starting background task worker..."
+python manage.py run_tasks --loop &
+
 echo "Starting Gunicorn..."
-gunicorn carwash.wsgi
+gunicorn carwash.asgi